@@ -4,8 +4,10 @@
 
 import logging
 import random
+import threading
 import time
 import traceback
+from contextlib import contextmanager
 from io import StringIO
 
 from psycopg2 import OperationalError, errorcodes
@@ -14,10 +16,11 @@ from werkzeug.exceptions import BadRequest, Forbidden
 from odoo import SUPERUSER_ID, _, api, http
 from odoo.modules.registry import Registry
 from odoo.service.model import PG_CONCURRENCY_ERRORS_TO_RETRY
+from odoo.tools import config
 
 from ..delay import chain, group
 from ..exception import FailedJobError, RetryableJobError
-from ..job import ENQUEUED, Job
+from ..job import ENQUEUED, PENDING, Job
 
 _logger = logging.getLogger(__name__)
 
@@ -25,6 +28,11 @@ PG_RETRY = 5  # seconds
 
 DEPENDS_MAX_TRIES_ON_CONCURRENCY_FAILURE = 5
 
+# the enqueue date of the jobs of a batch waiting for their turn is
+# refreshed more often than the 10 seconds the detection of dead jobs waits
+# for enqueued jobs to start
+BATCH_REFRESH_INTERVAL = 5  # seconds
+
 
 class RunJobController(http.Controller):
     def _try_perform_job(self, env, job):
@@ -56,6 +64,9 @@ class RunJobController(http.Controller):
                 # errors
                 if err.pgcode not in PG_CONCURRENCY_ERRORS_TO_RETRY:
                     raise
+                # the job is done and committed, the retry starts a new
+                # transaction which sees the children updated concurrently
+                env.cr.rollback()
                 if tries >= DEPENDS_MAX_TRIES_ON_CONCURRENCY_FAILURE:
                     _logger.info(
                         "%s, maximum number of tries reached to update dependencies",
@@ -85,6 +96,148 @@ class RunJobController(http.Controller):
     def runjob(self, db, job_uuid, **kw):
         http.request.session.db = db
         env = http.request.env(user=SUPERUSER_ID)
+        self._runjob(env, job_uuid)
+        return ""
+
+    @http.route(
+        "/queue_job/runjobs",
+        type="http",
+        auth="none",
+        save_session=False,
+        readonly=False,
+    )
+    def runjobs(self, db, job_uuids, **kw):
+        """Run several jobs, each one in its own transaction
+
+        ``job_uuids`` is a comma-separated list of uuids. A failed job does
+        not prevent the next ones to run.
+        """
+        http.request.session.db = db
+        env = http.request.env(user=SUPERUSER_ID)
+
+        def run_job(job_uuid):
+            try:
+                self._runjob(env, job_uuid)
+            except Exception:
+                # the job has been stored as failed and its traceback logged
+                env.cr.rollback()
+                raise
+            env.cr.commit()
+
+        self._runjobs(db, job_uuids.split(","), run_job)
+        return ""
+
+    def _runjobs(self, db_name, job_uuids, run_job):
+        """Run the jobs of a batch one after the other
+
+        ``run_job`` runs a job and commits it, with the release of its
+        dependent jobs. Used by the ``/queue_job/runjobs`` route and by the
+        workers of the process pool executor.
+
+        The jobs of a batch are enqueued together: the jobs waiting for their
+        turn get a lock row and their enqueue date is refreshed in the
+        background, so the detection of dead jobs requeues them only when the
+        batch is killed. The jobs not started once the time budget of the
+        batch is spent are set back to pending.
+
+        Return ``False`` if one of the jobs failed.
+        """
+        registry = Registry(db_name)
+        with registry.cursor() as cr:
+            self._add_batch_locks(api.Environment(cr, SUPERUSER_ID, {}), job_uuids)
+        deadline = time.monotonic() + self._batch_time_budget()
+        success = True
+        with self._batch_heartbeat(registry, job_uuids):
+            for index, job_uuid in enumerate(job_uuids):
+                if time.monotonic() > deadline:
+                    with registry.cursor() as cr:
+                        env = api.Environment(cr, SUPERUSER_ID, {})
+                        self._requeue_batch(env, job_uuids[index:])
+                    break
+                try:
+                    run_job(job_uuid)
+                except Exception:
+                    _logger.debug("job %s failed in a batch", job_uuid, exc_info=True)
+                    success = False
+        return success
+
+    def _batch_time_budget(self):
+        """Time in seconds after which a batch starts no more jobs
+
+        Half of ``limit_time_real``, so the jobs started can end before the
+        worker is killed.
+        """
+        limit = config["limit_time_real"]
+        return limit / 2 if limit else float("inf")
+
+    @contextmanager
+    def _batch_heartbeat(self, registry, job_uuids):
+        """Refresh the enqueue date of the jobs of a batch while it runs"""
+        stop = threading.Event()
+
+        def refresh():
+            threading.current_thread().dbname = registry.db_name
+            while not stop.wait(BATCH_REFRESH_INTERVAL):
+                try:
+                    with registry.cursor() as cr:
+                        env = api.Environment(cr, SUPERUSER_ID, {})
+                        self._refresh_date_enqueued(env, job_uuids)
+                except Exception:
+                    _logger.exception("cannot refresh the jobs of a batch")
+
+        thread = threading.Thread(
+            target=refresh, name="queue_job_batch_heartbeat", daemon=True
+        )
+        thread.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            thread.join()
+
+    def _add_batch_locks(self, env, job_uuids):
+        """Add the lock rows of the enqueued jobs of a batch
+
+        Like ``Job.add_lock_record`` when a job starts. The detection of dead
+        jobs only requeues the jobs which have a lock row, the lock row of a
+        job waiting for its turn is not locked.
+        """
+        self._refresh_date_enqueued(env, job_uuids)
+        env.cr.execute(
+            "INSERT INTO queue_job_lock (id, queue_job_id) "
+            "SELECT id, id FROM queue_job WHERE uuid = ANY(%s) AND state = %s "
+            "ON CONFLICT (id) DO NOTHING",
+            (list(job_uuids), ENQUEUED),
+        )
+
+    def _refresh_date_enqueued(self, env, job_uuids):
+        """Set the enqueue date of the jobs of a batch still enqueued to now"""
+        env.cr.execute(
+            "UPDATE queue_job "
+            "SET date_enqueued=date_trunc('seconds', now() at time zone 'utc') "
+            "WHERE uuid = ANY(%s) AND state = %s",
+            (list(job_uuids), ENQUEUED),
+        )
+
+    def _requeue_batch(self, env, job_uuids):
+        """Set the jobs of a batch still enqueued back to pending"""
+        env.cr.execute(
+            "UPDATE queue_job SET state = %s, date_enqueued = NULL "
+            "WHERE uuid = ANY(%s) AND state = %s",
+            (PENDING, list(job_uuids), ENQUEUED),
+        )
+        _logger.info(
+            "time budget of the batch spent, %d jobs set back to pending",
+            env.cr.rowcount,
+        )
+
+    def _runjob(self, env, job_uuid):
+        """Run an enqueued job in the transaction of ``env``
+
+        Used by the ``/queue_job/runjob`` route and by the workers of the
+        process pool executor. The exception of a failed job is raised again
+        once the job has been stored as failed.
+        """
 
         def retry_postpone(job, message, seconds=None):
             job.env.clear()
@@ -106,7 +259,7 @@ class RunJobController(http.Controller):
                 job_uuid,
                 ENQUEUED,
             )
-            return ""
+            return
 
         job = Job.load(env, job_uuid)
         assert job and job.state == ENQUEUED
@@ -131,7 +284,7 @@ class RunJobController(http.Controller):
             # traceback in the logs we should have the traceback when all
             # retries are exhausted
             env.cr.rollback()
-            return ""
+            return
 
         except (FailedJobError, Exception) as orig_exception:
             buff = StringIO()
@@ -151,8 +304,6 @@ class RunJobController(http.Controller):
         self._enqueue_dependent_jobs(env, job)
         _logger.debug("%s enqueue depends done", job)
 
-        return ""
-
     def _get_failure_values(self, job, traceback_txt, orig_exception):
         """Collect relevant data from exception."""
         exception_name = orig_exception.__class__.__name__
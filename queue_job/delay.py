@@ -251,6 +251,9 @@ class DelayableGraph(Graph):
 
         vertices = graph.vertices()
 
+        # the jobs built now are not stored yet, the jobs of vertices already
+        # delayed are
+        new_vertices = {vertex for vertex in vertices if not vertex._generated_job}
         for vertex in vertices:
             vertex._build_job()
 
@@ -267,28 +270,36 @@ class DelayableGraph(Graph):
         # we do not create them. Maybe we should check that the found jobs are
         # part of the same graph, but not sure it's really required...
         # Also, maybe we want to check only the root jobs.
-        existing_mapping = {}
-        for vertex in vertices:
-            if not vertex.identity_key:
-                continue
-            generated_job = vertex._generated_job
-            existing = generated_job.job_record_with_same_identity_key()
-            if not existing:
-                # at least one does not exist yet, we'll delay the whole graph
-                existing_mapping.clear()
-                break
-            existing_mapping[vertex] = existing
-
-        # We'll replace the generated jobs by the existing ones, so callers
-        # can retrieve the existing job in "_generated_job".
-        # existing_mapping contains something only if *all* the job with an
-        # identity have an existing one.
-        for vertex, existing in existing_mapping.items():
-            vertex._generated_job = existing
-            return
-
+        identity_vertices = [vertex for vertex in vertices if vertex.identity_key]
+        if identity_vertices:
+            keys_by_vertex = {
+                vertex: vertex._generated_job.identity_keys
+                for vertex in identity_vertices
+            }
+            # the existing jobs of all the identity keys, in a single query
+            existing_by_key = Job.db_records_by_identity_keys(
+                identity_vertices[0]._generated_job.env,
+                [key for keys in keys_by_vertex.values() for key in keys],
+            )
+            existing_by_vertex = {}
+            for vertex, identity_keys in keys_by_vertex.items():
+                for identity_key in identity_keys:
+                    if identity_key in existing_by_key:
+                        existing_by_vertex[vertex] = existing_by_key[identity_key]
+                        break
+            if len(existing_by_vertex) == len(identity_vertices):
+                # We'll replace the generated jobs by the existing ones, so
+                # callers can retrieve the existing job in "_generated_job".
+                for vertex, existing in existing_by_vertex.items():
+                    vertex._generated_job = existing
+                return
+
+        Job.store_many(
+            [vertex._generated_job for vertex in vertices if vertex in new_vertices]
+        )
         for vertex in vertices:
-            vertex._generated_job.store()
+            if vertex not in new_vertices:
+                vertex._generated_job.store()
 
     def _execute_graph_direct(self, graph):
         for delayable in graph.topological_sort():
@@ -2,6 +2,7 @@
 # license lgpl-3.0 or later (http://www.gnu.org/licenses/lgpl.html)
 
 import json
+import math
 from datetime import date, datetime
 
 import dateutil
@@ -11,6 +12,20 @@ from psycopg2.extras import Json as PsycopgJson
 from odoo import fields, models
 from odoo.tools.func import lazy
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# the types handled by JobEncoder are given to its default method by orjson
+ORJSON_OPTIONS = (
+    orjson.OPT_NON_STR_KEYS
+    | orjson.OPT_PASSTHROUGH_DATETIME
+    | orjson.OPT_PASSTHROUGH_DATACLASS
+    if orjson
+    else 0
+)
+
 
 class JobSerialized(fields.Json):
     """Provide the storage for job fields stored as json
@@ -21,12 +36,16 @@ class JobSerialized(fields.Json):
 
     Support for some custom types has been added to the json decoder/encoder
     (see JobEncoder and JobDecoder).
+
+    When lazy is set, the value of the field is a proxy, the json is decoded
+    when the value is used.
     """
 
     type = "job_serialized"
     _column_type = ("jsonb", "jsonb")
 
     _base_type = None
+    _lazy = False
 
     # these are the default values when we convert an empty value
     _default_json_mapping = {
@@ -38,8 +57,14 @@ class JobSerialized(fields.Json):
         ),
     }
 
-    def __init__(self, string=fields.SENTINEL, base_type=fields.SENTINEL, **kwargs):
-        super().__init__(string=string, _base_type=base_type, **kwargs)
+    def __init__(
+        self,
+        string=fields.SENTINEL,
+        base_type=fields.SENTINEL,
+        lazy=fields.SENTINEL,
+        **kwargs,
+    ):
+        super().__init__(string=string, _base_type=base_type, _lazy=lazy, **kwargs)
 
     def _setup_attrs(self, model, name):  # pylint: disable=missing-return
         super()._setup_attrs(model, name)
@@ -58,8 +83,10 @@ class JobSerialized(fields.Json):
 
     def convert_to_cache(self, value, record, validate=True):
         # cache format: json.dumps(value) or None
+        if isinstance(value, lazy):
+            value = value._value
         if isinstance(value, self._base_type):
-            return json.dumps(value, cls=JobEncoder)
+            return job_dumps(value)
         else:
             return value or None
 
@@ -67,13 +94,56 @@ class JobSerialized(fields.Json):
         default = self._base_type_default_json(record.env)
         value = value or default
         if not isinstance(value, (str | bytes | bytearray)):
-            value = json.dumps(value, cls=JobEncoder)
+            value = job_dumps(value)
+        if self._lazy:
+            return lazy(json.loads, value, cls=JobDecoder, env=record.env)
         return json.loads(value, cls=JobDecoder, env=record.env)
 
+    def convert_to_read(self, value, record, use_display_name=True):
+        if isinstance(value, lazy):
+            value = value._value
+        return super().convert_to_read(value, record, use_display_name)
+
     def convert_to_export(self, value, record):
         if not value:
             return ""
-        return json.dumps(value, cls=JobEncoder)
+        return job_dumps(value)
+
+
+def job_dumps(value):
+    """Encode ``value`` in json with JobEncoder
+
+    orjson is used when it is installed, the json module encodes the values
+    orjson does not support (integers of more than 64 bits for instance).
+    orjson encodes NaN and infinite floats as null where the json module
+    writes NaN and Infinity: the json module encodes the values containing
+    them, so they are encoded the same way with or without orjson.
+    The json module still decodes: orjson has no object hook, and it returns
+    floats for the integers out of its range.
+    """
+    if orjson is not None:
+        try:
+            value_json = orjson.dumps(
+                value, default=JobEncoder().default, option=ORJSON_OPTIONS
+            )
+        except TypeError:
+            pass
+        else:
+            # the values are only looked for non-finite floats when there is
+            # a null in the result
+            if b"null" not in value_json or not _has_non_finite_float(value):
+                return value_json.decode()
+    return json.dumps(value, cls=JobEncoder)
+
+
+def _has_non_finite_float(value):
+    if isinstance(value, float):
+        return not math.isfinite(value)
+    if isinstance(value, dict):
+        return any(_has_non_finite_float(item) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return any(_has_non_finite_float(item) for item in value)
+    return False
 
 
 class JobEncoder(json.JSONEncoder):
@@ -107,27 +177,50 @@ class JobEncoder(json.JSONEncoder):
 
 
 class JobDecoder(json.JSONDecoder):
-    """Decode json, recomposing recordsets"""
+    """Decode json, recomposing recordsets
+
+    The models of the recordsets are kept by user, superuser mode and context
+    for the decoding, the recordsets of a json share their environments.
+    """
 
     def __init__(self, *args, **kwargs):
         env = kwargs.pop("env")
         super().__init__(*args, object_hook=self.object_hook, **kwargs)
         assert env
         self.env = env
+        self._models = {}
+
+    def _model(self, model_name, uid, su, context):
+        key = (model_name, uid, su, json.dumps(context, sort_keys=True))
+        model = self._models.get(key)
+        if model is None:
+            model = self.env(user=uid, su=su)[model_name]
+            if context:
+                model = model.with_context(**context)
+            self._models[key] = model
+        return model
 
     def object_hook(self, obj):
         if "_type" not in obj:
             return obj
         type_ = obj["_type"]
         if type_ == "odoo_recordset":
-            model = self.env(user=obj.get("uid"), su=obj.get("su"))[obj["model"]]
-            if obj.get("context"):
-                model = model.with_context(**obj.get("context"))
+            model = self._model(
+                obj["model"], obj.get("uid"), obj.get("su"), obj.get("context")
+            )
             return model.browse(obj["ids"])
         elif type_ == "datetime_isoformat":
-            return dateutil.parser.parse(obj["value"])
+            return _parse_datetime(obj["value"])
         elif type_ == "date_isoformat":
-            return dateutil.parser.parse(obj["value"]).date()
+            return _parse_datetime(obj["value"]).date()
         elif type_ == "etree_element":
             return lxml.etree.fromstring(obj["value"])
         return obj
+
+
+def _parse_datetime(value):
+    # the values written by JobEncoder are in the format of isoformat()
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return dateutil.parser.parse(value)
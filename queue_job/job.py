@@ -5,13 +5,18 @@ import hashlib
 import inspect
 import logging
 import os
+import pickle
 import sys
 import uuid
 import weakref
+from array import array
 from datetime import datetime, timedelta
 from random import randint
 
+from lxml import etree
+
 import odoo
+from odoo.tools import str2bool
 
 from .exception import FailedJobError, NoSuchJobError, RetryableJobError
 
@@ -37,6 +42,10 @@ DEFAULT_PRIORITY = 10  # used by the PriorityQueue to sort the jobs
 DEFAULT_MAX_RETRIES = 5
 RETRY_INTERVAL = 10 * 60  # seconds
 
+# pickle protocol of the encoding of identity_exact, changing it changes
+# the identity keys
+IDENTITY_PROTOCOL = 5
+
 _logger = logging.getLogger(__name__)
 
 
@@ -74,6 +83,16 @@ def identity_exact(job_):
 
     Usually you will probably always want to include at least the name of the
     model and method.
+
+    The key is a 128 bits BLAKE2 hash of a binary encoding of the job, with
+    sorted keyword arguments and packed ids. The former keys were SHA-1
+    hashes of the representation of the job (see
+    :func:`identity_exact_legacy`), the update of the module recomputes the
+    keys of the jobs not done yet. To find the jobs created with the former
+    keys before the update, enable the compatibility mode with the
+    ``ODOO_QUEUE_JOB_IDENTITY_LEGACY=1`` environment variable or the
+    ``identity_legacy = True`` option of the ``[queue_job]`` section of the
+    configuration file.
     """
     hasher = identity_exact_hasher(job_)
     return hasher.hexdigest()
@@ -81,13 +100,91 @@ def identity_exact(job_):
 
 def identity_exact_hasher(job_):
     """Prepare hasher object for identity_exact."""
+    values = (
+        job_.model_name,
+        job_.method_name,
+        _packed_ids(job_.recordset),
+        job_.args,
+        sorted(job_.kwargs.items()),
+    )
+    hasher = hashlib.blake2b(digest_size=16)
+    pickler = _IdentityPickler(_HasherWriter(hasher), protocol=IDENTITY_PROTOCOL)
+    # without memo, equal values have the same encoding, whether they are the
+    # same object or not
+    pickler.fast = True
+    try:
+        pickler.dump(values)
+    except (pickle.PicklingError, TypeError, AttributeError):
+        # arguments which cannot be pickled, they are hashed from their
+        # representation like in identity_exact_legacy
+        hasher = hashlib.blake2b(digest_size=16)
+        hasher.update(repr(values).encode("utf-8"))
+    return hasher
+
+
+def identity_exact_legacy(job_):
+    """Identity key of :func:`identity_exact` before the binary encoding"""
     hasher = hashlib.sha1()
     hasher.update(job_.model_name.encode("utf-8"))
     hasher.update(job_.method_name.encode("utf-8"))
     hasher.update(str(sorted(job_.recordset.ids)).encode("utf-8"))
     hasher.update(str(job_.args).encode("utf-8"))
     hasher.update(str(sorted(job_.kwargs.items())).encode("utf-8"))
-    return hasher
+    return hasher.hexdigest()
+
+
+def identity_legacy_mode():
+    """Whether the jobs are also looked for with their legacy identity key"""
+    # not imported at the module level: the jobrunner imports this module
+    from .jobrunner import queue_job_config
+
+    value = os.environ.get("ODOO_QUEUE_JOB_IDENTITY_LEGACY") or queue_job_config.get(
+        "identity_legacy"
+    )
+    return str2bool(value or "0", default=False)
+
+
+def _packed_ids(records):
+    """The sorted ids of ``records``, as 64 bits integers"""
+    try:
+        return array("q", sorted(records.ids)).tobytes()
+    except TypeError:
+        # new records, without database id
+        return repr(records.ids).encode("utf-8")
+
+
+def _identity_records(model_name, packed_ids):
+    """Placeholder of the recordsets in the encoding of identity_exact"""
+
+
+def _identity_etree(data):
+    """Placeholder of the XML elements in the encoding of identity_exact"""
+
+
+class _HasherWriter:
+    """File object streaming what is written to a hasher"""
+
+    __slots__ = ("write",)
+
+    def __init__(self, hasher):
+        self.write = hasher.update
+
+
+class _IdentityPickler(pickle.Pickler):
+    """Binary encoding of the values of a job for identity_exact
+
+    The values are encoded by the C pickler, only the recordsets are replaced
+    by their model and packed ids, without their environment, and the XML
+    elements, which cannot be pickled, by their serialization.
+    """
+
+    def reducer_override(self, obj):
+        # not called for the builtin types (str, int, list, dict, ...)
+        if isinstance(obj, odoo.models.BaseModel):
+            return _identity_records, (obj._name, _packed_ids(obj))
+        if isinstance(obj, etree._Element):
+            return _identity_etree, (etree.tostring(obj),)
+        return NotImplemented
 
 
 class Job:
@@ -280,8 +377,6 @@ class Job:
     def _load_from_db_record(cls, job_db_record):
         stored = job_db_record
 
-        args = stored.args
-        kwargs = stored.kwargs
         method_name = stored.method_name
 
         recordset = stored.records
@@ -293,8 +388,6 @@ class Job:
 
         job_ = cls(
             method,
-            args=args,
-            kwargs=kwargs,
             priority=stored.priority,
             eta=eta,
             job_uuid=stored.uuid,
@@ -302,6 +395,10 @@ class Job:
             channel=stored.channel,
             identity_key=stored.identity_key,
         )
+        # the arguments, which can be large, are decoded when they are used,
+        # by perform() for instance
+        job_._args = job_._kwargs = None
+        job_._arguments_record = stored
 
         if stored.date_created:
             job_.date_created = stored.date_created
@@ -337,18 +434,37 @@ class Job:
 
     def job_record_with_same_identity_key(self):
         """Check if a job to be executed with the same key exists."""
-        existing = (
-            self.env["queue.job"]
-            .sudo()
-            .search(
-                [
-                    ("identity_key", "=", self.identity_key),
-                    ("state", "in", [WAIT_DEPENDENCIES, PENDING, ENQUEUED]),
-                ],
-                limit=1,
-            )
+        identity_keys = self.identity_keys
+        existing = self.db_records_by_identity_keys(self.env, identity_keys)
+        for identity_key in identity_keys:
+            if identity_key in existing:
+                return existing[identity_key]
+        return self.env["queue.job"].sudo().browse()
+
+    @staticmethod
+    def db_records_by_identity_keys(env, identity_keys):
+        """Return the jobs to be executed with the given identity keys
+
+        All the keys are looked for in a single query. Return a dict with the
+        most recent ``queue.job`` record by identity key, keys without a job
+        to be executed are not part of the result.
+        """
+        identity_keys = list(set(identity_keys))
+        if not identity_keys:
+            return {}
+        model = env["queue.job"].sudo()
+        model.flush_model(["identity_key", "state", "date_created"])
+        # the conditions match the partial index on identity_key
+        env.cr.execute(
+            "SELECT DISTINCT ON (identity_key) identity_key, id FROM queue_job "
+            "WHERE identity_key = ANY(%s) AND state IN %s "
+            "ORDER BY identity_key, date_created DESC, id DESC",
+            (identity_keys, (WAIT_DEPENDENCIES, PENDING, ENQUEUED)),
         )
-        return existing
+        return {
+            identity_key: model.browse(job_id)
+            for identity_key, job_id in env.cr.fetchall()
+        }
 
     @staticmethod
     def db_records_from_uuids(env, job_uuids):
@@ -430,6 +546,7 @@ class Job:
         self._uuid = job_uuid
         self.graph_uuid = None
 
+        self._arguments_record = None
         self.args = args
         self.kwargs = kwargs
 
@@ -512,44 +629,55 @@ class Job:
 
         return self.result
 
-    def _get_common_dependent_jobs_query(self):
-        return """
-            UPDATE queue_job
-            SET state = %s
-            FROM (
-            SELECT child.id, array_agg(parent.state) as parent_states
-            FROM queue_job job
-            JOIN LATERAL
-              json_array_elements_text(
-                  job.dependencies::json->'reverse_depends_on'
-              ) child_deps ON true
-            JOIN queue_job child
-            ON child.graph_uuid = job.graph_uuid
-            AND child.uuid = child_deps
-            JOIN LATERAL
-                json_array_elements_text(
-                  child.dependencies::json->'depends_on'
-                ) parent_deps ON true
-            JOIN queue_job parent
-            ON parent.graph_uuid = job.graph_uuid
-            AND parent.uuid = parent_deps
-            WHERE job.uuid = %s
-            GROUP BY child.id
-            ) jobs
-            WHERE
-            queue_job.id = jobs.id
-            AND %s = ALL(jobs.parent_states)
-            AND state = %s;
-        """
-
     def enqueue_waiting(self):
-        sql = self._get_common_dependent_jobs_query()
-        self.env.cr.execute(sql, (PENDING, self.uuid, DONE, WAIT_DEPENDENCIES))
-        self.env["queue.job"].invalidate_model(["state"])
+        """Release the children of the job which have no remaining dependency
+
+        The edge of each child is marked as done once, its remaining
+        dependencies are decremented, the child waiting for no other job
+        becomes pending.
+        """
+        self.env.cr.execute(
+            """
+            WITH released AS (
+                UPDATE queue_job_dependency
+                SET parent_done = true
+                WHERE parent_id = (SELECT id FROM queue_job WHERE uuid = %s)
+                AND NOT parent_done
+                RETURNING child_id
+            )
+            UPDATE queue_job
+            SET dependencies_remaining = dependencies_remaining - 1,
+                state = CASE
+                    WHEN dependencies_remaining <= 1 AND state = %s THEN %s
+                    ELSE state
+                END
+            FROM released
+            WHERE queue_job.id = released.child_id
+            """,
+            (self.uuid, WAIT_DEPENDENCIES, PENDING),
+        )
+        self.env["queue.job"].invalidate_model(["state", "dependencies_remaining"])
 
     def cancel_dependent_jobs(self):
-        sql = self._get_common_dependent_jobs_query()
-        self.env.cr.execute(sql, (CANCELLED, self.uuid, CANCELLED, WAIT_DEPENDENCIES))
+        """Cancel the children of the job whose parents are all cancelled"""
+        self.env.cr.execute(
+            """
+            UPDATE queue_job child
+            SET state = %s
+            FROM queue_job_dependency dependency
+            WHERE dependency.parent_id = (SELECT id FROM queue_job WHERE uuid = %s)
+            AND child.id = dependency.child_id
+            AND child.state = %s
+            AND NOT EXISTS (
+                SELECT 1
+                FROM queue_job_dependency sibling
+                JOIN queue_job parent ON parent.id = sibling.parent_id
+                WHERE sibling.child_id = child.id
+                AND parent.state != %s
+            )
+            """,
+            (CANCELLED, self.uuid, WAIT_DEPENDENCIES, CANCELLED),
+        )
         self.env["queue.job"].invalidate_model(["state"])
 
     def store(self):
@@ -569,6 +697,23 @@ class Job:
                 self._store_values(create=True)
             )
 
+    @staticmethod
+    def store_many(jobs):
+        """Store new jobs, with a single ``create`` by environment
+
+        Unlike :meth:`store`, it does not look for the existing records of
+        the jobs: it must be used only for jobs which have never been stored.
+        """
+        jobs_by_env = {}
+        for job_ in jobs:
+            jobs_by_env.setdefault(job_.env, []).append(job_)
+        for env, env_jobs in jobs_by_env.items():
+            job_model = env["queue.job"]
+            edit_sentinel = job_model.EDIT_SENTINEL
+            job_model.with_context(_job_edit_sentinel=edit_sentinel).sudo().create(
+                [job_._store_values(create=True) for job_ in env_jobs]
+            )
+
     def _store_values(self, create=False):
         vals = {
             "state": self.state,
@@ -670,6 +815,26 @@ class Job:
     def db_record(self):
         return self.db_records_from_uuids(self.env, [self.uuid])
 
+    @property
+    def args(self):
+        if self._args is None:
+            self._args = tuple(self._arguments_record.args)
+        return self._args
+
+    @args.setter
+    def args(self, value):
+        self._args = value
+
+    @property
+    def kwargs(self):
+        if self._kwargs is None:
+            self._kwargs = dict(self._arguments_record.kwargs)
+        return self._kwargs
+
+    @kwargs.setter
+    def kwargs(self, value):
+        self._kwargs = value
+
     @property
     def func(self):
         recordset = self.recordset.with_context(job_uuid=self.uuid)
@@ -698,6 +863,19 @@ class Job:
             self._identity_key = None
             self._identity_key_func = value
 
+    @property
+    def identity_keys(self):
+        """Keys of the jobs which are the same as this job
+
+        The identity key, followed by the key of :func:`identity_exact_legacy`
+        when the job uses :func:`identity_exact` in the compatibility mode.
+        """
+        if not self.identity_key:
+            return []
+        if self._identity_key_func is identity_exact and identity_legacy_mode():
+            return [self.identity_key, identity_exact_legacy(self)]
+        return [self.identity_key]
+
     @property
     def depends_on(self):
         if not self._depends_on:
@@ -2,9 +2,11 @@
 # Copyright 2015-2016 Camptocamp SA
 # License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl.html)
 import logging
-from collections import namedtuple
+from collections import defaultdict, namedtuple
 from functools import total_ordering
 from heapq import heappop, heappush
+from itertools import count
+from operator import attrgetter
 from weakref import WeakValueDictionary
 
 from ..exception import ChannelNotFound
@@ -22,6 +24,12 @@ class PriorityQueue:
     Adding an object already in the queue is a no op.
     Popping an empty queue returns None.
 
+    It is a binary heap that records the position of each object, so that
+    an object is removed, or moved after a change of its sorting key, in
+    place in O(log n): the heap only holds the objects in the queue.
+    The objects are ordered by ``key(object)`` if a key function is given,
+    the key is computed when the object is added or updated.
+
     >>> q = PriorityQueue()
     >>> q.add(2)
     >>> q.add(3)
@@ -46,62 +54,143 @@ class PriorityQueue:
     >>> q.add(2)
     >>> q.pop()
     2
+
+    Removed objects do not stay in the heap.
+
+    >>> for i in range(10):
+    ...     q.add(i)
+    >>> for i in range(0, 10, 2):
+    ...     q.remove(i)
+    >>> len(q._heap)
+    5
+    >>> [q.pop() for i in range(6)]
+    [1, 3, 5, 7, 9, None]
+
+    When the sorting key of an object changes, ``update`` moves it.
+
+    >>> class Item:
+    ...     def __init__(self, key):
+    ...         self.key = key
+    ...     def __repr__(self):
+    ...         return f"<Item {self.key}>"
+    >>> q = PriorityQueue(key=attrgetter("key"))
+    >>> a, b, c = Item(1), Item(2), Item(3)
+    >>> for item in (a, b, c):
+    ...     q.add(item)
+    >>> c.key = 0
+    >>> q.update(c)
+    >>> q[0]
+    <Item 0>
+    >>> c.key = 4
+    >>> q.update(c)
+    >>> [q.pop() for i in range(3)]
+    [<Item 1>, <Item 2>, <Item 4>]
     """
 
-    def __init__(self):
+    __slots__ = ("_heap", "_keys", "_index", "_key")
+
+    def __init__(self, key=None):
         self._heap = []
-        self._known = set()  # all objects in the heap (including removed)
-        self._removed = set()  # all objects that have been removed
+        self._keys = []  # sorting keys, at the same positions as in the heap
+        self._index = {}  # position of the objects in the heap
+        self._key = key
 
     def __len__(self):
-        return len(self._known) - len(self._removed)
+        return len(self._heap)
 
     def __getitem__(self, i):
-        if i != 0:
+        if i != 0 or not self._heap:
             raise IndexError()
-        while True:
-            if not self._heap:
-                raise IndexError()
-            o = self._heap[0]
-            if o in self._removed:
-                o2 = heappop(self._heap)
-                assert o2 == o
-                self._removed.remove(o)
-                self._known.remove(o)
-            else:
-                return o
+        return self._heap[0]
 
     def __contains__(self, o):
-        return o in self._known and o not in self._removed
+        return o in self._index
 
     def add(self, o):
         if o is None:
             raise ValueError()
-        self._removed.discard(o)
-        if o in self._known:
+        if o in self._index:
             return
-        self._known.add(o)
-        heappush(self._heap, o)
+        self._heap.append(o)
+        self._keys.append(self._key(o) if self._key else o)
+        self._sift_up(len(self._heap) - 1)
 
     def remove(self, o):
         if o is None:
             raise ValueError()
-        if o not in self._known:
+        pos = self._index.pop(o, None)
+        if pos is None:
+            return
+        last = self._heap.pop()
+        last_key = self._keys.pop()
+        if pos < len(self._heap):
+            # fill the hole with the last object and move it to its place
+            self._heap[pos] = last
+            self._keys[pos] = last_key
+            self._sift(pos)
+
+    def update(self, o):
+        """Move an object in the queue after a change of its sorting key"""
+        pos = self._index.get(o)
+        if pos is None:
             return
-        self._removed.add(o)
+        self._keys[pos] = self._key(o) if self._key else o
+        self._sift(pos)
 
     def pop(self):
-        while True:
-            try:
-                o = heappop(self._heap)
-            except IndexError:
-                # queue is empty
-                return None
-            self._known.remove(o)
-            if o in self._removed:
-                self._removed.remove(o)
-            else:
-                return o
+        if not self._heap:
+            # queue is empty
+            return None
+        o = self._heap[0]
+        self.remove(o)
+        return o
+
+    def _sift(self, pos):
+        if pos and self._keys[pos] < self._keys[(pos - 1) >> 1]:
+            self._sift_up(pos)
+        else:
+            self._sift_down(pos)
+
+    def _sift_up(self, pos):
+        heap, keys, index = self._heap, self._keys, self._index
+        o = heap[pos]
+        key = keys[pos]
+        while pos:
+            parent_pos = (pos - 1) >> 1
+            parent_key = keys[parent_pos]
+            if not key < parent_key:
+                break
+            parent = heap[parent_pos]
+            heap[pos] = parent
+            keys[pos] = parent_key
+            index[parent] = pos
+            pos = parent_pos
+        heap[pos] = o
+        keys[pos] = key
+        index[o] = pos
+
+    def _sift_down(self, pos):
+        heap, keys, index = self._heap, self._keys, self._index
+        end = len(heap)
+        o = heap[pos]
+        key = keys[pos]
+        child_pos = 2 * pos + 1
+        while child_pos < end:
+            right_pos = child_pos + 1
+            if right_pos < end and keys[right_pos] < keys[child_pos]:
+                child_pos = right_pos
+            child_key = keys[child_pos]
+            if not child_key < key:
+                break
+            child = heap[child_pos]
+            heap[pos] = child
+            keys[pos] = child_key
+            index[child] = pos
+            pos = child_pos
+            child_pos = 2 * pos + 1
+        heap[pos] = o
+        keys[pos] = key
+        index[o] = pos
 
 
 @total_ordering
@@ -190,11 +279,8 @@ class ChannelJob:
     def __repr__(self):
         return f"<ChannelJob {self.uuid}>"
 
-    def __eq__(self, other):
-        return id(self) == id(other)
-
-    def __hash__(self):
-        return id(self)
+    # jobs are equal and hashed by identity, the default implementation of
+    # object does it without calling Python code in sets and dicts
 
     def set_no_eta(self):
         self._sorting_key = JobSortingKey(None, *self._sorting_key[1:])
@@ -225,9 +311,13 @@ class ChannelJob:
     def __lt__(self, other):
         # Do not compare job where ETA is set with job where it is not
         # If one job 'eta' is set, and the other is None, it raises TypeError
+        # The sorting key is built once, comparing does not allocate anything
         return self._sorting_key < other._sorting_key
 
 
+_job_sorting_key = attrgetter("_sorting_key")
+
+
 class ChannelQueue:
     """A channel queue is a priority queue for jobs.
 
@@ -312,8 +402,8 @@ class ChannelQueue:
     """
 
     def __init__(self, sequential=False):
-        self._queue = PriorityQueue()
-        self._eta_queue = PriorityQueue()
+        self._queue = PriorityQueue(key=_job_sorting_key)
+        self._eta_queue = PriorityQueue(key=_job_sorting_key)
         self.sequential = sequential
 
     def __len__(self):
@@ -357,6 +447,101 @@ class ChannelQueue:
         return wakeup_time
 
 
+# kinds of wakeup events
+WAKEUP_ETA = "eta"
+WAKEUP_PAUSE = "pause"
+
+
+class WakeupIndex:
+    """A min-heap of the times at which channels may have jobs to run.
+
+    It is shared by all the channels of a tree. A channel pushes an event
+    when the earliest eta of its queue changes and when it pauses because
+    of its throttle. Events are never removed when they become obsolete,
+    they are dropped when they reach the top of the heap.
+
+    The wakeup time is the earliest event of a channel which is not full
+    and has no full or paused parent, which is what a walk of the channel
+    tree would find, without visiting the idle channels.
+
+    >>> root = Channel('root', None, capacity=2)
+    >>> a = Channel('A', root, capacity=1)
+    >>> b = Channel('B', root, capacity=1)
+    >>> index = root._wakeups
+    >>> index.get_wakeup_time()
+    0
+    >>> a.set_pending(ChannelJob(None, a, 'A1', 1, 0, 10, eta=110))
+    >>> b.set_pending(ChannelJob(None, b, 'B1', 2, 0, 10, eta=120))
+    >>> index.get_wakeup_time()
+    110
+
+    The event of A1 is obsolete once it is removed.
+
+    >>> a.remove(a._queue._eta_queue[0])
+    >>> index.get_wakeup_time()
+    120
+    >>> len(index)
+    1
+
+    A full channel does not need to wake up, its event is kept for later.
+
+    >>> b.set_running(ChannelJob(None, b, 'B2', 3, 0, 10, eta=None))
+    >>> index.get_wakeup_time()
+    0
+    >>> len(index)
+    1
+    >>> b.set_done(next(iter(b._running)))
+    >>> index.get_wakeup_time()
+    120
+    """
+
+    __slots__ = ("_heap", "_counter")
+
+    def __init__(self):
+        self._heap = []
+        # channels are not comparable, events with the same time are
+        # ordered by insertion
+        self._counter = count()
+
+    def __len__(self):
+        return len(self._heap)
+
+    def push(self, when, channel, kind):
+        heappush(self._heap, (when, next(self._counter), channel, kind))
+
+    def get_wakeup_time(self):
+        heap = self._heap
+        blocked = []
+        wakeup_time = 0
+        while heap:
+            when, __, channel, kind = heap[0]
+            if not channel._is_wakeup_pending(when, kind):
+                heappop(heap)
+            elif channel._can_wakeup(kind):
+                wakeup_time = when
+                break
+            else:
+                blocked.append(heappop(heap))
+        for event in blocked:
+            heappush(heap, event)
+        return wakeup_time
+
+    def mark_due(self, now):
+        """Mark the channels with an event due at ``now`` for a visit"""
+        heap = self._heap
+        due = []
+        while heap and heap[0][0] <= now:
+            event = heappop(heap)
+            when, __, channel, kind = event
+            if channel._is_wakeup_pending(when, kind):
+                channel._mark_dirty()
+                # the event is obsolete once the channel has been visited
+                # with capacity, until then the channel is visited again
+                due.append(event)
+        for event in due:
+            heappush(heap, event)
+
+
 class Channel:
     """A channel for jobs, with a maximum capacity.
 
@@ -409,11 +594,20 @@ class Channel:
         self.parent = parent
         if self.parent:
             self.parent.children[name] = self
+            self._wakeups = self.parent._wakeups
+        else:
+            self._wakeups = WakeupIndex()
         self.children = {}
         self._queue = ChannelQueue()
         self._running = set()
         self._failed = set()
         self._pause_until = 0  # utc seconds since the epoch
+        self._scheduled_eta = 0  # eta of the last wakeup event pushed
+        # something changed in the channel or in its children since the
+        # last visit by get_jobs_to_run, the children to visit are kept
+        # in a dict to visit them in a stable order
+        self._dirty = False
+        self._dirty_children = {}
         self.capacity = capacity
         self.throttle = throttle  # seconds
         self.sequential = sequential
@@ -441,6 +635,7 @@ class Channel:
         self.throttle = int(config.get("throttle", 0))
         if self.sequential and self.capacity != 1:
             raise ValueError("A sequential channel must have a capacity of 1")
+        self._mark_dirty()
 
     @property
     def fullname(self):
@@ -463,11 +658,54 @@ class Channel:
             len(self._failed),
         )
 
+    def _mark_dirty(self):
+        """Visit the channel and its parents on the next get_jobs_to_run
+
+        To call when jobs may have become runnable in the channel: a job is
+        added, a running job releases the capacity, a failed job no longer
+        blocks a sequential channel, an eta or a pause is over...
+        """
+        self._dirty = True
+        channel = self
+        while channel.parent:
+            channel.parent._dirty_children[channel] = True
+            channel.parent._dirty = True
+            channel = channel.parent
+
+    def _schedule_eta(self):
+        """Push a wakeup event when the earliest eta of the queue changed"""
+        eta = self._queue.get_wakeup_time()
+        if eta and eta != self._scheduled_eta:
+            self._wakeups.push(eta, self, WAKEUP_ETA)
+        self._scheduled_eta = eta
+
+    def _is_wakeup_pending(self, when, kind):
+        """Is the wakeup event still the next one of its kind"""
+        if kind == WAKEUP_PAUSE:
+            return self._pause_until == when
+        return self._queue.get_wakeup_time() == when
+
+    def _can_wakeup(self, kind):
+        """Could a job run at the end of a wakeup event of this channel"""
+        if not self.has_capacity():
+            return False
+        if kind == WAKEUP_ETA and self._pause_until:
+            # the end of the pause is the wakeup time
+            return False
+        parent = self.parent
+        while parent:
+            if parent._pause_until or not parent.has_capacity():
+                return False
+            parent = parent.parent
+        return True
+
     def remove(self, job):
         """Remove a job from the channel."""
         self._queue.remove(job)
+        self._schedule_eta()
         self._running.discard(job)
         self._failed.discard(job)
+        self._mark_dirty()
         if self.parent:
             self.parent.remove(job)
 
@@ -487,8 +725,10 @@ class Channel:
         """
         if job not in self._queue:
             self._queue.add(job)
+            self._schedule_eta()
             self._running.discard(job)
             self._failed.discard(job)
+            self._mark_dirty()
             if self.parent:
                 self.parent.remove(job)
             _logger.debug("job %s marked pending in channel %s", job.uuid, self)
@@ -500,8 +740,12 @@ class Channel:
         """
         if job not in self._running:
             self._queue.remove(job)
+            self._schedule_eta()
             self._running.add(job)
-            self._failed.discard(job)
+            if job in self._failed:
+                # a sequential channel is not blocked anymore
+                self._failed.discard(job)
+                self._mark_dirty()
             if self.parent:
                 self.parent.set_running(job)
             _logger.debug("job %s marked running in channel %s", job.uuid, self)
@@ -510,8 +754,10 @@ class Channel:
         """Mark the job as failed."""
         if job not in self._failed:
             self._queue.remove(job)
+            self._schedule_eta()
             self._running.discard(job)
             self._failed.add(job)
+            self._mark_dirty()
             if self.parent:
                 self.parent.remove(job)
             _logger.debug("job %s marked failed in channel %s", job.uuid, self)
@@ -536,13 +782,29 @@ class Channel:
         no job until at least throttle seconds have elapsed since the previous
         yield.
 
+        Only the children marked dirty since their last visit are visited,
+        the other ones have no job to run.
+
         :param now: the current datetime in seconds
 
         :return: iterator of
                  :class:`odoo.addons.queue_job.jobrunner.ChannelJob`
         """
+        self._dirty = False
+        completed = False
+        try:
+            yield from self._get_jobs_to_run(now)
+            completed = True
+        finally:
+            if not completed:
+                # the caller did not take all the jobs, they are still
+                # to run
+                self._mark_dirty()
+
+    def _get_jobs_to_run(self, now):
         # enqueue jobs of children channels
-        for child in self.children.values():
+        dirty_children, self._dirty_children = self._dirty_children, {}
+        for child in dirty_children:
             for job in child.get_jobs_to_run(now):
                 self._queue.add(job)
         # is this channel paused?
@@ -564,6 +826,8 @@ class Channel:
         # yield jobs that are ready to run, while we have capacity
         while self.has_capacity():
             job = self._queue.pop(now)
+            # due jobs with an eta may have moved to the main queue
+            self._schedule_eta()
             if not job:
                 return
             self._running.add(job)
@@ -571,6 +835,7 @@ class Channel:
             yield job
             if self.throttle:
                 self._pause_until = now + self.throttle
+                self._wakeups.push(self._pause_until, self, WAKEUP_PAUSE)
                 _logger.debug("pausing channel %s until %s", self, self._pause_until)
                 return
 
@@ -803,6 +1068,8 @@ class ChannelManager:
 
     def __init__(self):
         self._jobs_by_uuid = WeakValueDictionary()
+        # the same jobs, by database
+        self._jobs_by_db = defaultdict(WeakValueDictionary)
         self._root_channel = Channel(name="root", parent=None, capacity=1)
         self._channels_by_name = WeakValueDictionary(root=self._root_channel)
 
@@ -1048,6 +1315,7 @@ class ChannelManager:
         if not job:
             job = ChannelJob(db_name, channel, uuid, seq, date_created, priority, eta)
             self._jobs_by_uuid[uuid] = job
+            self._jobs_by_db[db_name][uuid] = job
         # state transitions
         if not state or state in (DONE, CANCELLED):
             job.channel.set_done(job)
@@ -1068,15 +1336,90 @@ class ChannelManager:
         if job:
             job.channel.remove(job)
             del self._jobs_by_uuid[job.uuid]
+            self._jobs_by_db[job.db_name].pop(job.uuid, None)
 
     def remove_db(self, db_name):
-        for job in list(self._jobs_by_uuid.values()):
-            if job.db_name == db_name:
-                job.channel.remove(job)
-                del self._jobs_by_uuid[job.uuid]
+        """Remove the jobs of a database, without looking at the others
+
+        >>> cm = ChannelManager()
+        >>> cm.simple_configure('root:4')
+        >>> cm.notify('db1', 'root', 'A1', 1, 0, 10, None, 'pending')
+        >>> cm.notify('db2', 'root', 'B1', 2, 0, 10, None, 'pending')
+        >>> cm.notify('db1', 'root', 'A2', 3, 0, 10, None, 'started')
+        >>> cm.remove_db('db1')
+        >>> sorted(cm._jobs_by_uuid)
+        ['B1']
+        >>> len(cm._root_channel._running)
+        0
+        >>> list(cm.get_jobs_to_run(now=100))
+        [<ChannelJob B1>]
+        >>> 'db1' in cm._jobs_by_db
+        False
+        """
+        jobs = self._jobs_by_db.pop(db_name, None)
+        if not jobs:
+            return
+        for job in list(jobs.values()):
+            job.channel.remove(job)
+            self._jobs_by_uuid.pop(job.uuid, None)
 
     def get_jobs_to_run(self, now):
-        return self._root_channel.get_jobs_to_run(now)
+        """Get the jobs to run, visiting only the channels that changed
+
+        >>> cm = ChannelManager()
+        >>> cm.simple_configure('root:4,A:1,B:1')
+        >>> list(cm.get_jobs_to_run(now=100))
+        []
+        >>> cm.notify('db', 'A', 'A1', 1, 0, 10, None, 'pending')
+        >>> cm.notify('db', 'A', 'A2', 2, 0, 10, None, 'pending')
+        >>> cm.notify('db', 'B', 'B1', 3, 0, 10, 110, 'pending')
+        >>> a = cm.get_channel_by_name('A')
+        >>> b = cm.get_channel_by_name('B')
+        >>> list(cm.get_jobs_to_run(now=100))
+        [<ChannelJob A1>]
+
+        Nothing changed since the previous visit.
+
+        >>> a._dirty, b._dirty, cm._root_channel._dirty
+        (False, False, False)
+        >>> list(cm.get_jobs_to_run(now=105))
+        []
+
+        A1 is done, A has capacity again. B is visited when the eta of B1
+        is over.
+
+        >>> cm.notify('db', 'A', 'A1', 1, 0, 10, None, 'done')
+        >>> a._dirty, b._dirty, cm._root_channel._dirty
+        (True, False, True)
+        >>> list(cm.get_jobs_to_run(now=110))
+        [<ChannelJob A2>, <ChannelJob B1>]
+        """
+        root = self._root_channel
+        root._wakeups.mark_due(now)
+        if not root._dirty:
+            return iter(())
+        return root.get_jobs_to_run(now)
 
     def get_wakeup_time(self):
-        return self._root_channel.get_wakeup_time()
+        """Time at which the runner must look for jobs to run
+
+        The earliest time at which a job with an eta or a paused channel
+        becomes runnable, 0 if the runner can wait for a notification.
+        It is read from the wakeup index of the channels, which gives the
+        same time as ``Channel.get_wakeup_time`` on the root channel.
+        """
+        return self._root_channel._wakeups.get_wakeup_time()
+
+    def get_sequential_channel_names(self):
+        """Return the full names of the sequential channels.
+
+        >>> cm = ChannelManager()
+        >>> cm.simple_configure('root:4,A:2,B:1:sequential,A.C:1:sequential')
+        >>> sorted(cm.get_sequential_channel_names())
+        ['root.A.C', 'root.B']
+        """
+        return [
+            channel.fullname
+            for channel in self._channels_by_name.values()
+            if channel.sequential
+        ]
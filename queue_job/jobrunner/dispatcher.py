@@ -0,0 +1,253 @@
+# Copyright 2025 Camptocamp SA
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl.html)
+"""
+Dispatch of jobs to the Odoo workers
+------------------------------------
+
+The job runner does not run jobs itself, it asks Odoo to run them through
+an anonymous ``/queue_job/runjob`` HTTP request. The dispatcher sends these
+requests from an asyncio event loop running in a dedicated thread, so the
+runner loop never waits for them.
+
+At most ``concurrency`` requests are in flight at the same time, further
+requests wait for a free slot. Connections are kept alive and reused
+between requests, which avoids a TCP (and TLS) handshake for each job
+when a channel releases many short jobs at once.
+"""
+
+import asyncio
+import base64
+import logging
+import ssl
+import threading
+import time
+from collections import deque
+
+_logger = logging.getLogger(__name__)
+
+DEFAULT_CONCURRENCY = 64
+# we are not interested in the result, so we set a short timeout
+# but not too short so we trap and log hard configuration errors
+HTTP_TIMEOUT = 1  # seconds
+# idle keep-alive connections older than this are closed rather than reused,
+# the server has probably closed them already
+HTTP_IDLE_TIMEOUT = 30  # seconds
+
+
+class HttpError(Exception):
+    """The Odoo server answered with an error status."""
+
+
+class DispatchStats:
+    """Counters of the requests sent by a dispatcher."""
+
+    __slots__ = ("dispatched", "timeouts", "errors", "latency_total", "latency_max")
+
+    def __init__(self):
+        self.dispatched = 0
+        self.timeouts = 0
+        self.errors = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+
+    def add(self, latency):
+        self.dispatched += 1
+        self.latency_total += latency
+        self.latency_max = max(self.latency_max, latency)
+
+    @property
+    def latency_avg(self):
+        if not self.dispatched:
+            return 0.0
+        return self.latency_total / self.dispatched
+
+    def __str__(self):
+        return (
+            f"{self.dispatched} dispatched, {self.timeouts} timeouts, "
+            f"{self.errors} errors, latency avg {self.latency_avg:.3f}s "
+            f"max {self.latency_max:.3f}s"
+        )
+
+
+class AsyncHttpDispatcher:
+    """Send ``/queue_job/runjob`` requests from an asyncio event loop.
+
+    :meth:`dispatch` is thread-safe and returns immediately, the request
+    is sent by the event loop thread, which is started on first use or
+    by :meth:`start`.
+    """
+
+    def __init__(
+        self,
+        scheme="http",
+        host="localhost",
+        port=8069,
+        user=None,
+        password=None,
+        concurrency=DEFAULT_CONCURRENCY,
+    ):
+        self.scheme = scheme
+        self.host = host
+        self.port = int(port)
+        self.user = user
+        self.password = password
+        self.concurrency = concurrency
+        self.stats = DispatchStats()
+        self._loop = None
+        self._thread = None
+        self._ready = threading.Event()
+        self._semaphore = None
+        self._tasks = set()
+        self._idle = deque()  # (reader, writer, time of last use)
+        self._ssl_context = ssl.create_default_context() if scheme == "https" else None
+        headers = [f"Host: {self.host}:{self.port}", "Connection: keep-alive"]
+        if user:
+            credentials = base64.b64encode(f"{user}:{password or ''}".encode())
+            headers.append(f"Authorization: Basic {credentials.decode()}")
+        self._headers = "".join(header + "\r\n" for header in headers)
+
+    def _url(self, path):
+        return f"{self.scheme}://{self.host}:{self.port}{path}"
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._ready.clear()
+        self._thread = threading.Thread(
+            target=self._run_loop, name="queue_job_dispatcher", daemon=True
+        )
+        self._thread.start()
+        self._ready.wait()
+
+    def _run_loop(self):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        self._loop = loop
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._ready.set()
+        try:
+            loop.run_forever()
+        finally:
+            tasks = asyncio.all_tasks(loop)
+            for task in tasks:
+                task.cancel()
+            loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            while self._idle:
+                self._idle.popleft()[1].close()
+            loop.close()
+            self._loop = None
+
+    def stop(self):
+        if not (self._thread and self._thread.is_alive()):
+            return
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._thread = None
+        _logger.info("dispatcher stopped: %s", self.stats)
+
+    def dispatch(self, db_name, job_uuid):
+        """Ask Odoo to run a job, without waiting for the answer."""
+        self._dispatch_path(f"/queue_job/runjob?db={db_name}&job_uuid={job_uuid}")
+
+    def dispatch_batch(self, db_name, job_uuids):
+        """Ask Odoo to run several jobs in a single request."""
+        job_uuids = ",".join(job_uuids)
+        self._dispatch_path(f"/queue_job/runjobs?db={db_name}&job_uuids={job_uuids}")
+
+    def _dispatch_path(self, path):
+        self.start()
+        self._loop.call_soon_threadsafe(self._spawn, path, time.monotonic())
+
+    def _spawn(self, path, dispatch_time):
+        task = self._loop.create_task(self._dispatch(path, dispatch_time))
+        # keep a reference on the task until it is done, the event loop
+        # only keeps weak references
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _dispatch(self, path, dispatch_time):
+        async with self._semaphore:
+            try:
+                await asyncio.wait_for(self._get(path), HTTP_TIMEOUT)
+            except asyncio.TimeoutError:
+                # A timeout is a normal behaviour, it shouldn't be logged as
+                # an exception
+                self.stats.timeouts += 1
+            except Exception:
+                self.stats.errors += 1
+                _logger.exception("exception in GET %s", self._url(path))
+        latency = time.monotonic() - dispatch_time
+        self.stats.add(latency)
+        _logger.debug("GET %s dispatched in %.3fs", self._url(path), latency)
+
+    async def _get(self, path):
+        request = f"GET {path} HTTP/1.1\r\n{self._headers}\r\n".encode("latin-1")
+        while True:
+            reader, writer, reused = await self._acquire_connection()
+            try:
+                writer.write(request)
+                await writer.drain()
+                status, keep_alive = await self._read_response(reader)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                writer.close()
+                if reused:
+                    # the server closed the idle connection in the meantime
+                    continue
+                raise
+            except BaseException:
+                # includes the cancellation on timeout: the response is not
+                # read so the connection cannot be reused
+                writer.close()
+                raise
+            if keep_alive:
+                self._idle.append((reader, writer, time.monotonic()))
+            else:
+                writer.close()
+            if status >= 400:
+                # Client Error for HTTP Response codes between 400 and 500
+                # or a Server Error for codes between 500 and 600
+                raise HttpError(f"{status} for url {self._url(path)}")
+            return status
+
+    async def _acquire_connection(self):
+        now = time.monotonic()
+        while self._idle:
+            reader, writer, last_use = self._idle.pop()
+            if now - last_use < HTTP_IDLE_TIMEOUT and not reader.at_eof():
+                return reader, writer, True
+            writer.close()
+        reader, writer = await asyncio.open_connection(
+            self.host,
+            self.port,
+            ssl=self._ssl_context,
+            server_hostname=self.host if self._ssl_context else None,
+        )
+        return reader, writer, False
+
+    async def _read_response(self, reader):
+        """Read a response, return its status and if the connection is reusable"""
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionResetError("connection closed by the server")
+        version, status = status_line.decode("latin-1").split(None, 2)[:2]
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, __, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip().lower()
+        keep_alive = version == "HTTP/1.1" and headers.get("connection") != "close"
+        if "chunked" in headers.get("transfer-encoding", ""):
+            while True:
+                size = int((await reader.readline()).split(b";")[0], 16)
+                await reader.readexactly(size + 2)  # chunk and its CRLF
+                if not size:
+                    break
+        elif "content-length" in headers:
+            await reader.readexactly(int(headers["content-length"]))
+        else:
+            # body delimited by the end of the connection
+            await reader.read()
+            keep_alive = False
+        return int(status), keep_alive
@@ -0,0 +1,394 @@
+# Copyright 2025 Camptocamp SA
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl.html)
+"""
+Execution of jobs in a pool of local processes
+----------------------------------------------
+
+With the ``process`` executor, the job runner does not send
+``/queue_job/runjob`` requests. It sends the uuids of the jobs to run to a
+pool of local worker processes. The workers keep the registries of the
+databases loaded from one job to the next, and run the jobs with the code
+of the ``/queue_job/runjob`` route, without the cost of the HTTP request
+(parsing, session, routing).
+
+The jobs run on the host of the runner, the HTTP executor remains the
+default and is required to run the jobs on other hosts, behind a load
+balancer for instance.
+
+A job is sent to an idle worker, the jobs dispatched while all the workers
+are busy wait for one to be free: use at least as many workers as the
+capacity of the root channel. A worker which dies is replaced, the job it
+was running is requeued by the detection of dead jobs.
+
+Forking a process which runs threads can leave the child with locks held
+by threads which do not exist in the child. The workers are forked by a
+spawner process, itself forked when the pool starts, before the runner
+starts its threads, and which never runs threads. Like the Odoo workers,
+the workers apply ``limit_time_cpu``, ``limit_time_real``,
+``limit_memory_soft`` and ``limit_memory_hard``, a batch of jobs counting
+as a request.
+"""
+
+import functools
+import logging
+import multiprocessing
+import os
+import resource
+import signal
+import threading
+import time
+from collections import deque
+from multiprocessing import reduction
+from multiprocessing.connection import Connection, wait
+
+import psutil
+
+from odoo import SUPERUSER_ID, api, sql_db
+from odoo.modules.registry import Registry
+from odoo.tools import config
+
+from ..controllers.main import RunJobController
+from .dispatcher import DispatchStats
+
+_logger = logging.getLogger(__name__)
+
+DEFAULT_PROCESS_WORKERS = 4
+# delay given to the workers to finish their job when the pool is stopped
+STOP_TIMEOUT = 30  # seconds
+
+# database connections and registries inherited from the parent process,
+# see _forget_inherited_connections
+_inherited = []
+
+
+def _forget_inherited_connections():
+    """Do not use the database connections of the parent process
+
+    The connections opened before the fork are shared with the parent. They
+    are kept referenced, so they are never closed by the worker (which would
+    close them for the parent too), and new ones are opened.
+    """
+    _inherited.append(sql_db._Pool)
+    sql_db._Pool = None
+    if hasattr(sql_db, "_Pool_readonly"):
+        _inherited.append(sql_db._Pool_readonly)
+        sql_db._Pool_readonly = None
+    _inherited.append(list(Registry.registries.values()))
+    Registry.registries.clear()
+
+
+def _run_job(controller, db_name, job_uuid):
+    threading.current_thread().dbname = db_name
+    registry = Registry(db_name).check_signaling()
+    with registry.manage_changes(), registry.cursor() as cr:
+        env = api.Environment(cr, SUPERUSER_ID, {})
+        controller._runjob(env, job_uuid)
+
+
+def _run_batch(controller, db_name, job_uuids):
+    threading.current_thread().dbname = db_name
+    return controller._runjobs(
+        db_name, job_uuids, functools.partial(_run_job, controller, db_name)
+    )
+
+
+def _set_limits():
+    """Set the limits of a batch of jobs, like Odoo for a request"""
+    if config["limit_time_cpu"]:
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        cpu_time = usage.ru_utime + usage.ru_stime
+        __, hard = resource.getrlimit(resource.RLIMIT_CPU)
+        resource.setrlimit(
+            resource.RLIMIT_CPU, (int(cpu_time + config["limit_time_cpu"]), hard)
+        )
+    if config["limit_time_real"]:
+        # SIGALRM kills the worker, like the watchdog of the Odoo workers
+        signal.alarm(config["limit_time_real"])
+
+
+def _memory_exceeded():
+    if not config["limit_memory_soft"]:
+        return False
+    # like the Odoo workers, which check the virtual memory size
+    return psutil.Process(os.getpid()).memory_info().vms > config["limit_memory_soft"]
+
+
+def _worker_main(conn, max_jobs):
+    """Run the batches of jobs received on ``conn`` until ``None`` is received
+
+    Each job runs in its own transaction. For each batch, the worker sends
+    back ``(success, stop)``: ``success`` is ``False`` if one of the jobs
+    failed, ``stop`` is ``True`` when the worker exits after the batch.
+    """
+    # the runner stops the workers, a worker dies only when it is killed
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    for sig in (signal.SIGTERM, signal.SIGHUP, signal.SIGXCPU, signal.SIGALRM):
+        signal.signal(sig, signal.SIG_DFL)
+    if config["limit_memory_hard"]:
+        __, hard = resource.getrlimit(resource.RLIMIT_AS)
+        resource.setrlimit(resource.RLIMIT_AS, (config["limit_memory_hard"], hard))
+    _forget_inherited_connections()
+    controller = RunJobController()
+    for count in range(1, max_jobs + 1):
+        try:
+            message = conn.recv()
+        except EOFError:
+            # the runner is gone
+            break
+        if message is None:
+            break
+        db_name, job_uuids = message
+        _set_limits()
+        try:
+            success = _run_batch(controller, db_name, job_uuids)
+        except Exception:
+            _logger.exception(
+                "exception while running jobs %s on db %s",
+                ", ".join(job_uuids),
+                db_name,
+            )
+            success = False
+        signal.alarm(0)
+        # when max_jobs is reached or the memory used is too high, the worker
+        # exits and is replaced by a new one
+        stop = count == max_jobs or _memory_exceeded()
+        conn.send((success, stop))
+        if stop:
+            break
+
+
+def _spawner_main(conn, max_jobs):
+    """Fork a worker each time ``True`` is received on ``conn``
+
+    The pid of the worker and the file descriptor of its connection are sent
+    back on ``conn``. The spawner stops when ``None`` is received.
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    for sig in (signal.SIGTERM, signal.SIGHUP, signal.SIGCHLD):
+        signal.signal(sig, signal.SIG_DFL)
+    context = multiprocessing.get_context("fork")
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            # the runner is gone
+            break
+        if message is None:
+            break
+        # reap the workers which exited
+        multiprocessing.active_children()
+        worker_conn, child_conn = context.Pipe()
+        process = context.Process(
+            target=_worker_main,
+            args=(child_conn, max_jobs),
+            name="queue_job_executor",
+            daemon=True,
+        )
+        process.start()
+        child_conn.close()
+        conn.send(process.pid)
+        reduction.send_handle(conn, worker_conn.fileno(), os.getppid())
+        worker_conn.close()
+
+
+class _Worker:
+    __slots__ = ("pid", "conn", "job")
+
+    def __init__(self, pid, conn):
+        self.pid = pid
+        self.conn = conn
+        # (db_name, job_uuids, dispatch time) of the batch running
+        self.job = None
+
+
+class ProcessPoolDispatcher:
+    """Run the jobs in a pool of worker processes.
+
+    It has the interface of :class:`~.dispatcher.AsyncHttpDispatcher`:
+    :meth:`dispatch` is thread-safe and returns immediately. The jobs are
+    sent to the workers by a thread, which also collects their results and
+    replaces the workers which died or ran ``max_jobs`` jobs.
+
+    :meth:`start` forks the spawner process, it must be called before the
+    runner starts its threads.
+    """
+
+    def __init__(self, workers=DEFAULT_PROCESS_WORKERS, max_jobs=None):
+        self.workers = workers
+        # like the Odoo workers, which are recycled after limit_request
+        # requests, so the memory leaked by the jobs is given back
+        self.max_jobs = max_jobs or config["limit_request"] or 65536
+        self.stats = DispatchStats()
+        self._context = multiprocessing.get_context("fork")
+        self._spawner = None
+        self._spawner_conn = None
+        self._workers = {}  # by connection
+        self._idle = deque()
+        self._pending = deque()  # (db_name, job_uuids, dispatch time)
+        self._wakeup = None
+        self._stopping = False
+        self._thread = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        if threading.active_count() > 1:
+            _logger.warning(
+                "the spawner of the process pool executor is forked from a "
+                "process running threads, use the standalone runner or the "
+                "prefork server"
+            )
+        self._stopping = False
+        self._wakeup = os.pipe()
+        # a duplex pipe is a unix socket, the spawner sends the file
+        # descriptors of the connections of the workers on it
+        self._spawner_conn, child_conn = self._context.Pipe()
+        # not a daemon, daemon processes cannot have children
+        self._spawner = self._context.Process(
+            target=_spawner_main,
+            args=(child_conn, self.max_jobs),
+            name="queue_job_spawner",
+        )
+        self._spawner.start()
+        child_conn.close()
+        for __ in range(self.workers):
+            self._spawn()
+        self._thread = threading.Thread(
+            target=self._run, name="queue_job_executor", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        if not (self._thread and self._thread.is_alive()):
+            return
+        self._stopping = True
+        os.write(self._wakeup[1], b".")
+        self._thread.join()
+        self._thread = None
+        for fd in self._wakeup:
+            os.close(fd)
+        self._wakeup = None
+        _logger.info("process pool executor stopped: %s", self.stats)
+
+    def dispatch(self, db_name, job_uuid):
+        """Run a job in a worker, without waiting for its end."""
+        self.dispatch_batch(db_name, [job_uuid])
+
+    def dispatch_batch(self, db_name, job_uuids):
+        """Run several jobs, one after the other, in the same worker."""
+        self.start()
+        self._pending.append((db_name, tuple(job_uuids), time.monotonic()))
+        os.write(self._wakeup[1], b".")
+
+    def _spawn(self):
+        self._spawner_conn.send(True)
+        pid = self._spawner_conn.recv()
+        conn = Connection(reduction.recv_handle(self._spawner_conn))
+        self._workers[conn] = _Worker(pid, conn)
+        self._idle.append(conn)
+
+    def _run(self):
+        try:
+            while not self._stopping:
+                self._send_pending()
+                for ready in wait([*self._workers, self._wakeup[0]]):
+                    if ready == self._wakeup[0]:
+                        os.read(self._wakeup[0], 4096)
+                    else:
+                        self._receive(self._workers[ready])
+        finally:
+            self._stop_workers()
+
+    def _send_pending(self):
+        while self._pending and self._idle:
+            worker = self._workers[self._idle.popleft()]
+            job = self._pending.popleft()
+            try:
+                worker.conn.send(job[:2])
+            except OSError:
+                # the worker died, the job is sent to another one
+                self._pending.appendleft(job)
+                self._replace(worker)
+                continue
+            worker.job = job
+            _logger.debug("running jobs %s on db %s", ", ".join(job[1]), job[0])
+
+    def _receive(self, worker):
+        try:
+            success, stop = worker.conn.recv()
+        except (EOFError, OSError):
+            self._replace(worker)
+            return
+        __, __, dispatch_time = worker.job
+        worker.job = None
+        if stop:
+            # the worker exits after its batch
+            self._replace(worker)
+        else:
+            self._idle.append(worker.conn)
+        if not success:
+            self.stats.errors += 1
+        self.stats.add(time.monotonic() - dispatch_time)
+
+    def _replace(self, worker):
+        del self._workers[worker.conn]
+        if worker.conn in self._idle:
+            self._idle.remove(worker.conn)
+        worker.conn.close()
+        if worker.job:
+            self.stats.errors += 1
+            _logger.error(
+                "worker %s died while running jobs %s on db %s",
+                worker.pid,
+                ", ".join(worker.job[1]),
+                worker.job[0],
+            )
+        if not self._stopping:
+            self._spawn()
+
+    def _stop_workers(self):
+        workers = {worker.conn: worker for worker in self._workers.values()}
+        for conn in workers:
+            try:
+                conn.send(None)
+            except OSError:
+                pass
+        # a worker has exited when its connection is closed
+        deadline = time.monotonic() + STOP_TIMEOUT
+        running = dict(workers)
+        while running:
+            ready = wait(list(running), max(0, deadline - time.monotonic()))
+            if not ready:
+                break
+            for conn in ready:
+                try:
+                    conn.recv()
+                except (EOFError, OSError):
+                    del running[conn]
+        for worker in running.values():
+            _logger.warning("worker %s did not stop, killing it", worker.pid)
+            try:
+                os.kill(worker.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        for conn in workers:
+            conn.close()
+        self._workers = {}
+        self._idle.clear()
+        self._pending.clear()
+        self._stop_spawner()
+
+    def _stop_spawner(self):
+        if not self._spawner:
+            return
+        try:
+            self._spawner_conn.send(None)
+        except OSError:
+            pass
+        # the spawner reaps the workers before it exits
+        self._spawner.join(STOP_TIMEOUT)
+        if self._spawner.is_alive():
+            self._spawner.kill()
+            self._spawner.join()
+        self._spawner_conn.close()
+        self._spawner = self._spawner_conn = None
@@ -16,7 +16,11 @@ How does it work?
 * It maintains an in-memory priority queue of jobs that
   is populated from the queue_job tables in all databases.
 * It does not run jobs itself, but asks Odoo to run them through an
-  anonymous ``/queue_job/runjob`` HTTP request. [1]_
+  anonymous ``/queue_job/runjob`` HTTP request. [1]_ Alternatively, it
+  sends them to a pool of local worker processes (``executor = process``).
+* The jobs of a function with a batch size greater than 1 are sent by
+  batches of jobs of the same channel, in a single ``/queue_job/runjobs``
+  request, each job still runs in its own transaction.
 
 How to use it?
 --------------
@@ -31,6 +35,28 @@ How to use it?
   - ``ODOO_QUEUE_JOB_PORT=443``, default ``http_port`` or 8069 if unset.
   - ``ODOO_QUEUE_JOB_HTTP_AUTH_USER=jobrunner``, default empty.
   - ``ODOO_QUEUE_JOB_HTTP_AUTH_PASSWORD=s3cr3t``, default empty.
+  - ``ODOO_QUEUE_JOB_HTTP_CONCURRENCY=64``, maximum number of
+    ``/queue_job/runjob`` requests in flight, default 64.
+  - ``ODOO_QUEUE_JOB_EXECUTOR=process``, run the jobs in a pool of worker
+    processes forked by the runner instead of sending ``/queue_job/runjob``
+    requests, default ``http``. The jobs then run on the host of the runner,
+    with the ``limit_time_*`` and ``limit_memory_*`` options of Odoo. Use it
+    with the standalone runner or the prefork server: the workers are forked
+    by a process forked when the runner starts, which must not run threads.
+  - ``ODOO_QUEUE_JOB_PROCESS_WORKERS=4``, number of worker processes of
+    the ``process`` executor, default 4. Use at least the capacity of the
+    root channel.
+  - ``ODOO_QUEUE_JOB_REQUEUE_INTERVAL=5``, delay in seconds between two
+    detections of dead jobs, default 5.
+  - ``ODOO_QUEUE_JOB_REQUEUE_JITTER=1``, random variation in seconds of
+    this delay, default 1.
+  - ``ODOO_QUEUE_JOB_NOTIFY_PAYLOAD=1``, the notifications sent when a job
+    changes carry its channel, priority, eta and state, so the runner
+    does not have to read the job again. Default empty (disabled). It must
+    be set on the Odoo server when the module is installed or updated.
+  - ``ODOO_QUEUE_JOB_SHARDED=1``, several runners dispatch the jobs of a
+    database at the same time, each one for its own share of the top-level
+    channels (see `Sharded runners`_). Default empty (disabled).
   - ``ODOO_QUEUE_JOB_JOBRUNNER_DB_HOST=master-db``, default ``db_host``
     or ``False`` if unset.
   - ``ODOO_QUEUE_JOB_JOBRUNNER_DB_PORT=5432``, default ``db_port``
@@ -52,6 +78,13 @@ How to use it?
   port = 443
   http_auth_user = jobrunner
   http_auth_password = s3cr3t
+  http_concurrency = 64
+  executor = http
+  process_workers = 4
+  requeue_interval = 5
+  requeue_jitter = 1
+  notify_payload = 1
+  sharded = 1
   jobrunner_db_host = master-db
   jobrunner_db_port = 5432
   jobrunner_db_user = userdb
@@ -101,6 +134,7 @@ How to use it?
   ...INFO...queue_job.jobrunner.runner: initializing database connections
   ...INFO...queue_job.jobrunner.runner: queue job runner ready for db <dbname>
   ...INFO...queue_job.jobrunner.runner: database connections ready
+  ...INFO...queue_job.jobrunner.runner: loaded <n> jobs of db <dbname> in ...
 
 * Create jobs (eg using base_import_async) and observe they
   start immediately and in parallel.
@@ -108,6 +142,27 @@ How to use it?
 * Tip: to enable debug logging for the queue job, use
   ``--log-handler=odoo.addons.queue_job:DEBUG``
 
+Sharded runners
+---------------
+
+By default, a single runner dispatches the jobs of a database: the other
+runners wait for its master lock. With ``sharded`` enabled, every runner
+takes a shared lock instead, and the top-level channels (``root.A``,
+``root.B``, ...) with their subchannels, plus the jobs of the root
+channel itself, are distributed among the runners holding it. A runner
+dispatches the jobs of a shard only while it holds the advisory lock of
+the shard, so a channel is never dispatched by two runners and its
+capacity is respected. The shards are distributed again every few
+seconds, when a runner starts or stops (or dies and its connection is
+closed), and when a new top-level channel shows up.
+
+* All the runners must be sharded, a sharded runner does not start while
+  a runner that is not sharded has the master lock, and the other way
+  around.
+* Configure the same channels on all the runners. The capacity of a
+  top-level channel is enforced by the runner owning it, the capacity of
+  the root channel applies to each runner.
+
 Caveat
 ------
 
@@ -123,26 +178,47 @@ Caveat
        of running Odoo is obviously not for production purposes.
 """
 
+import json
 import logging
 import os
+import random
 import selectors
 import threading
 import time
+import zlib
+from collections import defaultdict
 from contextlib import closing, contextmanager
+from datetime import datetime
+from decimal import Decimal
 
 import psycopg2
-import requests
 from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
 
 import odoo
-from odoo.tools import config
+from odoo.tools import config, str2bool
 
 from . import queue_job_config
-from .channels import ENQUEUED, NOT_DONE, ChannelManager
+from .channels import ENQUEUED, FAILED, PENDING, STARTED, ChannelManager
+from .dispatcher import DEFAULT_CONCURRENCY, AsyncHttpDispatcher
+from .executor import DEFAULT_PROCESS_WORKERS, ProcessPoolDispatcher
 
 SELECT_TIMEOUT = 60
 ERROR_RECOVERY_DELAY = 5
+# number of jobs read in each batch of the startup load
+LOAD_BATCH_SIZE = 10000
+# minimum delay between two progress messages of the startup load
+LOAD_LOG_INTERVAL = 10  # seconds
+# delay between two detections of dead jobs, and its random variation
+REQUEUE_INTERVAL = 5  # seconds
+REQUEUE_JITTER = 1  # seconds
 PG_ADVISORY_LOCK_ID = 2293787760715711918
+# high 32 bits of the advisory locks of the shards, the low 32 bits are the
+# key of the shard
+PG_SHARD_LOCK_CLASS = 1850216853
+# delay between two distributions of the shards between the sharded runners
+SHARD_REBALANCE_INTERVAL = 10  # seconds
+# delay before trying again to acquire a shard held by another runner
+SHARD_RETRY_INTERVAL = 1  # seconds
 
 _logger = logging.getLogger(__name__)
 
@@ -189,45 +265,138 @@ def _connection_info_for(db_name):
     return connection_info
 
 
-def _async_http_get(scheme, host, port, user, password, db_name, job_uuid):
-    # TODO: better way to HTTP GET asynchronously (grequest, ...)?
-    #       if this was python3 I would be doing this with
-    #       asyncio, aiohttp and aiopg
-    def urlopen():
-        url = f"{scheme}://{host}:{port}/queue_job/runjob?db={db_name}&job_uuid={job_uuid}"
-        # pylint: disable=except-pass
-        try:
-            auth = None
-            if user:
-                auth = (user, password)
-            # we are not interested in the result, so we set a short timeout
-            # but not too short so we trap and log hard configuration errors
-            response = requests.get(url, timeout=1, auth=auth)
-
-            # raise_for_status will result in either nothing, a Client Error
-            # for HTTP Response codes between 400 and 500 or a Server Error
-            # for codes between 500 and 600
-            response.raise_for_status()
-        except requests.Timeout:
-            # A timeout is a normal behaviour, it shouldn't be logged as an exception
-            pass
-        except Exception:
-            _logger.exception("exception in GET %s", url)
-
-    thread = threading.Thread(target=urlopen)
-    thread.daemon = True
-    thread.start()
+def _parse_notification(payload):
+    """Parse the payload of a notification sent by the queue_job_notify trigger
+
+    Return a tuple ``(uuid, job_datas)``. ``job_datas`` has the same columns
+    as :meth:`Database.select_jobs` when the trigger sends them, it is
+    ``False`` when the job has been deleted and ``None`` when the job must
+    be read in the table (the payload is only the uuid).
+
+    >>> _parse_notification("8f2f4c8e")
+    ('8f2f4c8e', None)
+    >>> _parse_notification('["8f2f4c8e"]')
+    ('8f2f4c8e', False)
+    >>> _parse_notification(
+    ...     '["root.sub", "8f2f4c8e", 42, "2024-03-01T10:00:00.5", 10, '
+    ...     '1709287200.000000, "pending"]'
+    ... )  # doctest: +NORMALIZE_WHITESPACE
+    ('8f2f4c8e', ('root.sub', '8f2f4c8e', 42,
+                  datetime.datetime(2024, 3, 1, 10, 0, 0, 500000), 10,
+                  Decimal('1709287200.000000'), 'pending'))
+    """
+    if not payload.startswith("["):
+        return payload, None
+    # numbers are parsed as the values returned by psycopg2 for the same
+    # columns, so they compare equal in the channel manager
+    job_datas = json.loads(payload, parse_float=Decimal)
+    if len(job_datas) == 1:
+        # the job has been deleted
+        return job_datas[0], False
+    channel, uuid, seq, date_created, priority, eta, state = job_datas
+    try:
+        date_created = datetime.fromisoformat(date_created)
+    except (TypeError, ValueError):
+        _logger.debug("cannot decode notification %s", payload, exc_info=True)
+        return uuid, None
+    return uuid, (channel, uuid, seq, date_created, priority, eta, state)
+
+
+def _shard_of(channel_name):
+    """Return the shard of a channel: its top-level channel
+
+    >>> _shard_of("root.A.B")
+    'root.A'
+    >>> _shard_of("A")
+    'root.A'
+    >>> _shard_of("root")
+    'root'
+    >>> _shard_of(None)
+    'root'
+    """
+    if not channel_name:
+        return "root"
+    parts = channel_name.split(".")
+    if parts[0] == "root":
+        parts = parts[1:]
+    if not parts or not parts[0]:
+        return "root"
+    return "root." + parts[0]
+
+
+def _shard_key(shard):
+    """Return the key of a shard, stable across the runners
+
+    Shards with the same key share their advisory lock and always belong
+    to the same runner.
+    """
+    return zlib.crc32(shard.encode())
+
+
+def _channel_names(fullnames):
+    """Return the names of channels as they can be stored on the jobs
+
+    The channel manager accepts the channels of the jobs with or without
+    their ``root.`` prefix.
+
+    >>> _channel_names(["root", "root.A.B"])
+    ['root', '', 'root.A.B', 'A.B']
+    """
+    names = []
+    for fullname in fullnames:
+        if fullname == "root":
+            names += ["root", ""]
+        else:
+            names += [fullname, fullname[len("root.") :]]
+    return names
+
+
+def _shards_where(shards):
+    """Return the condition and arguments selecting the jobs of shards
+
+    >>> _shards_where(["root", "root.A_B"])  # doctest: +NORMALIZE_WHITESPACE
+    ('(channel = ANY(%s) OR channel LIKE ANY(%s) OR channel IS NULL)',
+     (['root', '', 'root.A_B', 'A_B'], ['root.A\\\\_B.%', 'A\\\\_B.%']))
+    """
+    names = []
+    patterns = []
+    with_null = False
+    for shard in sorted(shards):
+        if shard == "root":
+            names += ["root", ""]
+            with_null = True
+            continue
+        name = shard[len("root.") :]
+        names += [shard, name]
+        for prefix in (shard, name):
+            prefix = (
+                prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            )
+            patterns.append(prefix + ".%")
+    where = "channel = ANY(%s) OR channel LIKE ANY(%s)"
+    if with_null:
+        where += " OR channel IS NULL"
+    return f"({where})", (names, patterns)
 
 
 class Database:
-    def __init__(self, db_name):
+    def __init__(self, db_name, master=True, sharded=False):
+        """Connect to a database
+
+        The master connection holds the master runner lock and listens to
+        the notifications of the jobs, other connections only run queries.
+        A sharded master connection holds the lock in shared mode, with the
+        other sharded runners.
+        """
         self.db_name = db_name
+        self.sharded = sharded
+        self.has_batch_size = False
         connection_info = _connection_info_for(db_name)
         self.conn = psycopg2.connect(**connection_info)
         try:
             self.conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
             self.has_queue_job = self._has_queue_job()
-            if self.has_queue_job:
+            if self.has_queue_job and master:
                 self._acquire_master_lock()
                 self._initialize()
         except BaseException:
@@ -247,12 +416,83 @@ class Database:
 
     def _acquire_master_lock(self):
         """Acquire the master runner lock or raise MasterElectionLost"""
+        if self.sharded:
+            query = "SELECT pg_try_advisory_lock_shared(%s)"
+        else:
+            query = "SELECT pg_try_advisory_lock(%s)"
         with closing(self.conn.cursor()) as cr:
-            cr.execute("SELECT pg_try_advisory_lock(%s)", (PG_ADVISORY_LOCK_ID,))
+            cr.execute(query, (PG_ADVISORY_LOCK_ID,))
             if not cr.fetchone()[0]:
                 msg = f"could not acquire master runner lock on {self.db_name}"
                 raise MasterElectionLost(msg)
 
+    def get_runners(self):
+        """Return the number of sharded runners and the rank of this one
+
+        The runners are the connections holding the shared master lock,
+        ordered by backend pid, so all the runners agree on the ranks.
+        """
+        with closing(self.conn.cursor()) as cr:
+            cr.execute(
+                """
+                SELECT l.pid
+                FROM pg_locks l
+                JOIN pg_database d ON d.oid = l.database
+                WHERE l.locktype = 'advisory'
+                AND d.datname = current_database()
+                AND l.classid::bigint = %s
+                AND l.objid::bigint = %s
+                AND l.objsubid = 1
+                AND l.granted
+                ORDER BY l.pid
+                """,
+                (PG_ADVISORY_LOCK_ID >> 32, PG_ADVISORY_LOCK_ID & 0xFFFFFFFF),
+            )
+            pids = [pid for (pid,) in cr.fetchall()]
+            cr.execute("SELECT pg_backend_pid()")
+            pid = cr.fetchone()[0]
+        return len(pids), pids.index(pid)
+
+    def get_shards(self):
+        """Return the shards of the channels of the jobs
+
+        The distinct channels are read with a loose scan of the index on the
+        channel, which reads one entry per channel, whatever the number of
+        jobs.
+        """
+        with closing(self.conn.cursor()) as cr:
+            cr.execute(
+                """
+                WITH RECURSIVE channels AS (
+                    (SELECT channel FROM queue_job
+                     WHERE channel IS NOT NULL ORDER BY channel LIMIT 1)
+                    UNION ALL
+                    SELECT (SELECT channel FROM queue_job
+                            WHERE channel > c.channel ORDER BY channel LIMIT 1)
+                    FROM channels c
+                    WHERE c.channel IS NOT NULL
+                )
+                SELECT channel FROM channels WHERE channel IS NOT NULL
+                """
+            )
+            return {_shard_of(channel) for (channel,) in cr.fetchall()}
+
+    def acquire_shard(self, shard):
+        """Try to acquire the advisory lock of a shard, return True if held"""
+        with closing(self.conn.cursor()) as cr:
+            cr.execute(
+                "SELECT pg_try_advisory_lock(%s)",
+                ((PG_SHARD_LOCK_CLASS << 32) | _shard_key(shard),),
+            )
+            return cr.fetchone()[0]
+
+    def release_shard(self, shard):
+        with closing(self.conn.cursor()) as cr:
+            cr.execute(
+                "SELECT pg_advisory_unlock(%s)",
+                ((PG_SHARD_LOCK_CLASS << 32) | _shard_key(shard),),
+            )
+
     def _has_queue_job(self):
         with closing(self.conn.cursor()) as cr:
             cr.execute(
@@ -285,6 +525,19 @@ class Database:
     def _initialize(self):
         with closing(self.conn.cursor()) as cr:
             cr.execute("LISTEN queue_job")
+            # the column is missing until the module is updated
+            cr.execute(
+                "SELECT 1 FROM information_schema.columns "
+                "WHERE table_name = %s AND column_name = %s",
+                ("queue_job_function", "batch_size"),
+            )
+            self.has_batch_size = bool(cr.fetchone())
+
+    _select_jobs_query = (
+        "SELECT channel, uuid, id as seq, date_created, "
+        "priority, EXTRACT(EPOCH FROM eta), state "
+        "FROM queue_job WHERE {where}"
+    )
 
     @contextmanager
     def select_jobs(self, where, args):
@@ -292,90 +545,132 @@ class Database:
         # the checker thinks we are injecting values but we are not, we are
         # adding the where conditions, values are added later properly with
         # parameters
-        query = (
-            "SELECT channel, uuid, id as seq, date_created, "
-            "priority, EXTRACT(EPOCH FROM eta), state "
-            f"FROM queue_job WHERE {where}"
-        )
+        query = self._select_jobs_query.format(where=where)
         with closing(self.conn.cursor("select_jobs", withhold=True)) as cr:
             cr.execute(query, args)
             yield cr
 
+    def select_jobs_batch(self, where, args, after, limit):
+        """Select the next ``limit`` jobs following the job ``after``
+
+        The jobs are ordered by priority, creation date and id, the order in
+        which the channels run them, so the most urgent jobs are loaded
+        first. ``after`` is the ``(priority, date_created, id)`` of the last
+        job of the previous batch, or ``None`` for the first batch: each batch
+        is a short scan of ``queue_job_pending_priority_partial_index``,
+        whatever the size of the table.
+        """
+        # pylint: disable=sql-injection
+        if after is not None:
+            where = f"({where}) AND (priority, date_created, id) > (%s, %s, %s)"
+            args = tuple(args) + tuple(after)
+        query = (
+            self._select_jobs_query.format(where=where)
+            + " ORDER BY priority, date_created, id LIMIT %s"
+        )
+        with closing(self.conn.cursor()) as cr:
+            cr.execute(query, tuple(args) + (limit,))
+            return cr.fetchall()
+
     def keep_alive(self):
         query = "SELECT 1"
         with closing(self.conn.cursor()) as cr:
             cr.execute(query)
 
     def set_job_enqueued(self, uuid):
+        self.set_jobs_enqueued([uuid])
+
+    def set_jobs_enqueued(self, uuids):
+        """Set the jobs to enqueued in a single query
+
+        Return the batch size of the job function of the updated jobs, by
+        uuid. Jobs deleted in the meantime are not part of the result.
+        """
+        if self.has_batch_size:
+            batch_size = (
+                "(SELECT batch_size FROM queue_job_function f "
+                "WHERE f.id = queue_job.job_function_id)"
+            )
+        else:
+            batch_size = "1"
+        # pylint: disable=sql-injection
         with closing(self.conn.cursor()) as cr:
             cr.execute(
                 "UPDATE queue_job SET state=%s, "
                 "date_enqueued=date_trunc('seconds', "
                 "                         now() at time zone 'utc') "
-                "WHERE uuid=%s",
-                (ENQUEUED, uuid),
+                "WHERE uuid = ANY(%s) "
+                f"RETURNING uuid, {batch_size}",
+                (ENQUEUED, list(uuids)),
             )
+            return {uuid: batch_size or 1 for uuid, batch_size in cr.fetchall()}
 
     def _query_requeue_dead_jobs(self):
         return """
-            UPDATE
-                queue_job
-            SET
-                state=(
-                    CASE
-                        WHEN
-                            max_retries IS NOT NULL AND
-                            max_retries != 0 AND -- infinite retries if max_retries is 0
-                            retry IS NOT NULL AND
-                            retry>max_retries
-                        THEN 'failed'
-                        ELSE 'pending'
-                    END),
-                retry=(
-                    CASE
-                        WHEN state='started'
-                        THEN COALESCE(retry,0)+1 ELSE retry
-                    END),
-                exc_name=(
-                    CASE
-                        WHEN
-                            max_retries IS NOT NULL AND
-                            max_retries != 0 AND -- infinite retries if max_retries is 0
-                            retry IS NOT NULL AND
-                            retry>max_retries
-                        THEN 'JobFoundDead'
-                        ELSE exc_name
-                    END),
-                exc_info=(
-                    CASE
-                        WHEN
-                            max_retries IS NOT NULL AND
-                            max_retries != 0 AND -- infinite retries if max_retries is 0
-                            retry IS NOT NULL AND
-                            retry>max_retries
-                        THEN 'Job found dead after too many retries'
-                        ELSE exc_info
-                    END)
-            WHERE
-                id in (
-                    SELECT
-                        queue_job_id
-                    FROM
-                        queue_job_lock
-                    WHERE
-                        queue_job_id in (
-                            SELECT
-                                id
-                            FROM
-                                queue_job
-                            WHERE
-                                state IN ('enqueued','started')
-                                AND date_enqueued <
-                                (now() AT TIME ZONE 'utc' - INTERVAL '10 sec')
-                        )
-                    FOR UPDATE SKIP LOCKED
-                )
-            RETURNING uuid
+            WITH candidates AS (
+                SELECT
+                    id
+                FROM
+                    queue_job
+                WHERE
+                    state IN ('enqueued','started')
+                    AND date_enqueued <
+                    (now() AT TIME ZONE 'utc' - INTERVAL '10 sec')
+            ),
+            requeued AS (
+                UPDATE
+                    queue_job
+                SET
+                    state=(
+                        CASE
+                            WHEN
+                                max_retries IS NOT NULL AND
+                                max_retries != 0 AND -- 0 is infinite retries
+                                retry IS NOT NULL AND
+                                retry>max_retries
+                            THEN 'failed'
+                            ELSE 'pending'
+                        END),
+                    retry=(
+                        CASE
+                            WHEN state='started'
+                            THEN COALESCE(retry,0)+1 ELSE retry
+                        END),
+                    exc_name=(
+                        CASE
+                            WHEN
+                                max_retries IS NOT NULL AND
+                                max_retries != 0 AND -- 0 is infinite retries
+                                retry IS NOT NULL AND
+                                retry>max_retries
+                            THEN 'JobFoundDead'
+                            ELSE exc_name
+                        END),
+                    exc_info=(
+                        CASE
+                            WHEN
+                                max_retries IS NOT NULL AND
+                                max_retries != 0 AND -- 0 is infinite retries
+                                retry IS NOT NULL AND
+                                retry>max_retries
+                            THEN 'Job found dead after too many retries'
+                            ELSE exc_info
+                        END)
+                WHERE
+                    id in (
+                        SELECT
+                            queue_job_id
+                        FROM
+                            queue_job_lock
+                        WHERE
+                            queue_job_id in (SELECT id FROM candidates)
+                        FOR UPDATE SKIP LOCKED
+                    )
+                RETURNING uuid
+            )
+            SELECT
+                (SELECT count(*) FROM candidates),
+                ARRAY(SELECT uuid FROM requeued)
             """
 
     def requeue_dead_jobs(self):
@@ -396,6 +691,11 @@ class Database:
         However, when the Odoo server crashes or is otherwise force-stopped,
         running jobs are interrupted while the runner has no chance to know
         they have been aborted.
+
+        Return the number of enqueued and started jobs examined, those
+        enqueued for more than 10sec, and the uuids of the jobs requeued.
+        The jobs examined are counted in the same query, on the index of
+        the jobs in flight.
         """
 
         with closing(self.conn.cursor()) as cr:
@@ -403,8 +703,112 @@ class Database:
 
             cr.execute(query)
 
-            for (uuid,) in cr.fetchall():
+            examined, uuids = cr.fetchone()
+            for uuid in uuids:
                 _logger.warning("Re-queued dead job with uuid: %s", uuid)
+            return examined, uuids
+
+
+class RequeueStats:
+    """Counters of the detections of dead jobs."""
+
+    __slots__ = ("runs", "examined", "requeued", "duration_total", "duration_last")
+
+    def __init__(self):
+        self.runs = 0
+        self.examined = 0
+        self.requeued = 0
+        self.duration_total = 0.0
+        self.duration_last = 0.0
+
+    def add(self, examined, requeued, duration):
+        self.runs += 1
+        self.examined += examined
+        self.requeued += requeued
+        self.duration_total += duration
+        self.duration_last = duration
+
+    def __str__(self):
+        return (
+            f"{self.runs} runs, {self.examined} jobs examined, "
+            f"{self.requeued} jobs requeued, "
+            f"{self.duration_total:.3f}s in queries"
+        )
+
+
+class DeadJobRequeuer:
+    """Requeue the dead jobs of the databases at a regular interval.
+
+    It runs in its own thread, on its own connections, so the detection of
+    dead jobs never delays the dispatch. The delay between two detections
+    is ``interval`` seconds, give or take a random ``jitter``, so that the
+    runners of several Odoo instances do not query at the same time.
+    """
+
+    def __init__(self, db_names, interval=REQUEUE_INTERVAL, jitter=REQUEUE_JITTER):
+        self.db_names = list(db_names)
+        self.interval = interval
+        self.jitter = jitter
+        self.stats = RequeueStats()
+        self._dbs = {}
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="queue_job_requeuer", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        if not self._thread:
+            return
+        self._stop_event.set()
+        self._thread.join()
+        self._thread = None
+        _logger.info("dead jobs requeuer stopped: %s", self.stats)
+
+    def _next_delay(self):
+        return max(0, self.interval + random.uniform(-self.jitter, self.jitter))
+
+    def _run(self):
+        try:
+            while True:
+                self.requeue_dead_jobs()
+                if self._stop_event.wait(self._next_delay()):
+                    break
+        finally:
+            for db in self._dbs.values():
+                db.close()
+            self._dbs = {}
+
+    def requeue_dead_jobs(self):
+        for db_name in self.db_names:
+            if self._stop_event.is_set():
+                break
+            try:
+                db = self._dbs.get(db_name)
+                if db is None:
+                    db = self._dbs[db_name] = Database(db_name, master=False)
+                start = time.monotonic()
+                examined, uuids = db.requeue_dead_jobs()
+                duration = time.monotonic() - start
+            except Exception:
+                _logger.exception("exception while requeuing dead jobs of %s", db_name)
+                # reconnect on the next detection
+                db = self._dbs.pop(db_name, None)
+                if db:
+                    db.close()
+                continue
+            self.stats.add(examined, len(uuids), duration)
+            _logger.debug(
+                "%d jobs examined, %d dead jobs requeued on db %s in %.3fs",
+                examined,
+                len(uuids),
+                db_name,
+                duration,
+            )
 
 
 class QueueJobRunner:
@@ -416,19 +820,55 @@ class QueueJobRunner:
         user=None,
         password=None,
         channel_config_string=None,
+        http_concurrency=DEFAULT_CONCURRENCY,
+        requeue_interval=REQUEUE_INTERVAL,
+        requeue_jitter=REQUEUE_JITTER,
+        sharded=False,
+        executor="http",
+        process_workers=DEFAULT_PROCESS_WORKERS,
     ):
+        self._stop_pipe = os.pipe()
+        if executor not in ("http", "process"):
+            raise ValueError(f"Unknown queue job executor {executor!r}")
         self.scheme = scheme
         self.host = host
         self.port = port
         self.user = user
         self.password = password
+        if executor == "http":
+            self.dispatcher = AsyncHttpDispatcher(
+                scheme=scheme,
+                host=host,
+                port=port,
+                user=user,
+                password=password,
+                concurrency=http_concurrency,
+            )
+        else:
+            self.dispatcher = ProcessPoolDispatcher(workers=process_workers)
         self.channel_manager = ChannelManager()
         if channel_config_string is None:
             channel_config_string = _channels()
         self.channel_manager.simple_configure(channel_config_string)
         self.db_by_name = {}
+        self.requeue_interval = requeue_interval
+        self.requeue_jitter = requeue_jitter
+        self.requeuer = None
+        self.sharded = sharded
+        # shards owned by this runner and shards known, by database name
+        self.shards_by_db = {}
+        self._known_shards = {}
+        self._next_rebalance = 0
+        # startup loaders of the databases, by database name
+        self._loaders = {}
+        # number of notifications received, and how many of them have been
+        # merged with another notification for the same job
+        self.notifications_count = 0
+        self.notifications_coalesced = 0
+        # number of jobs read in the table because the notification did not
+        # carry their values
+        self.jobs_refreshed = 0
         self._stop = False
-        self._stop_pipe = os.pipe()
 
     def __del__(self):
         # pylint: disable=except-pass
@@ -462,12 +902,36 @@ class QueueJobRunner:
         password = os.environ.get(
             "ODOO_QUEUE_JOB_HTTP_AUTH_PASSWORD"
         ) or queue_job_config.get("http_auth_password")
+        http_concurrency = os.environ.get(
+            "ODOO_QUEUE_JOB_HTTP_CONCURRENCY"
+        ) or queue_job_config.get("http_concurrency")
+        requeue_interval = os.environ.get(
+            "ODOO_QUEUE_JOB_REQUEUE_INTERVAL"
+        ) or queue_job_config.get("requeue_interval")
+        requeue_jitter = os.environ.get(
+            "ODOO_QUEUE_JOB_REQUEUE_JITTER"
+        ) or queue_job_config.get("requeue_jitter")
+        sharded = os.environ.get("ODOO_QUEUE_JOB_SHARDED") or queue_job_config.get(
+            "sharded"
+        )
+        executor = os.environ.get("ODOO_QUEUE_JOB_EXECUTOR") or queue_job_config.get(
+            "executor"
+        )
+        process_workers = os.environ.get(
+            "ODOO_QUEUE_JOB_PROCESS_WORKERS"
+        ) or queue_job_config.get("process_workers")
         runner = cls(
             scheme=scheme or "http",
             host=host or "localhost",
             port=port or 8069,
             user=user,
             password=password,
+            http_concurrency=int(http_concurrency or DEFAULT_CONCURRENCY),
+            requeue_interval=float(requeue_interval or REQUEUE_INTERVAL),
+            requeue_jitter=float(requeue_jitter or REQUEUE_JITTER),
+            sharded=str2bool(sharded or "0", default=False),
+            executor=executor or "http",
+            process_workers=int(process_workers or DEFAULT_PROCESS_WORKERS),
         )
         return runner
 
@@ -479,6 +943,9 @@ class QueueJobRunner:
         return db_names
 
     def close_databases(self, remove_jobs=True):
+        if self.requeuer:
+            self.requeuer.stop()
+            self.requeuer = None
         for db_name, db in self.db_by_name.items():
             try:
                 if remove_jobs:
@@ -487,41 +954,209 @@ class QueueJobRunner:
             except Exception:
                 _logger.warning("error closing database %s", db_name, exc_info=True)
         self.db_by_name = {}
+        self._loaders = {}
+        # the locks of the shards are released with the connections
+        self.shards_by_db = {}
+        self._known_shards = {}
 
     def initialize_databases(self):
         for db_name in sorted(self.get_db_names()):
             # sorting is important to avoid deadlocks in acquiring the master lock
-            db = Database(db_name)
+            db = Database(db_name, sharded=self.sharded)
             if db.has_queue_job:
                 self.db_by_name[db_name] = db
-                with db.select_jobs("state in %s", (NOT_DONE,)) as cr:
-                    for job_data in cr:
-                        self.channel_manager.notify(db_name, *job_data)
+                if self.sharded:
+                    # the jobs are loaded when the shards are acquired
+                    self.shards_by_db[db_name] = set()
+                    self._known_shards[db_name] = set()
+                    self._next_rebalance = 0
+                else:
+                    self._load_in_flight_jobs(db)
+                    self._loaders[db_name] = self._load_jobs(db)
                 _logger.info("queue job runner ready for db %s", db_name)
             else:
                 db.close()
+        # dead jobs are detected in the background, on other connections
+        self.requeuer = DeadJobRequeuer(
+            self.db_by_name, self.requeue_interval, self.requeue_jitter
+        )
+        self.requeuer.start()
 
-    def requeue_dead_jobs(self):
-        for db in self.db_by_name.values():
-            if db.has_queue_job:
-                db.requeue_dead_jobs()
+    def _load_in_flight_jobs(self, db, where=None, args=()):
+        """Load the running jobs and the failed jobs of sequential channels
+
+        The running jobs use the capacity of the channels and the failed jobs
+        block the sequential channels: they are loaded before anything is
+        dispatched, the other jobs are loaded in batches by the run loop.
+        ``where`` and ``args`` restrict the jobs to load.
+        """
+        in_flight_where = "state in %s OR (state = %s AND channel = ANY(%s))"
+        in_flight_args = (
+            (ENQUEUED, STARTED),
+            FAILED,
+            _channel_names(self.channel_manager.get_sequential_channel_names()),
+        )
+        if where:
+            in_flight_where = f"{where} AND ({in_flight_where})"
+            in_flight_args = tuple(args) + in_flight_args
+        with db.select_jobs(in_flight_where, in_flight_args) as cr:
+            for job_data in cr:
+                self.channel_manager.notify(db.db_name, *job_data)
+
+    def _load_jobs(self, db, where=None, args=()):
+        """Load the pending and failed jobs of a database, one batch at a time
+
+        This is a generator, each iteration loads a batch of jobs so the
+        runner can dispatch the jobs already loaded while loading the
+        remaining ones. Jobs waiting for their dependencies are not loaded,
+        the channel manager does not schedule them until they are pending.
+        ``where`` and ``args`` restrict the jobs to load.
+        """
+        load_where = "state in %s"
+        load_args = ((PENDING, FAILED),)
+        if where:
+            load_where = f"{where} AND {load_where}"
+            load_args = tuple(args) + load_args
+        start = last_log = time.monotonic()
+        count = 0
+        after = None
+        while True:
+            rows = db.select_jobs_batch(load_where, load_args, after, LOAD_BATCH_SIZE)
+            for job_data in rows:
+                self.channel_manager.notify(db.db_name, *job_data)
+            count += len(rows)
+            if len(rows) < LOAD_BATCH_SIZE:
+                break
+            _channel, _uuid, seq, date_created, priority = rows[-1][:5]
+            after = (priority, date_created, seq)
+            now = time.monotonic()
+            if now - last_log >= LOAD_LOG_INTERVAL:
+                last_log = now
+                _logger.info(
+                    "loading jobs of db %s: %d loaded (%.0f jobs/s)",
+                    db.db_name,
+                    count,
+                    count / (now - start),
+                )
+            yield count
+        elapsed = time.monotonic() - start
+        _logger.info(
+            "loaded %d jobs of db %s in %.2fs (%.0f jobs/s)",
+            count,
+            db.db_name,
+            elapsed,
+            count / elapsed if elapsed else 0,
+        )
+
+    def load_jobs(self):
+        """Load the next batch of jobs of the databases being loaded"""
+        for db_name, loader in list(self._loaders.items()):
+            if self._stop:
+                break
+            try:
+                next(loader)
+            except StopIteration:
+                del self._loaders[db_name]
+
+    def _owns(self, db_name, channel_name):
+        """Return True if the jobs of the channel are dispatched by this runner"""
+        if not self.sharded:
+            return True
+        shard = _shard_of(channel_name)
+        if shard not in self._known_shards.get(db_name, ()):
+            # a new top-level channel, distribute it without waiting
+            self._next_rebalance = 0
+        return shard in self.shards_by_db.get(db_name, ())
+
+    def rebalance_shards(self):
+        """Distribute the shards of the databases between the sharded runners
+
+        Each runner wants the shards whose key modulo the number of runners
+        is its rank, it releases the other ones and acquires the ones it
+        wants. A shard still held by its previous owner is acquired on a
+        next attempt, after the previous owner has released it.
+        """
+        if not self.sharded or time.monotonic() < self._next_rebalance:
+            return
+        self._next_rebalance = time.monotonic() + SHARD_REBALANCE_INTERVAL
+        configured = {
+            _shard_of(channel.fullname)
+            for channel in self.channel_manager._root_channel.children.values()
+        }
+        for db_name, db in self.db_by_name.items():
+            if self._stop:
+                break
+            count, rank = db.get_runners()
+            shards = db.get_shards() | configured | {"root"}
+            self._known_shards[db_name] = shards
+            wanted = {shard for shard in shards if _shard_key(shard) % count == rank}
+            owned = self.shards_by_db[db_name]
+            released = owned - wanted
+            for shard in released:
+                db.release_shard(shard)
+            owned -= released
+            acquired = {shard for shard in wanted - owned if db.acquire_shard(shard)}
+            owned |= acquired
+            if wanted - owned:
+                self._next_rebalance = min(
+                    self._next_rebalance, time.monotonic() + SHARD_RETRY_INTERVAL
+                )
+            if released:
+                # the jobs do not keep the name of their channel when it is
+                # not configured, reload the jobs of the shards still owned
+                self.channel_manager.remove_db(db_name)
+                for key in [key for key in self._loaders if key[0] == db_name]:
+                    del self._loaders[key]
+                to_load = owned
+            else:
+                to_load = acquired
+            if released or acquired:
+                _logger.info(
+                    "runner %d of %d on db %s: shards released %s, acquired %s",
+                    rank + 1,
+                    count,
+                    db_name,
+                    sorted(released) or "none",
+                    sorted(acquired) or "none",
+                )
+            if to_load:
+                where, args = _shards_where(to_load)
+                self._load_in_flight_jobs(db, where, args)
+                self._loaders[(db_name, tuple(sorted(to_load)))] = self._load_jobs(
+                    db, where, args
+                )
 
     def run_jobs(self):
         now = _odoo_now()
+        jobs_by_db = defaultdict(list)
         for job in self.channel_manager.get_jobs_to_run(now):
             if self._stop:
                 break
-            _logger.info("asking Odoo to run job %s on db %s", job.uuid, job.db_name)
-            self.db_by_name[job.db_name].set_job_enqueued(job.uuid)
-            _async_http_get(
-                self.scheme,
-                self.host,
-                self.port,
-                self.user,
-                self.password,
-                job.db_name,
-                job.uuid,
+            jobs_by_db[job.db_name].append(job)
+        for db_name, jobs in jobs_by_db.items():
+            if self._stop:
+                break
+            batch_sizes = self.db_by_name[db_name].set_jobs_enqueued(
+                [job.uuid for job in jobs]
             )
+            channels = {job.uuid: job.channel for job in jobs}
+            # jobs of a channel with the same batch size are run together
+            batches = {}
+            for uuid, batch_size in batch_sizes.items():
+                _logger.info("asking Odoo to run job %s on db %s", uuid, db_name)
+                if batch_size <= 1:
+                    self.dispatcher.dispatch(db_name, uuid)
+                    continue
+                key = (channels[uuid], batch_size)
+                batch = batches.setdefault(key, [])
+                batch.append(uuid)
+                if len(batch) == batch_size:
+                    self.dispatcher.dispatch_batch(db_name, batches.pop(key))
+            for batch in batches.values():
+                if len(batch) == 1:
+                    self.dispatcher.dispatch(db_name, batch[0])
+                else:
+                    self.dispatcher.dispatch_batch(db_name, batch)
 
     def process_notifications(self):
         for db in self.db_by_name.values():
@@ -531,19 +1166,59 @@ class QueueJobRunner:
                 # causing some intermediaries (such as haproxy) to close the
                 # connection, making the jobrunner to restart on a socket error
                 db.keep_alive()
-            while db.conn.notifies:
-                if self._stop:
-                    break
-                notification = db.conn.notifies.pop()
-                uuid = notification.payload
-                with db.select_jobs("uuid = %s", (uuid,)) as cr:
-                    job_datas = cr.fetchone()
-                    if job_datas:
+            if self._stop:
+                break
+            if not db.conn.notifies:
+                continue
+            # drain the notifications received since the previous iteration,
+            # a job updated several times is refreshed only once
+            notifications = db.conn.notifies[:]
+            del db.conn.notifies[:]
+            job_datas_by_uuid = {}
+            uuids_to_refresh = set()
+            for notification in notifications:
+                uuid, job_datas = _parse_notification(notification.payload)
+                if job_datas is None:
+                    uuids_to_refresh.add(uuid)
+                else:
+                    # the last notification has the current values
+                    job_datas_by_uuid[uuid] = job_datas
+            for uuid in uuids_to_refresh:
+                # values will be read from the table
+                job_datas_by_uuid.pop(uuid, None)
+            self.notifications_count += len(notifications)
+            self.notifications_coalesced += (
+                len(notifications) - len(uuids_to_refresh) - len(job_datas_by_uuid)
+            )
+            self.jobs_refreshed += len(uuids_to_refresh)
+            _logger.debug(
+                "%d notifications for %d jobs on db %s, %d read in the table",
+                len(notifications),
+                len(uuids_to_refresh) + len(job_datas_by_uuid),
+                db.db_name,
+                len(uuids_to_refresh),
+            )
+            for uuid, job_datas in job_datas_by_uuid.items():
+                if job_datas and self._owns(db.db_name, job_datas[0]):
+                    self.channel_manager.notify(db.db_name, *job_datas)
+                else:
+                    # deleted, or moved to a channel of another runner
+                    self.channel_manager.remove_job(uuid)
+            if not uuids_to_refresh:
+                continue
+            with db.select_jobs("uuid = ANY(%s)", (list(uuids_to_refresh),)) as cr:
+                for job_datas in cr:
+                    if self._owns(db.db_name, job_datas[0]):
+                        uuids_to_refresh.discard(job_datas[1])
                         self.channel_manager.notify(db.db_name, *job_datas)
-                    else:
-                        self.channel_manager.remove_job(uuid)
+            for uuid in uuids_to_refresh:
+                # the job does not exist anymore, or belongs to another runner
+                self.channel_manager.remove_job(uuid)
 
     def wait_notification(self):
+        if self._loaders:
+            # jobs remain to be loaded, no need to wait
+            return
         for db in self.db_by_name.values():
             if db.conn.notifies:
                 # something is going on in the queue, no need to wait
@@ -561,6 +1236,8 @@ class QueueJobRunner:
             timeout = SELECT_TIMEOUT
         else:
             timeout = wakeup_time - _odoo_now()
+        if self.sharded:
+            timeout = min(timeout, self._next_rebalance - time.monotonic())
         # wait for a notification or a timeout;
         # if timeout is negative (ie wakeup time in the past),
         # do not wait; this should rarely happen
@@ -588,6 +1265,7 @@ class QueueJobRunner:
 
     def run(self):
         _logger.info("starting")
+        self.dispatcher.start()
         while not self._stop:
             # outer loop does exception recovery
             try:
@@ -598,8 +1276,9 @@ class QueueJobRunner:
                 _logger.info("database connections ready")
                 # inner loop does the normal processing
                 while not self._stop:
-                    self.requeue_dead_jobs()
+                    self.rebalance_shards()
                     self.process_notifications()
+                    self.load_jobs()
                     self.run_jobs()
                     self.wait_notification()
             except KeyboardInterrupt:
@@ -622,4 +1301,5 @@ class QueueJobRunner:
                 self.close_databases()
                 time.sleep(ERROR_RECOVERY_DELAY)
         self.close_databases(remove_jobs=False)
+        self.dispatcher.stop()
         _logger.info("stopped")
@@ -0,0 +1,34 @@
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl.html)
+from openupgradelib import openupgrade
+
+
+@openupgrade.migrate()
+def migrate(env, version):
+    # Create the edges of the dependencies stored in json
+    openupgrade.logged_query(
+        env.cr,
+        """
+        INSERT INTO queue_job_dependency (parent_id, child_id, parent_done)
+        SELECT parent.id, child.id, parent.state = 'done'
+        FROM queue_job child
+        CROSS JOIN LATERAL json_array_elements_text(
+            child.dependencies::json -> 'depends_on'
+        ) parent_uuid
+        JOIN queue_job parent ON parent.uuid = parent_uuid
+        WHERE child.dependencies IS NOT NULL
+        ON CONFLICT (parent_id, child_id) DO NOTHING
+        """,
+    )
+    openupgrade.logged_query(
+        env.cr,
+        """
+        UPDATE queue_job
+        SET dependencies_remaining = remaining.count
+        FROM (
+            SELECT child_id, count(*) FILTER (WHERE NOT parent_done) AS count
+            FROM queue_job_dependency
+            GROUP BY child_id
+        ) remaining
+        WHERE queue_job.id = remaining.child_id
+        """,
+    )
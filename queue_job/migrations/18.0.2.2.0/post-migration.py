@@ -0,0 +1,44 @@
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl.html)
+import logging
+
+from openupgradelib import openupgrade
+
+from odoo.tools import split_every
+
+from odoo.addons.queue_job.job import Job, identity_exact, identity_exact_legacy
+
+_logger = logging.getLogger(__name__)
+
+
+@openupgrade.migrate()
+def migrate(env, version):
+    # The keys of identity_exact are no longer SHA-1 hashes of the
+    # representation of the job: recompute the keys of the jobs still to be
+    # executed, so they are found by the new jobs with the same identity.
+    env.cr.execute(
+        """
+        SELECT id FROM queue_job
+        WHERE identity_key IS NOT NULL
+        AND state NOT IN ('done', 'cancelled')
+        """
+    )
+    job_ids = [row[0] for row in env.cr.fetchall()]
+    updated = 0
+    for ids in split_every(1000, job_ids):
+        for record in env["queue.job"].browse(ids):
+            try:
+                job_ = Job._load_from_db_record(record)
+            except Exception:
+                # the model or the method of the job does not exist anymore
+                _logger.warning("cannot load job %s", record.uuid, exc_info=True)
+                continue
+            # only the keys of identity_exact can be recomputed
+            if job_.identity_key != identity_exact_legacy(job_):
+                continue
+            env.cr.execute(
+                "UPDATE queue_job SET identity_key = %s WHERE id = %s",
+                (identity_exact(job_), record.id),
+            )
+            updated += 1
+        env.invalidate_all()
+    _logger.info("identity key of %d jobs recomputed", updated)
@@ -4,3 +4,5 @@ from . import queue_job
 from . import queue_job_channel
 from . import queue_job_function
 from . import queue_job_lock
+from . import queue_job_dependency
+from . import queue_job_archive
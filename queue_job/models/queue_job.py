@@ -2,15 +2,18 @@
 # License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl.html)
 
 import logging
+import os
 import random
+import time
+from collections import Counter, defaultdict
 from datetime import datetime, timedelta
 
 from odoo import _, api, exceptions, fields, models
-from odoo.tools import config, html_escape, index_exists
+from odoo.tools import SQL, config, index_exists, str2bool
+from odoo.tools.lru import LRU
 
 from odoo.addons.base_sparse_field.models.fields import Serialized
 
-from ..delay import Graph
 from ..exception import JobError
 from ..fields import JobSerialized
 from ..job import (
@@ -23,9 +26,26 @@ from ..job import (
     WAIT_DEPENDENCIES,
     Job,
 )
+from ..post_init_hook import create_notify_function
 
 _logger = logging.getLogger(__name__)
 
+# levels and parents of the jobs of the graphs, by database and graph uuid
+_graph_topology_cache = LRU(64)
+
+
+def _dependency_uuids(dependencies):
+    """The uuids of the parents and of the children in ``dependencies``"""
+    dependencies = dependencies or {}
+    return (
+        frozenset(dependencies.get("depends_on", ())),
+        frozenset(dependencies.get("reverse_depends_on", ())),
+    )
+
+
+def _has_dependencies(dependencies):
+    return any(_dependency_uuids(dependencies))
+
 
 class QueueJob(models.Model):
     """Model storing the jobs to be executed."""
@@ -38,7 +58,14 @@ class QueueJob(models.Model):
     _order = "date_created DESC, date_done DESC"
 
     _removal_interval = 30  # days
+    # jobs deleted by transaction and duration of a run of the autovacuum
+    _autovacuum_batch_size = 1000
+    _autovacuum_time_budget = 600  # seconds
     _default_related_action = "related_action_open_record"
+    # the jobs of a level of the dependency graph are collapsed above
+    _dependency_graph_fan_out_limit = 50
+    # number of levels of the dependency graph displayed at once
+    _dependency_graph_page_levels = 20
 
     # This must be passed in a context key "_job_edit_sentinel" to write on
     # protected fields. It protects against crafting "queue.job" records from
@@ -80,11 +107,16 @@ class QueueJob(models.Model):
         base_type=models.BaseModel,
     )
     dependencies = Serialized(readonly=True)
+    dependencies_remaining = fields.Integer(
+        readonly=True,
+        default=0,
+        help="Number of jobs this job depends on which are not done yet.",
+    )
     # dependency graph as expected by the field widget
     dependency_graph = Serialized(compute="_compute_dependency_graph")
     graph_jobs_count = fields.Integer(compute="_compute_graph_jobs_count")
-    args = JobSerialized(readonly=True, base_type=tuple)
-    kwargs = JobSerialized(readonly=True, base_type=dict)
+    args = JobSerialized(readonly=True, base_type=tuple, lazy=True)
+    kwargs = JobSerialized(readonly=True, base_type=dict, lazy=True)
     func_string = fields.Char(string="Task", readonly=True)
 
     state = fields.Selection(STATES, readonly=True, required=True, index=True)
@@ -129,8 +161,11 @@ class QueueJob(models.Model):
     def init(self):
         index_1 = "queue_job_identity_key_state_partial_index"
         index_2 = "queue_job_channel_date_done_date_created_index"
+        index_3 = "queue_job_in_flight_date_enqueued_partial_index"
+        index_4 = "queue_job_channel_date_cancelled_partial_index"
+        index_5 = "queue_job_pending_priority_partial_index"
         if not index_exists(self._cr, index_1):
-            # Used by Job.job_record_with_same_identity_key
+            # Used by Job.db_records_by_identity_keys
             self._cr.execute(
                 "CREATE INDEX queue_job_identity_key_state_partial_index "
                 "ON queue_job (identity_key) WHERE state in ('pending', "
@@ -142,61 +177,174 @@ class QueueJob(models.Model):
                 "CREATE INDEX queue_job_channel_date_done_date_created_index "
                 "ON queue_job (channel, date_done, date_created);"
             )
+        if not index_exists(self._cr, index_3):
+            # Used by the detection of dead jobs in the jobrunner, only the
+            # jobs in flight are indexed so it stays small
+            self._cr.execute(
+                "CREATE INDEX queue_job_in_flight_date_enqueued_partial_index "
+                "ON queue_job (date_enqueued) "
+                "WHERE state in ('enqueued', 'started');"
+            )
+        if not index_exists(self._cr, index_4):
+            # Used by <queue.job>.autovacuum, only the cancelled jobs are
+            # indexed
+            self._cr.execute(
+                "CREATE INDEX queue_job_channel_date_cancelled_partial_index "
+                "ON queue_job (channel, date_cancelled) "
+                "WHERE date_cancelled IS NOT NULL;"
+            )
+        if not index_exists(self._cr, index_5):
+            # Used by the jobrunner, which loads the pending and failed jobs
+            # in batches in the order they run
+            self._cr.execute(
+                "CREATE INDEX queue_job_pending_priority_partial_index "
+                "ON queue_job (priority, date_created, id) "
+                "WHERE state in ('pending', 'failed');"
+            )
+        # apply the notification payload mode when the module is updated
+        create_notify_function(self._cr)
 
     @api.depends("dependencies")
     def _compute_dependency_graph(self):
-        jobs_groups = self.env["queue.job"].read_group(
-            [
-                (
-                    "graph_uuid",
-                    "in",
-                    [uuid for uuid in self.mapped("graph_uuid") if uuid],
-                )
-            ],
-            ["graph_uuid", "ids:array_agg(id)"],
-            ["graph_uuid"],
-        )
-        ids_per_graph_uuid = {
-            group["graph_uuid"]: group["ids"] for group in jobs_groups
-        }
         for record in self:
-            if not record.graph_uuid:
-                record.dependency_graph = {}
-                continue
+            record.dependency_graph = record._dependency_graph_page()
 
-            graph_jobs = self.browse(ids_per_graph_uuid.get(record.graph_uuid) or [])
-            if not graph_jobs:
-                record.dependency_graph = {}
-                continue
+    def get_dependency_graph(self, level_offset=0):
+        """Page of the dependency graph starting at ``level_offset``"""
+        self.ensure_one()
+        return self._dependency_graph_page(level_offset=level_offset)
+
+    def _dependency_graph_jobs(self):
+        """Return the jobs of the graph as {id: (state, level, parent ids)}
 
-            graph_ids = {graph_job.uuid: graph_job.id for graph_job in graph_jobs}
-            graph_jobs_by_ids = {graph_job.id: graph_job for graph_job in graph_jobs}
-
-            graph = Graph()
-            for graph_job in graph_jobs:
-                graph.add_vertex(graph_job.id)
-                for parent_uuid in graph_job.dependencies["depends_on"]:
-                    parent_id = graph_ids.get(parent_uuid)
-                    if not parent_id:
-                        continue
-                    graph.add_edge(parent_id, graph_job.id)
-                for child_uuid in graph_job.dependencies["reverse_depends_on"]:
-                    child_id = graph_ids.get(child_uuid)
-                    if not child_id:
-                        continue
-                    graph.add_edge(graph_job.id, child_id)
-
-            record.dependency_graph = {
-                # list of ids
-                "nodes": [
-                    graph_jobs_by_ids[graph_id]._dependency_graph_vis_node()
-                    for graph_id in graph.vertices()
-                ],
-                # list of tuples (from, to)
-                "edges": graph.edges(),
+        The level of a job is the length of the longest path from a job
+        without dependencies. The levels and the parents, which do not change
+        once the graph is created, are computed with a single query and kept
+        in a cache, only the states are read again when the graph is cached.
+        The jobs the user is not allowed to read are left out.
+        """
+        cr = self.env.cr
+        self.flush_model(["graph_uuid", "state"])
+        cr.execute(
+            "SELECT id, state FROM queue_job WHERE graph_uuid = %s",
+            (self.graph_uuid,),
+        )
+        states = dict(cr.fetchall())
+        cache_key = (cr.dbname, self.graph_uuid)
+        topology = _graph_topology_cache.get(cache_key)
+        if topology is None or topology.keys() != states.keys():
+            cr.execute(
+                """
+                WITH RECURSIVE depth (id, level) AS (
+                    SELECT job.id, 0
+                    FROM queue_job job
+                    WHERE job.graph_uuid = %s
+                    AND NOT EXISTS (
+                        SELECT 1 FROM queue_job_dependency dependency
+                        WHERE dependency.child_id = job.id
+                    )
+                    UNION
+                    SELECT dependency.child_id, depth.level + 1
+                    FROM depth
+                    JOIN queue_job_dependency dependency
+                    ON dependency.parent_id = depth.id
+                )
+                SELECT depth.id, max(depth.level), (
+                    SELECT coalesce(array_agg(dependency.parent_id), '{}')
+                    FROM queue_job_dependency dependency
+                    WHERE dependency.child_id = depth.id
+                )
+                FROM depth
+                GROUP BY depth.id
+                """,
+                (self.graph_uuid,),
+            )
+            topology = {
+                job_id: (level, tuple(parent_ids))
+                for job_id, level, parent_ids in cr.fetchall()
+                if job_id in states
             }
+            _graph_topology_cache[cache_key] = topology
+        # the jobs were read in SQL, only those allowed by the record rules
+        # (multi-company) are displayed
+        allowed = set(self.search([("id", "in", list(topology))]).ids)
+        return {
+            job_id: (states[job_id], level, parent_ids)
+            for job_id, (level, parent_ids) in topology.items()
+            if job_id in allowed
+        }
+
+    def _dependency_graph_page(self, level_offset=0):
+        """Return a page of the graph as expected by the JobDirectedGraph widget
+
+        The page contains _dependency_graph_page_levels levels, from
+        ``level_offset``, with the count of jobs by state of each level. The
+        jobs of a level of more than _dependency_graph_fan_out_limit jobs are
+        collapsed in one node by state. The nodes only carry their state, the
+        widget loads the details of a job when they are displayed.
+        """
+        if not self.graph_uuid:
+            return {}
+        jobs = self._dependency_graph_jobs()
+        if not jobs:
+            return {}
+        jobs_by_level = defaultdict(list)
+        for job_id, (__, level, __) in jobs.items():
+            jobs_by_level[level].append(job_id)
+        level_stop = level_offset + self._dependency_graph_page_levels
+        # the levels of the jobs the user cannot read are missing
+        level_count = max(jobs_by_level) + 1
+        state_labels = dict(self._fields["state"]._description_selection(self.env))
+
+        levels = []
+        nodes = {}
+        node_by_job = {}
+        for level in range(level_offset, min(level_stop, level_count)):
+            if level not in jobs_by_level:
+                continue
+            job_ids = sorted(jobs_by_level[level])
+            counts = Counter(jobs[job_id][0] for job_id in job_ids)
+            levels.append(
+                {"level": level, "count": len(job_ids), "states": dict(counts)}
+            )
+            collapse = len(job_ids) > self._dependency_graph_fan_out_limit
+            for job_id in job_ids:
+                state = jobs[job_id][0]
+                if collapse and job_id != self.id:
+                    node_id = f"{level}:{state}"
+                    if node_id not in nodes:
+                        nodes[node_id] = self._dependency_graph_vis_node(
+                            node_id, state
+                        )
+                        nodes[node_id]["count"] = counts[state]
+                        nodes[node_id]["label"] = _("%(count)s %(state)s") % {
+                            "count": counts[state],
+                            "state": state_labels.get(state, state),
+                        }
+                else:
+                    node_id = job_id
+                    nodes[node_id] = self._dependency_graph_vis_node(node_id, state)
+                node_by_job[job_id] = node_id
+
+        # edges between collapsed nodes are merged
+        edges = {}
+        for job_id, node_id in node_by_job.items():
+            for parent_id in jobs[job_id][2]:
+                if parent_id in node_by_job:
+                    edges[(node_by_job[parent_id], node_id)] = True
+        return {
+            "nodes": list(nodes.values()),
+            # list of tuples (from, to)
+            "edges": list(edges),
+            "levels": levels,
+            "level_offset": level_offset,
+            "page_levels": self._dependency_graph_page_levels,
+            "level_count": level_count,
+            "job_count": len(jobs),
+        }
 
-    def _dependency_graph_vis_node(self):
+    @api.model
+    def _dependency_graph_vis_node(self, node_id, state):
         """Return the node as expected by the JobDirectedGraph widget"""
         default = ("#D2E5FF", "#2B7CE9")
         colors = {
@@ -205,13 +353,10 @@ class QueueJob(models.Model):
             STARTED: ("#FFFF00", "#FFA500"),
         }
         return {
-            "id": self.id,
-            "title": (
-                f"<strong>{html_escape(self.display_name)}</strong><br/>"
-                f"{html_escape(self.func_string)}"
-            ),
-            "color": colors.get(self.state, default)[0],
-            "border": colors.get(self.state, default)[1],
+            "id": node_id,
+            "state": state,
+            "color": colors.get(state, default)[0],
+            "border": colors.get(state, default)[1],
             "shadow": True,
         }
 
@@ -236,10 +381,14 @@ class QueueJob(models.Model):
     @api.model_create_multi
     @api.private
     def create(self, vals_list):
-        return super(
+        records = super(
             QueueJob,
             self.with_context(mail_create_nolog=True, mail_create_nosubscribe=True),
         ).create(vals_list)
+        records.filtered(
+            lambda record: _has_dependencies(record.dependencies)
+        )._create_dependency_edges()
+        return records
 
     def write(self, vals):
         if self.env.context.get("_job_edit_sentinel") is not self.EDIT_SENTINEL:
@@ -262,8 +411,17 @@ class QueueJob(models.Model):
         if vals.get("state") == "failed":
             self._message_post_on_failure()
 
+        changed_dependencies = self.browse()
+        if _has_dependencies(vals.get("dependencies")):
+            new_uuids = _dependency_uuids(vals["dependencies"])
+            changed_dependencies = self.filtered(
+                lambda record: _dependency_uuids(record.dependencies) != new_uuids
+            )
+
         result = super().write(vals)
 
+        changed_dependencies._create_dependency_edges()
+
         for record in different_user_jobs:
             # the user is stored in the env of the record, but we still want to
             # have a stored user_id field to be able to search/groupby, so
@@ -273,6 +431,58 @@ class QueueJob(models.Model):
             )
         return result
 
+    def _create_dependency_edges(self):
+        """Create the missing edges of the dependencies of the jobs
+
+        The edges come from the uuids in the ``dependencies`` of the jobs, as
+        parent or as child. The remaining dependencies of the children of the
+        new edges are counted again.
+        """
+        if not self:
+            return
+        self.flush_model(["uuid", "state", "dependencies"])
+        self.env.cr.execute(
+            """
+            INSERT INTO queue_job_dependency (parent_id, child_id, parent_done)
+            SELECT parent.id, child.id, parent.state = %(done)s
+            FROM queue_job child
+            CROSS JOIN LATERAL json_array_elements_text(
+                child.dependencies::json -> 'depends_on'
+            ) parent_uuid
+            JOIN queue_job parent ON parent.uuid = parent_uuid
+            WHERE child.id = ANY(%(ids)s)
+            UNION
+            SELECT parent.id, child.id, parent.state = %(done)s
+            FROM queue_job parent
+            CROSS JOIN LATERAL json_array_elements_text(
+                parent.dependencies::json -> 'reverse_depends_on'
+            ) child_uuid
+            JOIN queue_job child ON child.uuid = child_uuid
+            WHERE parent.id = ANY(%(ids)s)
+            ON CONFLICT (parent_id, child_id) DO NOTHING
+            RETURNING child_id
+            """,
+            {"ids": self.ids, "done": DONE},
+        )
+        child_ids = list({child_id for child_id, in self.env.cr.fetchall()})
+        if not child_ids:
+            return
+        self.env.cr.execute(
+            """
+            UPDATE queue_job
+            SET dependencies_remaining = remaining.count
+            FROM (
+                SELECT child_id, count(*) FILTER (WHERE NOT parent_done) AS count
+                FROM queue_job_dependency
+                WHERE child_id = ANY(%s)
+                GROUP BY child_id
+            ) remaining
+            WHERE queue_job.id = remaining.child_id
+            """,
+            (child_ids,),
+        )
+        self.invalidate_model(["dependencies_remaining"])
+
     def open_related_action(self):
         """Open the related action associated to the job"""
         self.ensure_one()
@@ -382,32 +592,259 @@ class QueueJob(models.Model):
         """
         return [("state", "=", "failed")]
 
-    def autovacuum(self):
+    def autovacuum(self, channels=None):
         """Delete all jobs done based on the removal interval defined on the
            channel
 
-        Called from a cron.
+        Called from a cron. The jobs are deleted by batches of
+        ``_autovacuum_batch_size``, each batch is committed. When the run
+        takes more than ``_autovacuum_time_budget`` seconds, it stops and the
+        cron is rescheduled to delete the remaining jobs.
+
+        With ``ODOO_QUEUE_JOB_AUTOVACUUM_SQL=1`` or ``autovacuum_sql = 1`` in
+        the ``[queue_job]`` section of the configuration file, the jobs are
+        deleted with SQL queries, along with their messages, followers and
+        activities, instead of with ``unlink``. Overrides of ``unlink`` on
+        ``queue.job`` are not called in this mode.
+
+        When the archive is enabled, the jobs are moved to the archive with
+        the same queries, and the expired partitions of the archive are
+        dropped, see ``queue.job.archive``.
+
+        :param channels: complete names of the channels to clean, all the
+            channels by default. Several crons on different channels run in
+            parallel.
         """
-        for channel in self.env["queue.job.channel"].search([]):
-            deadline = datetime.now() - timedelta(days=int(channel.removal_interval))
-            while True:
-                jobs = self.search(
-                    [
-                        "|",
-                        ("date_done", "<=", deadline),
-                        ("date_cancelled", "<=", deadline),
-                        ("channel", "=", channel.complete_name),
-                    ],
-                    order="date_done, date_created",
-                    limit=1000,
-                )
-                if jobs:
-                    jobs.unlink()
+        Archive = self.env["queue.job.archive"]
+        if Archive._archive_mode():
+            delete_batch = self._autovacuum_archive
+        elif self._autovacuum_sql_mode():
+            delete_batch = self._autovacuum_delete_sql
+        else:
+            delete_batch = self._autovacuum_delete_orm
+        self._autovacuum_run("autovacuum", delete_batch, channels)
+        # the partitions are dropped even when the archive has been disabled
+        Archive._drop_expired_partitions()
+        return True
+
+    def archive_jobs(self, channels=None):
+        """Move the jobs done or cancelled to the archive
+
+        Called from a cron, more often than the autovacuum, so the jobs
+        table only keeps the jobs finished for less than
+        ``queue.job.archive._archive_interval``. Does nothing when the
+        archive is disabled.
+
+        :param channels: complete names of the channels to archive, all the
+            channels by default.
+        """
+        if self.env["queue.job.archive"]._archive_mode():
+            self._autovacuum_run("archive", self._autovacuum_archive, channels)
+        return True
+
+    def _autovacuum_run(self, name, delete_batch, channels):
+        """Call ``delete_batch`` on the channels until there are no more jobs
+        to delete or the time budget is exhausted"""
+        domain = [("complete_name", "in", channels)] if channels else []
+        start = time.monotonic()
+        deadline_time = start + self._autovacuum_time_budget
+        total = 0
+        for channel in self.env["queue.job.channel"].search(domain):
+            channel_start = time.monotonic()
+            count = 0
+            # the done and the cancelled jobs are found with their own index
+            for date_field in ("date_done", "date_cancelled"):
+                while time.monotonic() < deadline_time:
+                    deleted = delete_batch(
+                        channel, date_field, self._autovacuum_batch_size
+                    )
                     if not config["test_enable"]:
                         self.env.cr.commit()  # pylint: disable=E8102
-                else:
-                    break
-        return True
+                    count += deleted
+                    if deleted < self._autovacuum_batch_size:
+                        break
+            total += count
+            if count:
+                duration = time.monotonic() - channel_start
+                _logger.info(
+                    "%s: %d jobs in channel %s in %.1fs (%.0f jobs/s)",
+                    name,
+                    count,
+                    channel.complete_name,
+                    duration,
+                    count / max(duration, 1e-6),
+                )
+            if time.monotonic() >= deadline_time:
+                break
+        duration = time.monotonic() - start
+        timed_out = time.monotonic() >= deadline_time
+        _logger.info(
+            "%s: %d jobs in %.1fs (%.0f jobs/s)%s",
+            name,
+            total,
+            duration,
+            total / max(duration, 1e-6),
+            ", time budget exhausted" if timed_out else "",
+        )
+        # when called from the cron, it is run again to continue
+        self.env["ir.cron"]._notify_progress(done=total, remaining=int(timed_out))
+
+    @api.model
+    def _autovacuum_sql_mode(self):
+        # not imported at the module level: the jobrunner imports job.py
+        from ..jobrunner import queue_job_config
+
+        value = os.environ.get("ODOO_QUEUE_JOB_AUTOVACUUM_SQL") or queue_job_config.get(
+            "autovacuum_sql"
+        )
+        return str2bool(value or "0", default=False)
+
+    @api.model
+    def _autovacuum_deadline(self, channel):
+        return datetime.now() - timedelta(days=int(channel.removal_interval))
+
+    @api.model
+    def _autovacuum_jobs(self, channel, date_field, deadline, limit):
+        """Return the ids and the date done or cancelled of the jobs of
+        ``channel`` whose ``date_field`` is before ``deadline``"""
+        self.env.cr.execute(
+            SQL(
+                """
+                SELECT id, COALESCE(date_done, date_cancelled) FROM queue_job
+                WHERE %(condition)s
+                ORDER BY %(date_field)s
+                LIMIT %(limit)s
+                """,
+                condition=self._autovacuum_condition(channel, date_field, deadline),
+                date_field=SQL.identifier(date_field),
+                limit=limit,
+            )
+        )
+        return self.env.cr.fetchall()
+
+    @api.model
+    def _autovacuum_condition(self, channel, date_field, deadline):
+        """Condition on queue_job of the jobs to delete, also checked by the
+        DELETE so a job requeued in between is kept"""
+        return SQL(
+            "channel = %(channel)s AND state IN %(states)s "
+            "AND %(date_field)s <= %(deadline)s",
+            channel=channel,
+            states=(DONE, CANCELLED),
+            date_field=SQL.identifier(date_field),
+            deadline=deadline,
+        )
+
+    @api.model
+    def _autovacuum_delete_orm(self, channel, date_field, limit):
+        jobs = self.search(
+            [
+                (date_field, "<=", self._autovacuum_deadline(channel)),
+                ("channel", "=", channel.complete_name),
+            ],
+            order=f"{date_field}, date_created",
+            limit=limit,
+        )
+        jobs.unlink()
+        return len(jobs)
+
+    @api.model
+    def _autovacuum_delete_sql(self, channel, date_field, limit):
+        condition = self._autovacuum_condition(
+            channel.complete_name, date_field, self._autovacuum_deadline(channel)
+        )
+        return self._delete_jobs_sql(
+            SQL(
+                """
+                %(condition)s AND id IN (
+                    SELECT id FROM queue_job
+                    WHERE %(condition)s
+                    ORDER BY %(date_field)s
+                    LIMIT %(limit)s
+                )
+                """,
+                condition=condition,
+                date_field=SQL.identifier(date_field),
+                limit=limit,
+            )
+        )
+
+    @api.model
+    def _autovacuum_archive(self, channel, date_field, limit):
+        """Move the jobs done or cancelled to the archive
+
+        The jobs which would land in an expired partition of the archive are
+        deleted.
+        """
+        Archive = self.env["queue.job.archive"]
+        removal_interval = int(channel.removal_interval)
+        archive_interval = min(Archive._archive_interval, removal_interval)
+        deadline = datetime.now() - timedelta(days=archive_interval)
+        jobs = self._autovacuum_jobs(channel.complete_name, date_field, deadline, limit)
+        today = datetime.now().date()
+        to_archive = {}
+        to_delete = []
+        for job_id, date in jobs:
+            removal_date = date + timedelta(days=removal_interval)
+            if removal_date.date() < today:
+                to_delete.append(job_id)
+            else:
+                to_archive[job_id] = removal_date
+        condition = self._autovacuum_condition(
+            channel.complete_name, date_field, deadline
+        )
+        if to_archive:
+            Archive._create_partitions(to_archive.values())
+            self._delete_jobs_sql(
+                SQL("%s AND id = ANY(%s)", condition, list(to_archive)),
+                removal_interval=removal_interval,
+            )
+        if to_delete:
+            self._delete_jobs_sql(SQL("%s AND id = ANY(%s)", condition, to_delete))
+        return len(jobs)
+
+    @api.model
+    def _delete_jobs_sql(self, condition, removal_interval=None):
+        """Delete the jobs matching ``condition`` and their mail rows with one
+        query
+
+        With a ``removal_interval``, the jobs are inserted in the archive.
+        The attachments are unlinked with the ORM, so their files are
+        removed from the filestore. Return the number of jobs deleted.
+        """
+        archive = SQL()
+        if removal_interval is not None:
+            archive = self.env["queue.job.archive"]._archive_query(removal_interval)
+        self.env.cr.execute(
+            SQL(
+                """
+                WITH jobs AS (
+                    DELETE FROM queue_job WHERE %(condition)s
+                    RETURNING *
+                ), %(archive)s messages AS (
+                    DELETE FROM mail_message
+                    WHERE model = %(model)s AND res_id IN (SELECT id FROM jobs)
+                ), followers AS (
+                    DELETE FROM mail_followers
+                    WHERE res_model = %(model)s AND res_id IN (SELECT id FROM jobs)
+                ), activities AS (
+                    DELETE FROM mail_activity
+                    WHERE res_model = %(model)s AND res_id IN (SELECT id FROM jobs)
+                )
+                SELECT id FROM jobs
+                """,
+                condition=condition,
+                archive=archive,
+                model=self._name,
+            )
+        )
+        job_ids = [row[0] for row in self.env.cr.fetchall()]
+        if job_ids:
+            self.env["ir.attachment"].sudo().search(
+                [("res_model", "=", self._name), ("res_id", "in", job_ids)]
+            ).unlink()
+            self.env.invalidate_all()
+        return len(job_ids)
 
     def related_action_open_record(self):
         """Open a form view with the record(s) of the job.
@@ -0,0 +1,259 @@
+# Copyright 2025 Camptocamp SA
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl.html)
+
+import json
+import logging
+import os
+from datetime import datetime, timedelta
+
+from odoo import api, fields, models
+from odoo.tools import SQL, str2bool
+from odoo.tools.sql import add_foreign_key, get_foreign_keys
+
+from ..job import STATES
+
+_logger = logging.getLogger(__name__)
+
+PARTITION_PREFIX = "queue_job_archive_p"
+
+
+class QueueJobArchive(models.Model):
+    """Jobs done or cancelled, moved out of the ``queue_job`` table
+
+    Enabled with ``ODOO_QUEUE_JOB_ARCHIVE=1`` or ``archive = 1`` in the
+    ``[queue_job]`` section of the configuration file: the autovacuum moves
+    the jobs done or cancelled for more than ``_archive_interval`` days to
+    this table, so the table of the jobs only keeps the recent ones.
+
+    The table is partitioned by range of ``date_removal``, the date at which
+    the job has to be deleted according to the removal interval of its
+    channel, with one partition by day. The autovacuum drops the partitions
+    whose day is over instead of deleting the jobs one by one, or detaches
+    them when ``_archive_detach_partitions`` is set.
+
+    The records and arguments of the jobs are kept in ``arguments``, unless
+    ``_archive_arguments`` is disabled. They are compressed by PostgreSQL
+    (with lz4 when the server supports it), the partitions are created with
+    a low ``toast_tuple_target`` so the arguments of most jobs are compressed.
+
+    The ``queue_job`` table itself is not partitioned: the primary key of a
+    partitioned table must contain the partition key, while the ORM needs
+    ``id`` alone as primary key and ``queue_job_lock`` and
+    ``queue_job_dependency`` have foreign keys on it. A job also changes of
+    state during its life, it would move between partitions.
+    """
+
+    _name = "queue.job.archive"
+    _description = "Archived Queue Job"
+    _auto = False
+    _log_access = False
+    _order = "date_created DESC, id DESC"
+
+    # jobs done or cancelled since this number of days are archived, unless
+    # the removal interval of their channel is shorter
+    _archive_interval = 1  # days
+    # keep the expired partitions as tables, to dump them for instance
+    _archive_detach_partitions = False
+    # keep the records, args and kwargs of the jobs
+    _archive_arguments = True
+
+    uuid = fields.Char(string="UUID", readonly=True)
+    graph_uuid = fields.Char(string="Graph UUID", readonly=True)
+    user_id = fields.Many2one(comodel_name="res.users", string="User ID")
+    company_id = fields.Many2one(comodel_name="res.company", string="Company")
+    name = fields.Char(string="Description", readonly=True)
+    model_name = fields.Char(string="Model", readonly=True)
+    method_name = fields.Char(readonly=True)
+    func_string = fields.Char(string="Task", readonly=True)
+    channel = fields.Char(readonly=True)
+    state = fields.Selection(STATES, readonly=True)
+    priority = fields.Integer(readonly=True, aggregator=False)
+    exc_name = fields.Char(string="Exception", readonly=True)
+    exc_message = fields.Char(string="Exception Message", readonly=True)
+    exc_info = fields.Text(string="Exception Info", readonly=True)
+    result = fields.Text(readonly=True)
+    date_created = fields.Datetime(string="Created Date", readonly=True)
+    date_enqueued = fields.Datetime(string="Enqueue Time", readonly=True)
+    date_started = fields.Datetime(string="Start Date", readonly=True)
+    date_done = fields.Datetime(readonly=True)
+    date_cancelled = fields.Datetime(readonly=True)
+    exec_time = fields.Float(string="Execution Time (avg)", aggregator="avg")
+    retry = fields.Integer(string="Current try", readonly=True)
+    date_removal = fields.Datetime(readonly=True)
+    arguments = fields.Json(readonly=True)
+    arguments_text = fields.Text(string="Arguments", compute="_compute_arguments_text")
+
+    def init(self):
+        self.env.cr.execute(
+            """
+            CREATE TABLE IF NOT EXISTS queue_job_archive (
+                id integer NOT NULL,
+                uuid varchar,
+                graph_uuid varchar,
+                user_id integer,
+                company_id integer,
+                name varchar,
+                model_name varchar,
+                method_name varchar,
+                func_string varchar,
+                channel varchar,
+                state varchar,
+                priority integer,
+                exc_name varchar,
+                exc_message varchar,
+                exc_info text,
+                result text,
+                date_created timestamp,
+                date_enqueued timestamp,
+                date_started timestamp,
+                date_done timestamp,
+                date_cancelled timestamp,
+                exec_time double precision,
+                retry integer,
+                date_removal timestamp NOT NULL,
+                arguments jsonb,
+                PRIMARY KEY (id, date_removal)
+            ) PARTITION BY RANGE (date_removal);
+            CREATE INDEX IF NOT EXISTS queue_job_archive_uuid_index
+                ON queue_job_archive (uuid);
+            CREATE INDEX IF NOT EXISTS queue_job_archive_date_created_index
+                ON queue_job_archive (date_created);
+            """
+        )
+        # like the Many2one fields of a regular table, so the archived jobs of
+        # a deleted user or company can still be read
+        for column, table in (("user_id", "res_users"), ("company_id", "res_company")):
+            if not get_foreign_keys(
+                self.env.cr, "queue_job_archive", column, table, "id", "set null"
+            ):
+                add_foreign_key(
+                    self.env.cr, "queue_job_archive", column, table, "id", "set null"
+                )
+        self.env.cr.execute(
+            """
+            SELECT 1 FROM pg_settings
+            WHERE name = 'default_toast_compression' AND 'lz4' = ANY(enumvals)
+            """
+        )
+        if self.env.cr.fetchone():
+            self.env.cr.execute(
+                "ALTER TABLE queue_job_archive "
+                "ALTER COLUMN arguments SET COMPRESSION lz4"
+            )
+
+    @api.depends("arguments")
+    def _compute_arguments_text(self):
+        for record in self:
+            record.arguments_text = (
+                json.dumps(record.arguments, indent=2) if record.arguments else False
+            )
+
+    @api.model
+    def _archive_mode(self):
+        # not imported at the module level: the jobrunner imports job.py
+        from ..jobrunner import queue_job_config
+
+        value = os.environ.get("ODOO_QUEUE_JOB_ARCHIVE") or queue_job_config.get(
+            "archive"
+        )
+        return str2bool(value or "0", default=False)
+
+    @api.model
+    def _archived_columns(self):
+        return [name for name, field in self._fields.items() if field.store]
+
+    @api.model
+    def _archive_query(self, removal_interval):
+        """Query inserting the jobs deleted by the ``jobs`` query in the archive
+
+        It is a part of the query of ``queue.job._delete_jobs_sql``.
+        """
+        columns = SQL(", ").join(
+            SQL.identifier(name)
+            for name in self._archived_columns()
+            if name not in ("date_removal", "arguments")
+        )
+        if self._archive_arguments:
+            arguments = SQL(
+                "jsonb_build_object('records', records, 'args', args, "
+                "'kwargs', kwargs)"
+            )
+        else:
+            arguments = SQL("NULL")
+        return SQL(
+            """
+            archived AS (
+                INSERT INTO queue_job_archive (%(columns)s, date_removal, arguments)
+                SELECT %(columns)s, COALESCE(date_done, date_cancelled)
+                    + make_interval(days => %(removal_interval)s), %(arguments)s
+                FROM jobs
+            ),
+            """,
+            columns=columns,
+            removal_interval=removal_interval,
+            arguments=arguments,
+        )
+
+    @api.model
+    def _partitions(self):
+        """Return the partitions of the archive as {day: table name}"""
+        self.env.cr.execute(
+            """
+            SELECT child.relname
+            FROM pg_inherits
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE pg_inherits.inhparent = 'queue_job_archive'::regclass
+            """
+        )
+        return {
+            datetime.strptime(name[len(PARTITION_PREFIX) :], "%Y%m%d").date(): name
+            for (name,) in self.env.cr.fetchall()
+            if name.startswith(PARTITION_PREFIX)
+        }
+
+    @api.model
+    def _create_partitions(self, removal_dates):
+        """Create the partitions receiving jobs removed at ``removal_dates``"""
+        days = {removal_date.date() for removal_date in removal_dates}
+        missing = sorted(days - set(self._partitions()))
+        if not missing:
+            return
+        # several crons archiving different channels can create the same
+        # partition
+        self.env.cr.execute(
+            "SELECT pg_advisory_xact_lock(hashtext('queue_job_archive'))"
+        )
+        for day in missing:
+            self.env.cr.execute(
+                SQL(
+                    "CREATE TABLE IF NOT EXISTS %s PARTITION OF queue_job_archive "
+                    "FOR VALUES FROM (%s) TO (%s) WITH (toast_tuple_target = 128)",
+                    SQL.identifier(f"{PARTITION_PREFIX}{day:%Y%m%d}"),
+                    day,
+                    day + timedelta(days=1),
+                )
+            )
+
+    @api.model
+    def _drop_expired_partitions(self):
+        """Drop the partitions whose jobs all have to be removed
+
+        Return the number of partitions dropped or detached.
+        """
+        today = datetime.now().date()
+        expired = [
+            name for day, name in sorted(self._partitions().items()) if day < today
+        ]
+        for name in expired:
+            if self._archive_detach_partitions:
+                self.env.cr.execute(
+                    SQL(
+                        "ALTER TABLE queue_job_archive DETACH PARTITION %s",
+                        SQL.identifier(name),
+                    )
+                )
+                _logger.info("archive partition %s detached", name)
+            else:
+                self.env.cr.execute(SQL("DROP TABLE %s", SQL.identifier(name)))
+                _logger.info("archive partition %s dropped", name)
+        return len(expired)
@@ -0,0 +1,40 @@
+# Copyright 2025 Camptocamp SA
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl.html)
+
+from odoo import fields, models
+
+
+class QueueJobDependency(models.Model):
+    """Edge of the graph of the dependencies of the jobs
+
+    The edges are created from the ``dependencies`` of the jobs, they are used
+    to release the children of a job without reading the dependencies of
+    their other parents (see ``dependencies_remaining`` on ``queue.job``).
+    """
+
+    _name = "queue.job.dependency"
+    _description = "Queue Job Dependency"
+    _log_access = False
+
+    parent_id = fields.Many2one(
+        comodel_name="queue.job",
+        required=True,
+        ondelete="cascade",
+    )
+    child_id = fields.Many2one(
+        comodel_name="queue.job",
+        required=True,
+        ondelete="cascade",
+        index=True,
+    )
+    # the parent is done and has been deducted from the remaining
+    # dependencies of the child
+    parent_done = fields.Boolean(readonly=True)
+
+    _sql_constraints = [
+        (
+            "parent_child_uniq",
+            "UNIQUE(parent_id, child_id)",
+            "A job depends only once on another job.",
+        )
+    ]
@@ -68,6 +68,15 @@ class QueueJobFunction(models.Model):
         "Example: {1: (1, 10), 5: (11, 20), 10: (21, 30), 15: (100, 300)}.\n"
         "See the module description for details.",
     )
+    batch_size = fields.Integer(
+        default=1,
+        help="Number of jobs of this function the job runner sends to a worker "
+        "in a single request, for small jobs which would take less time than "
+        "the request itself. Each job runs in its own transaction. As the "
+        "jobs of a batch run one after the other in the same worker, the "
+        "jobs not started when half of the real time limit of the workers is "
+        "spent are set back to pending.",
+    )
     related_action = JobSerialized(string="Related Action (serialized)", base_type=dict)
     edit_related_action = fields.Text(
         string="Related Action",
@@ -218,6 +227,14 @@ class QueueJobFunction(models.Model):
             return
         int(value)
 
+    @api.constrains("batch_size")
+    def _check_batch_size(self):
+        for record in self:
+            if record.batch_size < 1:
+                raise exceptions.ValidationError(
+                    _("The batch size of {} must be at least 1.").format(record.name)
+                )
+
     def _related_action_format_error_message(self):
         return _(
             "Unexpected format of Related Action for {}.\n"
@@ -2,29 +2,73 @@
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
 
 import logging
+import os
+
+from odoo.tools import str2bool
+
+from .jobrunner import queue_job_config
 
 logger = logging.getLogger(__name__)
 
 
-def post_init_hook(env):
-    # this is the trigger that sends notifications when jobs change
-    logger.info("Create queue_job_notify trigger")
-    env.cr.execute(
-        """
-            DROP TRIGGER IF EXISTS queue_job_notify ON queue_job;
+def _notify_payload_enabled():
+    """Return True if the notifications must carry the scheduling columns
+
+    Enabled with ``ODOO_QUEUE_JOB_NOTIFY_PAYLOAD=1`` or ``notify_payload = 1``
+    in the ``[queue_job]`` section of the configuration file, then applied
+    on the next installation or update of the module.
+    """
+    value = os.environ.get("ODOO_QUEUE_JOB_NOTIFY_PAYLOAD") or queue_job_config.get(
+        "notify_payload"
+    )
+    return str2bool(value or "0", default=False)
+
+
+def create_notify_function(cr):
+    """Create or replace the function called by the queue_job_notify trigger
+
+    By default, the payload of the notification is the uuid of the job
+    and the runner reads the job in the table. When enabled, the payload
+    is a JSON array with the same columns as ``Database.select_jobs``
+    (only the uuid for a deleted job) so the runner does not need to read
+    the job again.
+    """
+    if _notify_payload_enabled():
+        deleted_payload = "json_build_array(OLD.uuid)::text"
+        payload = (
+            "json_build_array(NEW.channel, NEW.uuid, NEW.id, NEW.date_created, "
+            "NEW.priority, EXTRACT(EPOCH FROM NEW.eta), NEW.state)::text"
+        )
+    else:
+        deleted_payload = "OLD.uuid"
+        payload = "NEW.uuid"
+    # pylint: disable=sql-injection
+    cr.execute(
+        f"""
             CREATE OR REPLACE
                 FUNCTION queue_job_notify() RETURNS trigger AS $$
             BEGIN
                 IF TG_OP = 'DELETE' THEN
                     IF OLD.state != 'done' THEN
-                        PERFORM pg_notify('queue_job', OLD.uuid);
+                        PERFORM pg_notify('queue_job', {deleted_payload});
                     END IF;
                 ELSE
-                    PERFORM pg_notify('queue_job', NEW.uuid);
+                    PERFORM pg_notify('queue_job', {payload});
                 END IF;
                 RETURN NULL;
             END;
             $$ LANGUAGE plpgsql;
+        """
+    )
+
+
+def post_init_hook(env):
+    # this is the trigger that sends notifications when jobs change
+    logger.info("Create queue_job_notify trigger")
+    env.cr.execute("DROP TRIGGER IF EXISTS queue_job_notify ON queue_job;")
+    create_notify_function(env.cr)
+    env.cr.execute(
+        """
             CREATE TRIGGER queue_job_notify
                 AFTER INSERT OR UPDATE OR DELETE
                 ON queue_job
@@ -6,7 +6,7 @@ import {registry} from "@web/core/registry";
 import {standardFieldProps} from "@web/views/fields/standard_field_props";
 import {useService} from "@web/core/utils/hooks";
 
-const {Component, onWillStart, useEffect, useRef} = owl;
+const {Component, onWillStart, useEffect, useRef, useState} = owl;
 
 const {document} = globalThis;
 
@@ -20,6 +20,8 @@ class JobDirectGraph extends Component {
         this.rootRef = useRef("root_vis");
         this.network = null;
         this.forceRender = false;
+        // a page of levels loaded with the pager, instead of the field value
+        this.state = useState({page: null});
         onWillStart(async () => {
             await loadJS("/queue_job/static/lib/vis/vis-network.min.js");
             loadCSS("/queue_job/static/lib/vis/vis-network.min.css");
@@ -55,24 +57,84 @@ class JobDirectGraph extends Component {
         return this.props.record.resModel;
     }
 
-    htmlTitle(html) {
+    get graph() {
+        return this.state.page || this.props.record.data[this.props.name] || {};
+    }
+
+    get levelSummary() {
+        return (this.graph.levels || []).map((level) => {
+            const states = Object.entries(level.states)
+                .map(([state, count]) => `${count} ${state}`)
+                .join(", ");
+            return `${level.level}: ${states}`;
+        });
+    }
+
+    get hasPreviousLevels() {
+        return this.graph.level_offset > 0;
+    }
+
+    get hasNextLevels() {
+        const graph = this.graph;
+        return graph.level_offset + graph.page_levels < graph.level_count;
+    }
+
+    async loadLevels(offset) {
+        const graph = this.graph;
+        const levelOffset = graph.level_offset + offset * graph.page_levels;
+        this.state.page = await this.orm.call(
+            this.model,
+            "get_dependency_graph",
+            [[this.resId]],
+            {level_offset: Math.max(0, levelOffset)}
+        );
+        this.renderNetwork();
+        this._fitNetwork();
+    }
+
+    jobTitle(job) {
         const container = document.createElement("div");
-        container.innerHTML = html;
+        const name = document.createElement("strong");
+        name.textContent = job.display_name;
+        container.appendChild(name);
+        container.appendChild(document.createElement("br"));
+        container.appendChild(document.createTextNode(job.func_string || ""));
         return container;
     }
 
+    async loadNodeDetails(data, nodeId) {
+        // the details of the jobs are loaded when they are hovered
+        const node = data.nodes.get(nodeId);
+        if (!node || node.count || node.title) {
+            return;
+        }
+        const [job] = await this.orm.read(
+            this.model,
+            [nodeId],
+            ["display_name", "func_string"],
+            {context: this.context}
+        );
+        if (job) {
+            data.nodes.update({id: nodeId, title: this.jobTitle(job)});
+        }
+    }
+
     renderNetwork() {
         if (this.network) {
             this.$el.innerHTML = "";
+            this.network = null;
         }
-        const values = this.props.record.data[this.props.name];
+        const values = this.graph;
         let nodes = values?.nodes || [];
         if (!nodes.length) {
             return;
         }
         nodes = nodes.map((node) => {
-            node.title = this.htmlTitle(node.title || "");
-            return node;
+            if (node.count) {
+                // jobs of a large level collapsed by state
+                return {...node, shape: "box"};
+            }
+            return {...node};
         });
 
         const edges = [];
@@ -119,6 +181,7 @@ class JobDirectGraph extends Component {
         const options = {
             // Fix the seed to have always the same result for the same graph
             layout: {randomSeed: 1},
+            interaction: {hover: true},
         };
         // Arbitrary threshold, generation becomes very slow at some
         // point, and disabling the stabilization helps to have a fast result.
@@ -136,10 +199,16 @@ class JobDirectGraph extends Component {
             // job selected
             network.selectNodes([self.resId]);
         });
+        network.on("hoverNode", function (params) {
+            self.loadNodeDetails(data, params.node);
+        });
         network.on("click", function (params) {
             if (params.nodes.length > 0) {
                 var resId = params.nodes[0];
-                if (resId !== self.resId) {
+                if (typeof resId !== "number") {
+                    // collapsed jobs, open the list of the jobs of the graph
+                    self.openGraphJobs();
+                } else if (resId !== self.resId) {
                     self.openDependencyJob(resId);
                 }
             } else {
@@ -163,6 +232,18 @@ class JobDirectGraph extends Component {
         await this.action.doAction(action);
     }
 
+    async openGraphJobs() {
+        const action = await this.orm.call(
+            this.model,
+            "open_graph_jobs",
+            [[this.resId]],
+            {
+                context: this.context,
+            }
+        );
+        await this.action.doAction(action);
+    }
+
     _fitNetwork() {
         if (this.network) {
             this.network.fit(this.network.body.nodeIndices);
@@ -8,3 +8,15 @@ from . import test_model_job_channel
 from . import test_model_job_function
 from . import test_queue_job_protected_write
 from . import test_wizards
+from . import test_benchmark_requeue_dead_jobs
+from . import test_benchmark_channels
+from . import test_job_store_many
+from . import test_benchmark_delay
+from . import test_job_identity
+from . import test_benchmark_json
+from . import test_benchmark_job_load
+from . import test_job_dependencies
+from . import test_dependency_graph
+from . import test_benchmark_dependencies
+from . import test_autovacuum
+from . import test_benchmark_autovacuum
@@ -0,0 +1,182 @@
+# Copyright 2025 Camptocamp SA
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl.html)
+
+from datetime import datetime, timedelta
+from unittest import mock
+
+from odoo.tests import common, tagged
+
+
+class AutovacuumMixin:
+    def _autovacuum(self, sql, **kwargs):
+        QueueJob = self.env["queue.job"]
+        with mock.patch.object(
+            type(QueueJob), "_autovacuum_sql_mode", return_value=sql
+        ):
+            QueueJob.autovacuum(**kwargs)
+
+
+@tagged("-at_install", "post_install")
+class TestAutovacuum(AutovacuumMixin, common.TransactionCase):
+    def setUp(self):
+        super().setUp()
+        self.env["queue.job.channel"].create(
+            {
+                "name": "sub",
+                "parent_id": self.env.ref("queue_job.channel_root").id,
+                "removal_interval": 5,
+            }
+        )
+        old = datetime.now() - timedelta(days=40)
+        recent = datetime.now() - timedelta(days=10)
+        self.old_done = self._job("old_done", state="done", date_done=old)
+        self.old_cancelled = self._job(
+            "old_cancelled", state="cancelled", date_cancelled=old
+        )
+        self.recent_done = self._job("recent_done", state="done", date_done=recent)
+        self.old_failed = self._job("old_failed", state="failed")
+        self.sub_done = self._job(
+            "sub_done", state="done", date_done=recent, channel="root.sub"
+        )
+        self.old_done.message_post(body="done")
+        self.old_done.message_subscribe(partner_ids=self.env.user.partner_id.ids)
+        self.attachment = self.env["ir.attachment"].create(
+            {
+                "name": "result.txt",
+                "raw": b"result",
+                "res_model": "queue.job",
+                "res_id": self.old_done.id,
+            }
+        )
+
+    def _job(self, uuid, channel="root", **values):
+        return (
+            self.env["queue.job"]
+            .with_context(_job_edit_sentinel=self.env["queue.job"].EDIT_SENTINEL)
+            .create(
+                {
+                    "uuid": uuid,
+                    "user_id": self.env.user.id,
+                    "model_name": "queue.job",
+                    "method_name": "write",
+                    "args": (),
+                    "channel": channel,
+                    **values,
+                }
+            )
+        )
+
+    def _assert_vacuumed(self):
+        jobs = self.env["queue.job"].search([])
+        self.assertFalse(jobs & (self.old_done | self.old_cancelled | self.sub_done))
+        self.assertEqual(
+            jobs & (self.recent_done | self.old_failed),
+            self.recent_done | self.old_failed,
+        )
+        old_done_id = self.old_done.id
+        self.assertFalse(
+            self.env["mail.message"].search(
+                [("model", "=", "queue.job"), ("res_id", "=", old_done_id)]
+            )
+        )
+        self.assertFalse(
+            self.env["mail.followers"].search(
+                [("res_model", "=", "queue.job"), ("res_id", "=", old_done_id)]
+            )
+        )
+        self.assertFalse(self.attachment.exists())
+
+    def test_autovacuum_orm(self):
+        self._autovacuum(False)
+        self._assert_vacuumed()
+
+    def test_autovacuum_sql(self):
+        self._autovacuum(True)
+        self._assert_vacuumed()
+
+    def test_autovacuum_sql_batches(self):
+        QueueJob = type(self.env["queue.job"])
+        with mock.patch.object(QueueJob, "_autovacuum_batch_size", 1):
+            self._autovacuum(True)
+        self._assert_vacuumed()
+
+    def test_autovacuum_channels(self):
+        self._autovacuum(True, channels=["root.sub"])
+        self.assertTrue(self.old_done.exists())
+        self.assertFalse(self.sub_done.exists())
+
+    def test_autovacuum_time_budget(self):
+        QueueJob = type(self.env["queue.job"])
+        with mock.patch.object(QueueJob, "_autovacuum_time_budget", 0):
+            self._autovacuum(True)
+        self.assertTrue(self.old_done.exists())
+
+    def test_autovacuum_requeued(self):
+        # a job done and requeued keeps its date done until it runs again
+        requeued = self._job(
+            "requeued", state="pending", date_done=datetime.now() - timedelta(days=40)
+        )
+        Archive = self.env["queue.job.archive"]
+        self._autovacuum(True)
+        self.assertTrue(requeued.exists())
+        with mock.patch.object(type(Archive), "_archive_mode", return_value=True):
+            self._autovacuum(False)
+        self.assertTrue(requeued.exists())
+        self.assertFalse(Archive.search([("uuid", "=", "requeued")]))
+
+    def test_autovacuum_archive(self):
+        Archive = self.env["queue.job.archive"]
+        with mock.patch.object(type(Archive), "_archive_mode", return_value=True):
+            self._autovacuum(False)
+        # the jobs past their removal interval are deleted, the others are
+        # archived
+        archived = Archive.search(
+            [("uuid", "in", ["old_done", "old_cancelled", "recent_done", "sub_done"])]
+        )
+        self.assertEqual(archived.mapped("uuid"), ["recent_done"])
+        self.assertEqual(archived.id, self.recent_done.id)
+        self.assertEqual(archived.state, "done")
+        self.assertEqual(archived.date_done, self.recent_done.date_done)
+        self.assertEqual(
+            archived.date_removal, self.recent_done.date_done + timedelta(days=30)
+        )
+        self.assertFalse(self.recent_done.exists())
+        self.assertTrue(self.old_failed.exists())
+        self.assertIn(archived.date_removal.date(), Archive._partitions())
+
+    def test_archive_jobs(self):
+        Archive = self.env["queue.job.archive"]
+        self.recent_done.with_context(
+            _job_edit_sentinel=self.recent_done.EDIT_SENTINEL
+        ).write({"args": (1, "a"), "kwargs": {"check": True}})
+        self.env["queue.job"].archive_jobs()
+        # the archive is disabled
+        self.assertTrue(self.recent_done.exists())
+        with mock.patch.object(type(Archive), "_archive_mode", return_value=True):
+            self.env["queue.job"].archive_jobs()
+        archived = Archive.search([("uuid", "=", "recent_done")])
+        self.assertEqual(
+            archived.arguments,
+            {"records": None, "args": [1, "a"], "kwargs": {"check": True}},
+        )
+        self.assertIn('"check": true', archived.arguments_text)
+        # the jobs past their removal interval are not archived
+        self.assertFalse(self.old_done.exists())
+        self.assertFalse(Archive.search([("uuid", "=", "old_done")]))
+
+    def test_archive_without_arguments(self):
+        Archive = self.env["queue.job.archive"]
+        with mock.patch.object(
+            type(Archive), "_archive_mode", return_value=True
+        ), mock.patch.object(type(Archive), "_archive_arguments", False):
+            self.env["queue.job"].archive_jobs()
+        archived = Archive.search([("uuid", "=", "recent_done")])
+        self.assertTrue(archived)
+        self.assertFalse(archived.arguments)
+
+    def test_archive_drop_expired_partitions(self):
+        Archive = self.env["queue.job.archive"]
+        today = datetime.now()
+        Archive._create_partitions([today - timedelta(days=2), today])
+        self.assertEqual(Archive._drop_expired_partitions(), 1)
+        self.assertEqual(list(Archive._partitions()), [today.date()])
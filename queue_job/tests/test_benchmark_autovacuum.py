@@ -0,0 +1,62 @@
+# Copyright 2025 Camptocamp SA
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl.html)
+
+# pylint: disable=odoo-addons-relative-import
+import logging
+import time
+
+from odoo.tests import common, tagged
+
+from odoo.addons.queue_job.tests.test_autovacuum import AutovacuumMixin
+
+_logger = logging.getLogger(__name__)
+
+
+@tagged("-at_install", "post_install", "-standard", "queue_job_benchmark")
+class TestBenchmarkAutovacuum(AutovacuumMixin, common.TransactionCase):
+    """Delete rate of the autovacuum
+
+    Not run by default, run it with ``--test-tags queue_job_benchmark``.
+    Everything happens in the test transaction, which is rolled back.
+    """
+
+    size = 50_000
+
+    def setUp(self):
+        super().setUp()
+        # the notifications are not needed and would be kept in memory
+        # until the end of the transaction
+        self.env.cr.execute("ALTER TABLE queue_job DISABLE TRIGGER queue_job_notify")
+
+    def _insert_done_jobs(self):
+        self.env.cr.execute(
+            """
+            INSERT INTO queue_job (
+                uuid, user_id, state, model_name, method_name, channel,
+                date_created, date_done
+            )
+            SELECT
+                'autovacuum-' || i, %s, 'done', 'res.partner', 'write',
+                'root', now() at time zone 'utc' - interval '60 days',
+                now() at time zone 'utc' - interval '60 days'
+            FROM generate_series(1, %s) AS i
+            """,
+            (self.env.uid, self.size),
+        )
+
+    def test_autovacuum_rate(self):
+        for label, sql in (("unlink", False), ("sql", True)):
+            self._insert_done_jobs()
+            start = time.perf_counter()
+            self._autovacuum(sql)
+            duration = time.perf_counter() - start
+            self.assertFalse(
+                self.env["queue.job"].search_count([("uuid", "=like", "autovacuum-%")])
+            )
+            _logger.info(
+                "autovacuum of %d jobs with %s: %.2fs (%.0f jobs/s)",
+                self.size,
+                label,
+                duration,
+                self.size / duration,
+            )
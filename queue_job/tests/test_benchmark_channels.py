@@ -0,0 +1,282 @@
+# Copyright 2025 Camptocamp SA
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl.html)
+
+# pylint: disable=odoo-addons-relative-import
+import logging
+import random
+import time
+import tracemalloc
+from heapq import heappop, heappush
+from operator import attrgetter
+
+from odoo.tests import BaseCase, tagged
+
+from odoo.addons.queue_job.jobrunner.channels import (
+    ChannelJob,
+    ChannelManager,
+    PriorityQueue,
+)
+
+_logger = logging.getLogger(__name__)
+
+
+class LazyPriorityQueue:
+    """The former priority queue, which removes the objects lazily
+
+    Kept as the reference of the benchmarks.
+    """
+
+    def __init__(self):
+        self._heap = []
+        self._known = set()  # all objects in the heap (including removed)
+        self._removed = set()  # all objects that have been removed
+
+    def __len__(self):
+        return len(self._known) - len(self._removed)
+
+    def add(self, o):
+        self._removed.discard(o)
+        if o in self._known:
+            return
+        self._known.add(o)
+        heappush(self._heap, o)
+
+    def remove(self, o):
+        if o not in self._known:
+            return
+        self._removed.add(o)
+
+    def pop(self):
+        while True:
+            try:
+                o = heappop(self._heap)
+            except IndexError:
+                return None
+            self._known.remove(o)
+            if o in self._removed:
+                self._removed.remove(o)
+            else:
+                return o
+
+
+@tagged("-at_install", "post_install", "-standard", "queue_job_benchmark")
+class TestBenchmarkPriorityQueue(BaseCase):
+    """Priority queues under a churn of additions and cancellations
+
+    Not run by default, run it with ``--test-tags queue_job_benchmark``.
+    """
+
+    jobs = 200_000
+    operations = 400_000
+
+    def _workload(self):
+        """Operations of a busy channel: jobs are added, then removed
+        (cancelled, reprioritised) or popped (run)"""
+        rnd = random.Random(42)
+        jobs = [
+            ChannelJob(None, None, i, i, i, rnd.randint(0, 20), None)
+            for i in range(self.jobs)
+        ]
+        operations = []
+        in_queue = []
+        next_job = 0
+        for __ in range(self.operations):
+            choice = rnd.random()
+            if (choice < 0.5 or not in_queue) and next_job < len(jobs):
+                operations.append(("add", jobs[next_job]))
+                in_queue.append(jobs[next_job])
+                next_job += 1
+            elif choice < 0.85 and in_queue:
+                job = in_queue.pop(rnd.randrange(len(in_queue)))
+                operations.append(("remove", job))
+            else:
+                operations.append(("pop", None))
+        return operations
+
+    def _run(self, queue, operations):
+        start = time.perf_counter()
+        for operation, job in operations:
+            if operation == "add":
+                queue.add(job)
+            elif operation == "remove":
+                queue.remove(job)
+            else:
+                queue.pop()
+        return time.perf_counter() - start
+
+    def _peak_memory(self, queue, operations):
+        tracemalloc.start()
+        self._run(queue, operations)
+        __, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return peak
+
+    def test_mixed_workload(self):
+        operations = self._workload()
+        queue_factories = {
+            "LazyPriorityQueue": LazyPriorityQueue,
+            # as used by ChannelQueue
+            "PriorityQueue": lambda: PriorityQueue(key=attrgetter("_sorting_key")),
+        }
+        results = {}
+        for name, queue_factory in queue_factories.items():
+            queue = queue_factory()
+            duration = self._run(queue, operations)
+            peak = self._peak_memory(queue_factory(), operations)
+            results[name] = queue
+            _logger.info(
+                "%s: %d operations in %.3fs (%.0f ops/s), peak memory %.1f MiB, "
+                "%d jobs in the queue, %d in the heap",
+                name,
+                len(operations),
+                duration,
+                len(operations) / duration,
+                peak / 2**20,
+                len(queue),
+                len(queue._heap),
+            )
+        lazy, indexed = results["LazyPriorityQueue"], results["PriorityQueue"]
+        self.assertEqual(len(lazy), len(indexed))
+        # the removed jobs are not kept in the heap
+        self.assertEqual(len(indexed._heap), len(indexed))
+        self.assertGreater(len(lazy._heap), len(lazy))
+        self.assertEqual(
+            [lazy.pop() for __ in range(len(lazy))],
+            [indexed.pop() for __ in range(len(indexed))],
+        )
+
+
+@tagged("-at_install", "post_install", "-standard", "queue_job_benchmark")
+class TestBenchmarkChannelJob(BaseCase):
+    """Memory and heap operations of a million channel jobs
+
+    Not run by default, run it with ``--test-tags queue_job_benchmark``.
+    """
+
+    jobs = 1_000_000
+
+    def test_memory_and_heap_rates(self):
+        rnd = random.Random(42)
+        priorities = [rnd.randint(0, 20) for __ in range(self.jobs)]
+        tracemalloc.start()
+        before, __ = tracemalloc.get_traced_memory()
+        jobs = [
+            ChannelJob("db", None, f"uuid-{i}", i, 1700000000 + i, priority, None)
+            for i, priority in enumerate(priorities)
+        ]
+        after, __ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        # the list holding the jobs is not part of the cost of a job
+        per_job = (after - before) / self.jobs - 8
+
+        rnd.shuffle(jobs)
+        heap = []
+        start = time.perf_counter()
+        for job in jobs:
+            heappush(heap, job)
+        push_duration = time.perf_counter() - start
+        start = time.perf_counter()
+        popped = [heappop(heap) for __ in range(self.jobs)]
+        pop_duration = time.perf_counter() - start
+
+        _logger.info(
+            "%d channel jobs: %.0f bytes per job (with its uuid), "
+            "heappush %.0f jobs/s, heappop %.0f jobs/s",
+            self.jobs,
+            per_job,
+            self.jobs / push_duration,
+            self.jobs / pop_duration,
+        )
+        self.assertFalse(hasattr(jobs[0], "__dict__"))
+        self.assertEqual(
+            [job.sorting_key() for job in popped[:1000]],
+            sorted(job.sorting_key() for job in jobs)[:1000],
+        )
+
+
+@tagged("-at_install", "post_install", "-standard", "queue_job_benchmark")
+class TestBenchmarkChannelTree(BaseCase):
+    """Cost of a scheduling cycle with 1000 leaf channels
+
+    Not run by default, run it with ``--test-tags queue_job_benchmark``.
+    """
+
+    leaves = 1000
+    cycles = 200
+
+    def _wide_config(self):
+        # 10 channels of 100 leaves
+        return ["root:20"] + [
+            f"W{i}.L{j}:1" for i in range(10) for j in range(self.leaves // 10)
+        ]
+
+    def _deep_config(self):
+        # a chain of 10 channels, with 100 leaves on each level
+        config = ["root:20"]
+        path = ""
+        for depth in range(10):
+            path = f"{path}.D{depth}" if path else f"D{depth}"
+            config.append(f"{path}:50")
+            config += [f"{path}.L{j}:1" for j in range(self.leaves // 10)]
+        return config
+
+    def _cycle_cost(self, cm, change):
+        start = time.perf_counter()
+        for cycle in range(self.cycles):
+            change(cycle)
+            list(cm.get_jobs_to_run(now=100))
+        return (time.perf_counter() - start) / self.cycles
+
+    def _benchmark(self, name, config):
+        cm = ChannelManager()
+        cm.simple_configure(",".join(config))
+        leaves = [
+            channel.fullname
+            for channel in cm._channels_by_name.values()
+            if channel.name.startswith("L")
+        ]
+        self.assertEqual(len(leaves), self.leaves)
+        # one job running and two waiting in every leaf
+        seq = 0
+        for leaf in leaves:
+            for __ in range(3):
+                seq += 1
+                cm.notify("db", leaf, f"J{seq}", seq, 0, 10, None, "pending")
+        running = list(cm.get_jobs_to_run(now=100))
+        for job in running:
+            channel_name = job.channel.fullname
+            cm.notify("db", channel_name, job.uuid, job.seq, 0, 10, None, "done")
+
+        def idle(cycle):
+            pass
+
+        def one_change(cycle):
+            seq = 10_000_000 + cycle
+            cm.notify("db", leaves[cycle], f"N{seq}", seq, 0, 10, None, "pending")
+
+        def full_visit(cycle):
+            # the visit of every channel, as before the dirty tracking
+            for channel in cm._channels_by_name.values():
+                channel._dirty = True
+                if channel.parent:
+                    channel.parent._dirty_children[channel] = True
+
+        list(cm.get_jobs_to_run(now=100))
+        for label, change in (
+            ("nothing changed", idle),
+            ("one leaf changed", one_change),
+            ("all channels visited", full_visit),
+        ):
+            _logger.info(
+                "%s tree, %d leaves, %s: %.1f µs per cycle",
+                name,
+                self.leaves,
+                label,
+                self._cycle_cost(cm, change) * 1e6,
+            )
+
+    def test_wide_tree(self):
+        self._benchmark("wide", self._wide_config())
+
+    def test_deep_tree(self):
+        self._benchmark("deep", self._deep_config())
@@ -0,0 +1,94 @@
+# Copyright 2025 Camptocamp SA
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl.html)
+
+# pylint: disable=odoo-addons-relative-import
+import logging
+import time
+from unittest import mock
+
+from odoo.tests import common, tagged
+
+from odoo.addons.queue_job.job import Job, identity_exact, identity_exact_legacy
+from odoo.addons.queue_job.tests.test_job_store_many import SplitMixin
+
+_logger = logging.getLogger(__name__)
+
+
+def _store_one_by_one(jobs):
+    """Store the jobs as before Job.store_many, kept as the reference"""
+    for job_ in jobs:
+        job_.store()
+
+
+@tagged("-at_install", "post_install", "-standard", "queue_job_benchmark")
+class TestBenchmarkDelaySplit(SplitMixin, common.TransactionCase):
+    """Enqueue rate of the jobs of ``Delayable.split``
+
+    Not run by default, run it with ``--test-tags queue_job_benchmark``.
+    Everything happens in the test transaction, which is rolled back.
+    """
+
+    sizes = (1_000, 10_000, 100_000)
+    # storing the jobs one by one takes too long above this size
+    one_by_one_max_size = 10_000
+
+    def setUp(self):
+        super().setUp()
+        # the notifications are not needed and would be kept in memory
+        # until the end of the transaction
+        self.env.cr.execute("ALTER TABLE queue_job DISABLE TRIGGER queue_job_notify")
+
+    def _enqueue(self, size):
+        group = self._split(size)
+        start = time.perf_counter()
+        group.delay()
+        return time.perf_counter() - start
+
+    def test_split_enqueue_rate(self):
+        for size in self.sizes:
+            count = self.env["queue.job"].search_count([])
+            duration = self._enqueue(size)
+            self.assertEqual(self.env["queue.job"].search_count([]), count + size)
+            _logger.info(
+                "split in %d jobs, stored with one create: %.2fs (%.0f jobs/s)",
+                size,
+                duration,
+                size / duration,
+            )
+            if size > self.one_by_one_max_size:
+                continue
+            with mock.patch.object(Job, "store_many", _store_one_by_one):
+                duration = self._enqueue(size)
+            _logger.info(
+                "split in %d jobs, stored one by one: %.2fs (%.0f jobs/s)",
+                size,
+                duration,
+                size / duration,
+            )
+
+
+@tagged("-at_install", "post_install", "-standard", "queue_job_benchmark")
+class TestBenchmarkIdentityExact(common.TransactionCase):
+    """Cost of the identity key of a job with large arguments
+
+    Not run by default, run it with ``--test-tags queue_job_benchmark``.
+    """
+
+    rounds = 20
+
+    def _job(self):
+        records = self.env["res.partner"].browse(range(1, 10_001))
+        lines = [
+            {"name": f"line {i}", "quantity": i * 1.5, "tax_ids": list(range(10))}
+            for i in range(20_000)
+        ]
+        return Job(records.write, args=(lines,), kwargs={"check": True})
+
+    def test_identity_exact_rate(self):
+        job_ = self._job()
+        for func in (identity_exact_legacy, identity_exact):
+            start = time.perf_counter()
+            for __ in range(self.rounds):
+                func(job_)
+            duration = (time.perf_counter() - start) / self.rounds
+            _logger.info("%s: %.1f ms per job", func.__name__, duration * 1000)
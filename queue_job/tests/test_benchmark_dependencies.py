@@ -0,0 +1,64 @@
+# Copyright 2025 Camptocamp SA
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl.html)
+
+# pylint: disable=odoo-addons-relative-import
+import logging
+import time
+
+from odoo.tests import common, tagged
+
+from odoo.addons.queue_job.tests.test_job_dependencies import FanInMixin
+
+_logger = logging.getLogger(__name__)
+
+
+@tagged("-at_install", "post_install", "-standard", "queue_job_benchmark")
+class TestBenchmarkFanIn(FanInMixin, common.TransactionCase):
+    """Release of a job waiting for thousands of jobs
+
+    Not run by default, run it with ``--test-tags queue_job_benchmark``.
+    Everything happens in the test transaction, which is rolled back.
+    """
+
+    sizes = (1_000, 5_000)
+
+    def setUp(self):
+        super().setUp()
+        self.env.cr.execute("ALTER TABLE queue_job DISABLE TRIGGER queue_job_notify")
+
+    def test_fan_in_completion(self):
+        for size in self.sizes:
+            parents, child = self._fan_in(size)
+            self.env.cr.execute(
+                "UPDATE queue_job SET state = 'done' WHERE uuid = ANY(%s)",
+                ([parent.uuid for parent in parents],),
+            )
+            start = time.perf_counter()
+            for parent in parents:
+                parent.enqueue_waiting()
+            duration = time.perf_counter() - start
+            self.assertEqual(child.state, "pending")
+            _logger.info(
+                "%d parents done: %.2f ms per parent (%.2fs in total)",
+                size,
+                duration / size * 1000,
+                duration,
+            )
+
+    def test_dependency_graph_summary(self):
+        size = 20_000
+        parents, child = self._fan_in(size)
+        record = parents[0].db_record()
+        for label in ("first", "cached"):
+            self.env.invalidate_all()
+            start = time.perf_counter()
+            graph = record._dependency_graph_page()
+            duration = time.perf_counter() - start
+            self.assertEqual(graph["job_count"], size + 1)
+            _logger.info(
+                "dependency graph of %d jobs (%s): %.2f ms, %d nodes",
+                size + 1,
+                label,
+                duration * 1000,
+                len(graph["nodes"]),
+            )
@@ -0,0 +1,85 @@
+# Copyright 2025 Camptocamp SA
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl.html)
+
+# pylint: disable=odoo-addons-relative-import
+import logging
+import time
+import tracemalloc
+from unittest import mock
+
+from odoo.tests import common, tagged
+
+from odoo.addons.queue_job.job import Job
+
+_logger = logging.getLogger(__name__)
+
+
+@tagged("-at_install", "post_install", "-standard", "queue_job_benchmark")
+class TestBenchmarkJobListing(common.TransactionCase):
+    """Time and memory of loading 10k jobs with large arguments
+
+    Not run by default, run it with ``--test-tags queue_job_benchmark``.
+    Everything happens in the test transaction, which is rolled back.
+    """
+
+    jobs = 10_000
+
+    def setUp(self):
+        super().setUp()
+        self.env.cr.execute("ALTER TABLE queue_job DISABLE TRIGGER queue_job_notify")
+        partners = self.env["res.partner"]
+        lines = [{"name": f"line {i}", "quantity": i} for i in range(200)]
+        jobs = [
+            Job(partners.browse(i).write, args=(lines,), kwargs={"check": True})
+            for i in range(1, self.jobs + 1)
+        ]
+        Job.store_many(jobs)
+        self.records = self.env["queue.job"].search(
+            [("uuid", "in", [job_.uuid for job_ in jobs])]
+        )
+
+    def _measure(self, listing):
+        self.env.invalidate_all()
+        tracemalloc.start()
+        start = time.perf_counter()
+        listing(self.records)
+        duration = time.perf_counter() - start
+        __, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return duration, peak / 2**20
+
+    def _log(self, label, lazy, eager):
+        _logger.info(
+            "%s of %d jobs: %.2fs, %.1f MiB peak (decoding everything: "
+            "%.2fs, %.1f MiB peak)",
+            label,
+            self.jobs,
+            *lazy,
+            *eager,
+        )
+
+    def test_job_listing(self):
+        def load_jobs(records):
+            return [Job._load_from_db_record(record).state for record in records]
+
+        def load_jobs_eager(records):
+            jobs = [Job._load_from_db_record(record) for record in records]
+            return [(job_.args, job_.kwargs, job_.state) for job_ in jobs]
+
+        self._log(
+            "Job objects", self._measure(load_jobs), self._measure(load_jobs_eager)
+        )
+
+    def test_field_listing(self):
+        def read_fields(records):
+            return [(record.state, record.args, record.kwargs) for record in records]
+
+        lazy = self._measure(read_fields)
+        args_field = self.records._fields["args"]
+        kwargs_field = self.records._fields["kwargs"]
+        with (
+            mock.patch.object(args_field, "_lazy", False),
+            mock.patch.object(kwargs_field, "_lazy", False),
+        ):
+            eager = self._measure(read_fields)
+        self._log("args and kwargs fields", lazy, eager)
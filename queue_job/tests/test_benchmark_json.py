@@ -0,0 +1,96 @@
+# Copyright 2025 Camptocamp SA
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl.html)
+
+# pylint: disable=odoo-addons-relative-import
+import json
+import logging
+import time
+from datetime import date, datetime, timedelta
+
+import dateutil
+
+from odoo.tests import common, tagged
+
+from odoo.addons.queue_job.fields import JobDecoder, JobEncoder, job_dumps
+
+_logger = logging.getLogger(__name__)
+
+
+class UncachedJobDecoder(JobDecoder):
+    """The former decoder, which builds the models of every recordset
+
+    Kept as the reference of the benchmarks.
+    """
+
+    def object_hook(self, obj):
+        if "_type" not in obj:
+            return obj
+        type_ = obj["_type"]
+        if type_ == "odoo_recordset":
+            model = self.env(user=obj.get("uid"), su=obj.get("su"))[obj["model"]]
+            if obj.get("context"):
+                model = model.with_context(**obj.get("context"))
+            return model.browse(obj["ids"])
+        elif type_ == "datetime_isoformat":
+            return dateutil.parser.parse(obj["value"])
+        elif type_ == "date_isoformat":
+            return dateutil.parser.parse(obj["value"]).date()
+        return super().object_hook(obj)
+
+
+@tagged("-at_install", "post_install", "-standard", "queue_job_benchmark")
+class TestBenchmarkJson(common.TransactionCase):
+    """Encoding and decoding of the arguments of jobs
+
+    Not run by default, run it with ``--test-tags queue_job_benchmark``.
+    """
+
+    rounds = 20
+
+    def _payloads(self):
+        partners = self.env["res.partner"].search([], limit=10)
+        user_env = self.env(user=self.env.ref("base.user_demo"))
+        start = datetime(2025, 1, 1)
+        return {
+            "ids and strings": [
+                list(range(10_000)),
+                {f"key {i}": f"value {i}" for i in range(2_000)},
+            ],
+            "1000 recordsets": [
+                user_env["res.partner"].browse(partner.id)
+                for __ in range(100)
+                for partner in partners
+            ],
+            "5000 dates": [
+                {"date": (start + timedelta(hours=i)).date(), "at": start}
+                for i in range(2_500)
+            ],
+        }
+
+    def _duration(self, func, *args, **kwargs):
+        start = time.perf_counter()
+        for __ in range(self.rounds):
+            func(*args, **kwargs)
+        return (time.perf_counter() - start) / self.rounds * 1000
+
+    def test_codec_rates(self):
+        for name, payload in self._payloads().items():
+            value_json = json.dumps(payload, cls=JobEncoder)
+            self.assertEqual(json.loads(job_dumps(payload)), json.loads(value_json))
+            decoded = json.loads(value_json, cls=JobDecoder, env=self.env)
+            self.assertEqual(
+                decoded, json.loads(value_json, cls=UncachedJobDecoder, env=self.env)
+            )
+            if name == "5000 dates":
+                self.assertIsInstance(decoded[0]["date"], date)
+            _logger.info(
+                "%s: encode %.2f ms (orjson: %.2f ms), "
+                "decode %.2f ms (former decoder: %.2f ms)",
+                name,
+                self._duration(json.dumps, payload, cls=JobEncoder),
+                self._duration(job_dumps, payload),
+                self._duration(json.loads, value_json, cls=JobDecoder, env=self.env),
+                self._duration(
+                    json.loads, value_json, cls=UncachedJobDecoder, env=self.env
+                ),
+            )
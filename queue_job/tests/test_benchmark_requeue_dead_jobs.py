@@ -0,0 +1,105 @@
+# Copyright 2025 Camptocamp SA
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl.html)
+
+# pylint: disable=odoo-addons-relative-import
+import logging
+import time
+
+from odoo.tests import common, tagged
+from odoo.tools import index_exists
+
+from odoo.addons.queue_job.jobrunner import runner
+
+_logger = logging.getLogger(__name__)
+
+INDEX = "queue_job_in_flight_date_enqueued_partial_index"
+
+
+@tagged("-at_install", "post_install", "-standard", "queue_job_benchmark")
+class TestBenchmarkRequeueDeadJobs(common.TransactionCase):
+    """Query plan of the detection of dead jobs on a large table
+
+    Not run by default, run it with ``--test-tags queue_job_benchmark``.
+    Everything happens in the test transaction, which is rolled back.
+    """
+
+    # done jobs in the synthetic table, one job in flight every
+    # ``in_flight_every`` jobs
+    rows = 1_000_000
+    in_flight_every = 1000
+
+    def _populate(self):
+        cr = self.env.cr
+        # the notifications are not needed and would be kept in memory
+        # until the end of the transaction
+        cr.execute("ALTER TABLE queue_job DISABLE TRIGGER queue_job_notify")
+        cr.execute(
+            """
+            INSERT INTO queue_job
+                (uuid, name, channel, state, date_created, date_enqueued, date_done)
+            SELECT
+                'benchmark-' || i,
+                'benchmark',
+                'root',
+                CASE
+                    WHEN i %% %(every)s = 0 THEN 'started'
+                    WHEN i %% %(every)s = 1 THEN 'enqueued'
+                    ELSE 'done'
+                END,
+                now() at time zone 'utc' - interval '1 day',
+                now() at time zone 'utc' - interval '1 hour',
+                CASE
+                    WHEN i %% %(every)s IN (0, 1) THEN NULL
+                    ELSE now() at time zone 'utc' - interval '1 hour'
+                END
+            FROM generate_series(1, %(rows)s) i
+            """,
+            {"rows": self.rows, "every": self.in_flight_every},
+        )
+        # like Job.add_lock_record, the locks of the jobs done are kept
+        cr.execute(
+            "INSERT INTO queue_job_lock (id, queue_job_id) "
+            "SELECT id, id FROM queue_job WHERE name = 'benchmark'"
+        )
+        cr.execute("ANALYZE queue_job")
+        cr.execute("ANALYZE queue_job_lock")
+
+    def _explain_requeue(self):
+        cr = self.env.cr
+        query = runner.Database._query_requeue_dead_jobs(None)
+        # the update is executed by EXPLAIN ANALYZE, keep the table as is
+        cr.execute("SAVEPOINT benchmark_requeue")
+        start = time.perf_counter()
+        cr.execute("EXPLAIN (ANALYZE, BUFFERS) " + query)
+        duration = time.perf_counter() - start
+        plan = "\n".join(line for (line,) in cr.fetchall())
+        cr.execute("ROLLBACK TO SAVEPOINT benchmark_requeue")
+        return plan, duration
+
+    def test_requeue_query_plan(self):
+        cr = self.env.cr
+        if index_exists(cr, INDEX):
+            cr.execute(f"DROP INDEX {INDEX}")
+        self._populate()
+        plan_before, duration_before = self._explain_requeue()
+
+        self.env["queue.job"].init()
+        self.assertTrue(index_exists(cr, INDEX))
+        cr.execute("ANALYZE queue_job")
+        plan_after, duration_after = self._explain_requeue()
+
+        _logger.info(
+            "requeue of dead jobs on %d jobs, without %s: %.3fs\n%s",
+            self.rows,
+            INDEX,
+            duration_before,
+            plan_before,
+        )
+        _logger.info(
+            "requeue of dead jobs on %d jobs, with %s: %.3fs\n%s",
+            self.rows,
+            INDEX,
+            duration_after,
+            plan_after,
+        )
+        self.assertIn(INDEX, plan_after)
@@ -0,0 +1,122 @@
+# Copyright 2025 Camptocamp SA
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl.html)
+
+# pylint: disable=odoo-addons-relative-import
+from unittest import mock
+
+from odoo.tests import common, tagged
+
+from odoo.addons.queue_job.delay import Delayable, chain, group
+from odoo.addons.queue_job.models import queue_job
+
+
+@tagged("-at_install", "post_install")
+class TestDependencyGraph(common.TransactionCase):
+    def setUp(self):
+        super().setUp()
+        partners = self.env["res.partner"]
+        self.delayables = [
+            Delayable(partners.browse(i)).write({"comment": "graph"})
+            for i in range(1, 6)
+        ]
+        first, second, third, fourth, last = self.delayables
+        chain(first, group(second, third, fourth), last).delay()
+        self.records = [
+            delayable._generated_job.db_record() for delayable in self.delayables
+        ]
+        queue_job._graph_topology_cache.clear()
+
+    def _user_of_other_company(self, jobs):
+        """Move ``jobs`` to another company, return a user who cannot see them"""
+        jobs.company_id = self.env["res.company"].create({"name": "Other Company"})
+        return self.env["res.users"].create(
+            {
+                "name": "Job Manager",
+                "login": "queue_job_graph_manager",
+                "company_id": self.env.company.id,
+                "company_ids": [(6, 0, self.env.company.ids)],
+                "groups_id": [
+                    (4, self.env.ref("queue_job.group_queue_job_manager").id)
+                ],
+            }
+        )
+
+    def test_levels(self):
+        first, second, third, fourth, last = self.records
+        graph = first._dependency_graph_page()
+        self.assertEqual(graph["job_count"], 5)
+        self.assertEqual(graph["level_count"], 3)
+        self.assertEqual(
+            [(level["level"], level["count"]) for level in graph["levels"]],
+            [(0, 1), (1, 3), (2, 1)],
+        )
+        self.assertEqual(graph["levels"][1]["states"], {"wait_dependencies": 3})
+        self.assertEqual(
+            sorted(node["id"] for node in graph["nodes"]),
+            sorted(record.id for record in self.records),
+        )
+        self.assertEqual(
+            sorted(graph["edges"]),
+            sorted(
+                [(first.id, job.id) for job in (second, third, fourth)]
+                + [(job.id, last.id) for job in (second, third, fourth)]
+            ),
+        )
+        # the levels and parents are cached, only the states and the access
+        # are read
+        with self.assertQueryCount(2):
+            self.assertEqual(first._dependency_graph_page(), graph)
+
+    def test_collapse_fan_out(self):
+        first, second, third, fourth, last = self.records
+        with mock.patch.object(type(first), "_dependency_graph_fan_out_limit", 2):
+            graph = third._dependency_graph_page()
+        collapsed = "1:wait_dependencies"
+        nodes = {node["id"]: node for node in graph["nodes"]}
+        # the current job is not collapsed
+        self.assertEqual(set(nodes), {first.id, collapsed, third.id, last.id})
+        self.assertEqual(nodes[collapsed]["count"], 3)
+        self.assertEqual(
+            sorted(graph["edges"], key=str),
+            sorted(
+                [
+                    (first.id, collapsed),
+                    (first.id, third.id),
+                    (collapsed, last.id),
+                    (third.id, last.id),
+                ],
+                key=str,
+            ),
+        )
+
+    def test_multi_company(self):
+        first, second, third, fourth, last = self.records
+        user = self._user_of_other_company(last)
+        graph = first.with_user(user)._dependency_graph_page()
+        self.assertEqual(graph["job_count"], 4)
+        self.assertNotIn(last.id, [node["id"] for node in graph["nodes"]])
+        self.assertNotIn(last.id, [edge[1] for edge in graph["edges"]])
+
+    def test_level_gap(self):
+        first, second, third, fourth, last = self.records
+        user = self._user_of_other_company(second | third | fourth)
+        first = first.with_user(user)
+        graph = first._dependency_graph_page()
+        # the whole level 1 is hidden, the last level is still shown
+        self.assertEqual(graph["level_count"], 3)
+        self.assertEqual(
+            [(level["level"], level["count"]) for level in graph["levels"]],
+            [(0, 1), (2, 1)],
+        )
+        with mock.patch.object(type(first), "_dependency_graph_page_levels", 1):
+            graph = first._dependency_graph_page(level_offset=2)
+        self.assertEqual([level["level"] for level in graph["levels"]], [2])
+        self.assertEqual([node["id"] for node in graph["nodes"]], [last.id])
+
+    def test_pages(self):
+        first = self.records[0]
+        with mock.patch.object(type(first), "_dependency_graph_page_levels", 2):
+            graph = first.get_dependency_graph(level_offset=2)
+        self.assertEqual([level["level"] for level in graph["levels"]], [2])
+        self.assertEqual([node["id"] for node in graph["nodes"]], [self.records[-1].id])
+        self.assertEqual(graph["edges"], [])
@@ -0,0 +1,66 @@
+# Copyright 2025 Camptocamp SA
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl.html)
+
+# pylint: disable=odoo-addons-relative-import
+from odoo.tests import common, tagged
+
+from odoo.addons.queue_job.delay import Delayable, group
+from odoo.addons.queue_job.job import Job
+
+
+class FanInMixin:
+    def _fan_in(self, size):
+        """``size`` jobs which must all be done before a last job"""
+        partners = self.env["res.partner"]
+        parents = [
+            Delayable(partners.browse(i)).write({"comment": "parent"})
+            for i in range(1, size + 1)
+        ]
+        child = Delayable(partners).write({"comment": "child"})
+        group(*parents).on_done(child).delay()
+        return (
+            [parent._generated_job for parent in parents],
+            child._generated_job.db_record(),
+        )
+
+    def _finish(self, job_, method):
+        method(job_)
+        job_.store()
+        self.env.flush_all()
+
+
+@tagged("-at_install", "post_install")
+class TestJobDependencyEdges(FanInMixin, common.TransactionCase):
+    def test_edges(self):
+        parents, child = self._fan_in(3)
+        edges = self.env["queue.job.dependency"].search(
+            [("child_id", "=", child.id)]
+        )
+        self.assertEqual(
+            sorted(edges.parent_id.ids),
+            sorted(parent.db_record().id for parent in parents),
+        )
+        self.assertEqual(child.state, "wait_dependencies")
+        self.assertEqual(child.dependencies_remaining, 3)
+
+    def test_enqueue_waiting(self):
+        parents, child = self._fan_in(2)
+        self._finish(parents[0], Job.set_done)
+        parents[0].enqueue_waiting()
+        # released only once
+        parents[0].enqueue_waiting()
+        self.assertEqual(child.dependencies_remaining, 1)
+        self.assertEqual(child.state, "wait_dependencies")
+        self._finish(parents[1], Job.set_done)
+        parents[1].enqueue_waiting()
+        self.assertEqual(child.dependencies_remaining, 0)
+        self.assertEqual(child.state, "pending")
+
+    def test_cancel_dependent_jobs(self):
+        parents, child = self._fan_in(2)
+        self._finish(parents[0], Job.set_cancelled)
+        parents[0].cancel_dependent_jobs()
+        self.assertEqual(child.state, "wait_dependencies")
+        self._finish(parents[1], Job.set_cancelled)
+        parents[1].cancel_dependent_jobs()
+        self.assertEqual(child.state, "cancelled")
@@ -0,0 +1,124 @@
+# Copyright 2025 Camptocamp SA
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl.html)
+
+# pylint: disable=odoo-addons-relative-import
+import os
+import threading
+from unittest import mock
+
+from lxml import etree
+
+from odoo.tests import common, tagged
+
+from odoo.addons.queue_job.delay import Delayable, chain
+from odoo.addons.queue_job.job import Job, identity_exact, identity_exact_legacy
+
+
+@tagged("-at_install", "post_install")
+class TestJobIdentityKeys(common.TransactionCase):
+    def _delay(self, identity_key):
+        partners = self.env["res.partner"]
+        return partners.with_delay(identity_key=identity_key).write({})
+
+    def test_db_records_by_identity_keys(self):
+        job_a = self._delay("key-a")
+        job_b = self._delay("key-b")
+        job_c = self._delay("key-c")
+        job_c.db_record().state = "done"
+        self.env.flush_all()
+        with self.assertQueryCount(1):
+            existing = Job.db_records_by_identity_keys(
+                self.env, ["key-a", "key-b", "key-c", "key-d", "key-a"]
+            )
+        self.assertEqual(
+            existing, {"key-a": job_a.db_record(), "key-b": job_b.db_record()}
+        )
+        self.assertEqual(Job.db_records_by_identity_keys(self.env, []), {})
+
+    def test_record_with_same_identity_key(self):
+        job_a = self._delay("key-a")
+        self.assertEqual(job_a.job_record_with_same_identity_key(), job_a.db_record())
+        job_a.db_record().state = "done"
+        self.assertFalse(job_a.job_record_with_same_identity_key())
+
+    def test_graph_existing_jobs(self):
+        partners = self.env["res.partner"]
+
+        def graph():
+            delayables = [
+                Delayable(partners, identity_key="graph-1").write({}),
+                Delayable(partners, identity_key="graph-2").write({}),
+            ]
+            chain(*delayables).delay()
+            return [delayable._generated_job for delayable in delayables]
+
+        first_jobs = graph()
+        count = self.env["queue.job"].search_count([])
+        # all the jobs exist, none is created and all are replaced
+        second_jobs = graph()
+        self.assertEqual(self.env["queue.job"].search_count([]), count)
+        self.assertEqual(second_jobs, [job_.db_record() for job_ in first_jobs])
+
+
+@tagged("-at_install", "post_install")
+class TestIdentityExact(common.TransactionCase):
+    def _job(self, ids, *args, **kwargs):
+        records = self.env["res.partner"].browse(ids)
+        return Job(records.write, args=args, kwargs=kwargs)
+
+    def test_identity_exact_canonical(self):
+        countries = self.env["res.country"]
+        name = "".join(["na", "me"])
+        key = identity_exact(
+            self._job([1, 2], "name", countries.browse([3, 4]), a=1, b=[2])
+        )
+        self.assertEqual(len(key), 32)
+        same = self._job([2, 1], name, countries.browse([4, 3]), b=[2], a=1)
+        self.assertEqual(identity_exact(same), key)
+        for other in (
+            self._job([1, 3], "name", countries.browse([3, 4]), a=1, b=[2]),
+            self._job([1, 2], "name", countries.browse([3]), a=1, b=[2]),
+            self._job([1, 2], "name", countries.browse([3, 4]), a="1", b=[2]),
+            self._job([1, 2], "name", countries.browse([3, 4]), a=1, b=(2,)),
+            self._job([1, 2], "name", countries.browse([3, 4]), a=1),
+        ):
+            self.assertNotEqual(identity_exact(other), key)
+
+    def test_identity_exact_unpicklable(self):
+        # XML elements are supported by the job arguments
+        partners = self.env["res.partner"]
+        delayed = partners.with_delay(identity_key=identity_exact).write(
+            {"comment": etree.fromstring("<a><b/></a>")}
+        )
+        self.assertTrue(delayed.db_record())
+        key = identity_exact(self._job([1], etree.fromstring("<a><b/></a>")))
+        self.assertEqual(
+            identity_exact(self._job([1], etree.fromstring("<a><b/></a>"))), key
+        )
+        self.assertNotEqual(
+            identity_exact(self._job([1], etree.fromstring("<a><c/></a>"))), key
+        )
+        # other values which cannot be pickled are hashed from their repr
+        lock = threading.Lock()
+        key = identity_exact(self._job([1], lock))
+        self.assertEqual(len(key), 32)
+        self.assertEqual(identity_exact(self._job([1], lock)), key)
+
+    def test_identity_key_cached(self):
+        job_ = self._job([1], "name")
+        with mock.patch.object(job_, "_identity_key_func", wraps=identity_exact):
+            self.assertEqual(job_.identity_key, job_.identity_key)
+            job_._identity_key_func.assert_called_once()
+
+    def test_identity_legacy_mode(self):
+        partners = self.env["res.partner"]
+        legacy_key = identity_exact_legacy(self._job([], {"comment": "x"}))
+        legacy = partners.with_delay(identity_key=legacy_key).write({"comment": "x"})
+        job_ = self._job([], {"comment": "x"})
+        job_.identity_key = identity_exact
+        self.assertFalse(job_.job_record_with_same_identity_key())
+        with mock.patch.dict(os.environ, {"ODOO_QUEUE_JOB_IDENTITY_LEGACY": "1"}):
+            self.assertEqual(job_.identity_keys, [job_.identity_key, legacy_key])
+            self.assertEqual(
+                job_.job_record_with_same_identity_key(), legacy.db_record()
+            )
@@ -0,0 +1,42 @@
+# Copyright 2025 Camptocamp SA
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl.html)
+
+# pylint: disable=odoo-addons-relative-import
+from unittest import mock
+
+from odoo.tests import common, tagged
+
+from odoo.addons.queue_job.job import Job
+
+
+class SplitMixin:
+    def _split(self, size):
+        """A group of ``size`` jobs, as returned by ``Delayable.split(1)``"""
+        # the records are not read, they do not have to exist
+        records = self.env["res.partner"].browse(range(1, size + 1))
+        return records.delayable().write({"comment": "split"}).split(1)
+
+
+@tagged("-at_install", "post_install")
+class TestJobStoreMany(SplitMixin, common.TransactionCase):
+    def test_store_many_split(self):
+        group = self._split(5)
+        with mock.patch.object(
+            Job, "store_many", side_effect=Job.store_many
+        ) as store_many:
+            group.delay()
+        store_many.assert_called_once()
+        jobs = [delayable._generated_job for delayable in group._delayables]
+        records = self.env["queue.job"].search(
+            [("uuid", "in", [job_.uuid for job_ in jobs])]
+        )
+        self.assertEqual(len(records), 5)
+        self.assertEqual(len(set(records.mapped("graph_uuid"))), 1)
+        self.assertEqual(
+            sorted(name.rsplit(" ", 1)[1] for name in records.mapped("name")),
+            sorted(f"{i}/5)" for i in range(1, 6)),
+        )
+        self.assertEqual(
+            sorted(record.records.id for record in records), [1, 2, 3, 4, 5]
+        )
+        self.assertEqual(set(records.mapped("state")), {"pending"})
@@ -3,6 +3,7 @@
 
 import json
 from datetime import date, datetime
+from unittest import mock
 
 from lxml import etree
 
@@ -10,7 +11,9 @@ from odoo.tests import common
 
 # pylint: disable=odoo-addons-relative-import
 # we are testing, we want to test as we were an external consumer of the API
-from odoo.addons.queue_job.fields import JobDecoder, JobEncoder
+from odoo.addons.queue_job import fields
+from odoo.addons.queue_job.fields import JobDecoder, JobEncoder, job_dumps
+from odoo.addons.queue_job.job import Job
 
 
 class TestJson(common.TransactionCase):
@@ -161,3 +164,89 @@ class TestJson(common.TransactionCase):
         value = json.loads(value_json, cls=JobDecoder, env=self.env)
         value[2] = etree.tostring(value[2])
         self.assertEqual(value, expected)
+
+    def test_decoder_recordset_shared_env(self):
+        demo_user = self.env.ref("base.user_demo")
+        recordset = {
+            "_type": "odoo_recordset",
+            "model": "res.partner",
+            "uid": demo_user.id,
+            "context": {"lang": "en_US"},
+        }
+        value_json = json.dumps(
+            [
+                dict(recordset, ids=[1]),
+                dict(recordset, ids=[2]),
+                dict(recordset, model="res.users", ids=[1]),
+            ]
+        )
+        first, second, user = json.loads(value_json, cls=JobDecoder, env=self.env)
+        self.assertIs(first.env, second.env)
+        self.assertIs(first.env, user.env)
+        self.assertEqual(first.env.user, demo_user)
+        self.assertEqual(first.env.context["lang"], "en_US")
+        self.assertEqual(user, self.env.ref("base.user_root"))
+
+    def test_decoder_datetime_timezone(self):
+        value_json = (
+            '[{"_type": "datetime_isoformat", "value": "2017-04-19T08:48:50+02:00"}]'
+        )
+        value = json.loads(value_json, cls=JobDecoder, env=self.env)
+        self.assertEqual(value, [datetime.fromisoformat("2017-04-19T08:48:50+02:00")])
+
+    def _codec_values(self):
+        partner = self.env.ref("base.main_partner")
+        return [
+            "a",
+            1,
+            2**70,
+            {"date": date(2017, 4, 19), "partner": partner},
+            [datetime(2017, 4, 19, 8, 48, 50, 1)],
+        ]
+
+    def test_job_dumps(self):
+        values = self._codec_values()
+        value_json = job_dumps(values)
+        self.assertEqual(
+            json.loads(value_json), json.loads(json.dumps(values, cls=JobEncoder))
+        )
+        value = json.loads(value_json, cls=JobDecoder, env=self.env)
+        self.assertEqual(value, values)
+
+    def test_job_dumps_without_orjson(self):
+        values = self._codec_values()
+        with mock.patch.object(fields, "orjson", None):
+            value_json = job_dumps(values)
+        self.assertEqual(value_json, json.dumps(values, cls=JobEncoder))
+
+    def test_job_dumps_non_finite_float(self):
+        values = [1.5, {"nan": float("nan")}, (float("inf"), -float("inf")), None]
+        self.assertEqual(job_dumps(values), json.dumps(values, cls=JobEncoder))
+        with mock.patch.object(fields, "orjson", None):
+            self.assertEqual(job_dumps(values), json.dumps(values, cls=JobEncoder))
+        self.assertEqual(json.loads(job_dumps([1.5, None])), [1.5, None])
+
+    def test_lazy_field(self):
+        partners = self.env["res.partner"]
+        job_ = partners.with_delay().write({"comment": "lazy"})
+        record = job_.db_record()
+        record.invalidate_recordset()
+        with mock.patch.object(fields.json, "loads", wraps=json.loads) as loads:
+            args = record.args
+            kwargs = record.kwargs
+            loads.assert_not_called()
+            self.assertEqual(list(args), [{"comment": "lazy"}])
+            self.assertEqual(dict(kwargs), {})
+            self.assertEqual(loads.call_count, 2)
+        self.assertEqual(record.read(["args"])[0]["args"], [{"comment": "lazy"}])
+
+    def test_load_decodes_arguments_on_use(self):
+        partners = self.env["res.partner"]
+        stored = partners.with_delay().write({"comment": "lazy"})
+        self.env.invalidate_all()
+        job_ = Job.load(self.env, stored.uuid)
+        self.assertIsNone(job_._args)
+        self.assertIsNone(job_._kwargs)
+        self.assertEqual(job_.args, ({"comment": "lazy"},))
+        self.assertEqual(job_.kwargs, {})
+        self.assertEqual(job_.func_string, stored.func_string)
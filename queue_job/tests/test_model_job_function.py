@@ -55,3 +55,11 @@ class TestJobFunction(common.TransactionCase):
                 job_function_id=job_function.id,
             ),
         )
+
+    def test_function_batch_size(self):
+        job_function = self.env["queue.job.function"].create(
+            {"name": "<res.users>.read"}
+        )
+        self.assertEqual(job_function.batch_size, 1)
+        with self.assertRaises(exceptions.ValidationError):
+            job_function.batch_size = 0
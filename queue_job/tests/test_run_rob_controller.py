@@ -1,5 +1,8 @@
 # License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
 
+from datetime import datetime, timedelta
+from unittest import mock
+
 from odoo.tests.common import TransactionCase
 
 from ..controllers.main import RunJobController
@@ -7,6 +10,12 @@ from ..job import Job
 
 
 class TestRunJobController(TransactionCase):
+    def setUp(self):
+        super().setUp()
+        # the batches use their own cursors
+        self.registry.enter_test_mode(self.cr)
+        self.addCleanup(self.registry.leave_test_mode)
+
     def test_get_failure_values(self):
         method = self.env["res.users"].mapped
         job = Job(method)
@@ -15,3 +24,60 @@ class TestRunJobController(TransactionCase):
         self.assertEqual(
             rslt, {"exc_info": "info", "exc_name": "Exception", "exc_message": "zero"}
         )
+
+    def _job(self, state, date_enqueued):
+        job = Job(self.env["res.users"].mapped, args=("name",))
+        job.store()
+        record = job.db_record()
+        record.with_context(
+            _job_edit_sentinel=self.env["queue.job"].EDIT_SENTINEL
+        ).write({"state": state, "date_enqueued": date_enqueued})
+        self.env.flush_all()
+        return record
+
+    def test_refresh_date_enqueued(self):
+        old = datetime.now().replace(microsecond=0) - timedelta(minutes=5)
+        jobs = {state: self._job(state, old) for state in ("enqueued", "started")}
+        RunJobController()._refresh_date_enqueued(
+            self.env, [job.uuid for job in jobs.values()]
+        )
+        self.env.invalidate_all()
+        # the job started is not waiting for its turn
+        self.assertEqual(jobs["started"].date_enqueued, old)
+        self.assertGreater(jobs["enqueued"].date_enqueued, old)
+
+    def test_runjobs(self):
+        old = datetime.now().replace(microsecond=0) - timedelta(minutes=5)
+        jobs = self._job("enqueued", old) | self._job("enqueued", old)
+        run_job = mock.Mock(side_effect=[Exception("failed"), None])
+        success = RunJobController()._runjobs(
+            self.env.cr.dbname, jobs.mapped("uuid"), run_job
+        )
+        self.assertFalse(success)
+        self.assertEqual(
+            [call.args[0] for call in run_job.call_args_list], jobs.mapped("uuid")
+        )
+        # the jobs waiting for their turn can be found dead if the batch dies
+        self.env.cr.execute(
+            "SELECT queue_job_id FROM queue_job_lock WHERE queue_job_id IN %s",
+            (tuple(jobs.ids),),
+        )
+        self.assertEqual({row[0] for row in self.env.cr.fetchall()}, set(jobs.ids))
+        self.env.invalidate_all()
+        self.assertTrue(all(job.date_enqueued > old for job in jobs))
+
+    def test_runjobs_time_budget(self):
+        jobs = self._job("enqueued", datetime.now()) | self._job(
+            "enqueued", datetime.now()
+        )
+        run_job = mock.Mock()
+        with mock.patch.object(RunJobController, "_batch_time_budget", return_value=-1):
+            self.assertTrue(
+                RunJobController()._runjobs(
+                    self.env.cr.dbname, jobs.mapped("uuid"), run_job
+                )
+            )
+        run_job.assert_not_called()
+        self.env.invalidate_all()
+        self.assertEqual(jobs.mapped("state"), ["pending", "pending"])
+        self.assertFalse(any(jobs.mapped("date_enqueued")))
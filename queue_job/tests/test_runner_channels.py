@@ -3,8 +3,75 @@
 
 # pylint: disable=odoo-addons-relative-import
 # we are testing, we want to test as we were an external consumer of the API
+import random
+
+from odoo.tests import BaseCase, tagged
+
 from odoo.addons.queue_job.jobrunner import channels
 
 from .common import load_doctests
 
 load_tests = load_doctests(channels)
+
+
+@tagged("-at_install", "post_install")
+class TestChannelManager(BaseCase):
+    def test_wakeup_index_matches_channel_tree(self):
+        """The wakeup index gives the wakeup time of a walk of the tree"""
+        rnd = random.Random(4)
+        cm = channels.ChannelManager()
+        cm.simple_configure(
+            "root:6,A:3,A.A1:1:sequential,A.A2:2:throttle=3,B:2,B.B1:1,C:4:throttle=2"
+        )
+        channel_names = ["root", "A", "A.A1", "A.A2", "B", "B.B1", "C"]
+        states = ["pending", "pending", "started", "failed", "done"]
+        now = 100
+        for seq in range(2000):
+            uuid = f"J{rnd.randrange(60)}"
+            eta = rnd.choice([None, None, now + rnd.randint(-2, 15)])
+            cm.notify(
+                "db",
+                rnd.choice(channel_names),
+                uuid,
+                seq,
+                0,
+                rnd.randint(0, 3),
+                eta,
+                rnd.choice(states),
+            )
+            if rnd.random() < 0.3:
+                now += rnd.randint(0, 3)
+                list(cm.get_jobs_to_run(now))
+            self.assertEqual(cm.get_wakeup_time(), cm._root_channel.get_wakeup_time())
+
+    def test_dirty_channels_match_full_visit(self):
+        """Visiting the dirty channels finds the jobs of a visit of all"""
+        rnd = random.Random(12)
+        config = "root:5,A:3,A.A1:1:sequential,A.A2:2:throttle=2,B:2,B.B1:1,C:1"
+        channel_names = ["root", "A", "A.A1", "A.A2", "B", "B.B1", "C"]
+        states = ["pending", "pending", "started", "failed", "done"]
+        dirty_cm, full_cm = channels.ChannelManager(), channels.ChannelManager()
+        dirty_cm.simple_configure(config)
+        full_cm.simple_configure(config)
+        now = 100
+        for seq in range(2000):
+            job_datas = (
+                "db",
+                rnd.choice(channel_names),
+                f"J{rnd.randrange(60)}",
+                seq,
+                0,
+                rnd.randint(0, 3),
+                rnd.choice([None, None, now + rnd.randint(-2, 10)]),
+                rnd.choice(states),
+            )
+            dirty_cm.notify(*job_datas)
+            full_cm.notify(*job_datas)
+            if rnd.random() < 0.4:
+                now += rnd.randint(0, 2)
+                for channel in full_cm._channels_by_name.values():
+                    channel._mark_dirty()
+                self.assertEqual(
+                    [job.uuid for job in dirty_cm.get_jobs_to_run(now)],
+                    [job.uuid for job in full_cm.get_jobs_to_run(now)],
+                )
@@ -4,10 +4,16 @@
 # pylint: disable=odoo-addons-relative-import
 # we are testing, we want to test as we were an external consumer of the API
 import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+import psycopg2
 
 from odoo.tests import BaseCase, tagged
 
-from odoo.addons.queue_job.jobrunner import runner
+from odoo.addons.queue_job.jobrunner import dispatcher, executor, runner
 
 from .common import load_doctests
 
@@ -57,3 +63,391 @@ class TestRunner(BaseCase):
 
         self.assertFalse(self._is_open_file_descriptor(read_fd))
         self.assertFalse(self._is_open_file_descriptor(write_fd))
+
+    def test_run_jobs_batch_enqueue(self):
+        a_runner = runner.QueueJobRunner(channel_config_string="root:4")
+        a_runner.dispatcher = mock.Mock()
+        db1, db2 = mock.Mock(), mock.Mock()
+        # A2 has been deleted in the meantime
+        db1.set_jobs_enqueued.return_value = {"A1": 1, "A3": 1}
+        db2.set_jobs_enqueued.return_value = {"B1": 1}
+        a_runner.db_by_name = {"db1": db1, "db2": db2}
+        for seq, (db_name, uuid) in enumerate(
+            [("db1", "A1"), ("db2", "B1"), ("db1", "A2"), ("db1", "A3")]
+        ):
+            a_runner.channel_manager.notify(
+                db_name, "root", uuid, seq, 0, 10, None, "pending"
+            )
+        a_runner.run_jobs()
+        db1.set_jobs_enqueued.assert_called_once_with(["A1", "A2", "A3"])
+        db2.set_jobs_enqueued.assert_called_once_with(["B1"])
+        self.assertEqual(
+            a_runner.dispatcher.dispatch.call_args_list,
+            [mock.call("db1", "A1"), mock.call("db1", "A3"), mock.call("db2", "B1")],
+        )
+
+    def test_run_jobs_batch_size(self):
+        a_runner = runner.QueueJobRunner(channel_config_string="root:8,A:4")
+        a_runner.dispatcher = mock.Mock()
+        db = mock.Mock()
+        a_runner.db_by_name = {"db": db}
+        uuids = ["R1", "R2", "R3", "A1", "A2", "S1"]
+        for seq, uuid in enumerate(uuids):
+            channel = "root.A" if uuid.startswith("A") else "root"
+            a_runner.channel_manager.notify(
+                "db", channel, uuid, seq, 0, 10, None, "pending"
+            )
+        # the jobs of R, A and S have batch sizes of 2, 2 and 1
+        db.set_jobs_enqueued.return_value = {
+            uuid: 1 if uuid.startswith("S") else 2 for uuid in uuids
+        }
+        a_runner.run_jobs()
+        self.assertEqual(
+            a_runner.dispatcher.dispatch_batch.call_args_list,
+            [
+                mock.call("db", ["R1", "R2"]),
+                mock.call("db", ["A1", "A2"]),
+            ],
+        )
+        # a single job remains in the batch of the root channel
+        self.assertEqual(
+            sorted(a_runner.dispatcher.dispatch.call_args_list),
+            [mock.call("db", "R3"), mock.call("db", "S1")],
+        )
+
+    def test_process_notifications_coalesced(self):
+        a_runner = runner.QueueJobRunner(channel_config_string="root:4")
+        db = mock.MagicMock(db_name="db")
+        db.conn.notifies = [
+            mock.Mock(payload=uuid) for uuid in ("A1", "A2", "A1", "A3", "A1")
+        ]
+        # A3 has been deleted in the meantime
+        db.select_jobs.return_value.__enter__.return_value = [
+            ("root", "A1", 1, 0, 10, None, "pending"),
+            ("root", "A2", 2, 0, 10, None, "pending"),
+        ]
+        a_runner.db_by_name = {"db": db}
+        a_runner.channel_manager.notify("db", "root", "A3", 3, 0, 10, None, "pending")
+        a_runner.process_notifications()
+        self.assertEqual(db.conn.notifies, [])
+        db.select_jobs.assert_called_once()
+        where, (uuids,) = db.select_jobs.call_args.args
+        self.assertEqual(where, "uuid = ANY(%s)")
+        self.assertEqual(sorted(uuids), ["A1", "A2", "A3"])
+        self.assertEqual(a_runner.notifications_count, 5)
+        self.assertEqual(a_runner.notifications_coalesced, 2)
+        jobs = list(a_runner.channel_manager.get_jobs_to_run(now=100))
+        self.assertEqual([job.uuid for job in jobs], ["A1", "A2"])
+
+    def test_process_notifications_payload(self):
+        a_runner = runner.QueueJobRunner(channel_config_string="root:4")
+        db = mock.MagicMock(db_name="db")
+        db.conn.notifies = [
+            mock.Mock(payload=payload)
+            for payload in (
+                '["root", "A1", 1, "2024-03-01T10:00:00", 10, null, "pending"]',
+                '["root", "A1", 1, "2024-03-01T10:00:00", 5, null, "pending"]',
+                '["root", "A2", 2, "2024-03-01T10:00:01", 10, null, "pending"]',
+                '["A2"]',
+                "A3",
+            )
+        ]
+        db.select_jobs.return_value.__enter__.return_value = [
+            ("root", "A3", 3, 0, 10, None, "pending"),
+        ]
+        a_runner.db_by_name = {"db": db}
+        a_runner.process_notifications()
+        # only the job notified without its values is read
+        where, (uuids,) = db.select_jobs.call_args.args
+        self.assertEqual(uuids, ["A3"])
+        self.assertEqual(a_runner.jobs_refreshed, 1)
+        self.assertEqual(a_runner.notifications_coalesced, 2)
+        job = a_runner.channel_manager._jobs_by_uuid["A1"]
+        self.assertEqual(job.priority, 5)
+        self.assertNotIn("A2", a_runner.channel_manager._jobs_by_uuid)
+
+    def test_initialize_databases_incremental_load(self):
+        a_runner = runner.QueueJobRunner(channel_config_string="root:4,S:1:sequential")
+        db = mock.MagicMock(db_name="db", has_queue_job=True)
+        db.select_jobs.return_value.__enter__.return_value = [
+            ("root", "R1", 1, 0, 10, None, "started"),
+            ("root.S", "F1", 2, 0, 10, None, "failed"),
+        ]
+        db.select_jobs_batch.side_effect = [
+            [
+                ("root", "P1", 3, 0, 10, None, "pending"),
+                ("root.S", "F1", 2, 0, 10, None, "failed"),
+            ],
+            [("root.S", "P2", 5, 0, 10, None, "pending")],
+        ]
+        with (
+            mock.patch.object(runner, "Database", return_value=db),
+            mock.patch.object(a_runner, "get_db_names", return_value=["db"]),
+            mock.patch.object(runner, "DeadJobRequeuer") as requeuer,
+        ):
+            a_runner.initialize_databases()
+        requeuer.return_value.start.assert_called_once()
+        where, (states, failed, sequential) = db.select_jobs.call_args.args
+        # the jobs can be stored with the short name of their channel
+        self.assertEqual(sequential, ["root.S", "S"])
+        # nothing is loaded in batches yet
+        db.select_jobs_batch.assert_not_called()
+        self.assertIn("db", a_runner._loaders)
+        with mock.patch.object(runner, "LOAD_BATCH_SIZE", 2):
+            a_runner.load_jobs()
+            # the jobs of the first batch can run before the end of the load
+            jobs = list(a_runner.channel_manager.get_jobs_to_run(now=100))
+            self.assertEqual([job.uuid for job in jobs], ["P1"])
+            a_runner.load_jobs()
+        self.assertEqual(
+            [call.args[2] for call in db.select_jobs_batch.call_args_list],
+            [None, (10, 0, 2)],
+        )
+        self.assertFalse(a_runner._loaders)
+        # the sequential channel is blocked by its failed job
+        self.assertFalse(list(a_runner.channel_manager.get_jobs_to_run(now=100)))
+
+    def test_sharded_rebalance(self):
+        a_runner = runner.QueueJobRunner(
+            channel_config_string="root:4,A:1,B:1,C:1", sharded=True
+        )
+        db = mock.MagicMock(db_name="db", has_queue_job=True)
+        db.get_shards.return_value = {"root.D"}
+        db.select_jobs.return_value.__enter__.return_value = []
+        db.select_jobs_batch.return_value = []
+        # root.C is still held by the runner which owned it before
+        db.acquire_shard.side_effect = lambda shard: shard != "root.C"
+        # with 2 runners, the first one wants root.A, root.B and root.C
+        db.get_runners.return_value = (2, 0)
+        with (
+            mock.patch.object(runner, "Database", return_value=db) as database,
+            mock.patch.object(a_runner, "get_db_names", return_value=["db"]),
+            mock.patch.object(runner, "DeadJobRequeuer"),
+        ):
+            a_runner.initialize_databases()
+        database.assert_called_once_with("db", sharded=True)
+        # nothing is loaded before the shards are acquired
+        db.select_jobs.assert_not_called()
+        self.assertFalse(a_runner._loaders)
+        a_runner.rebalance_shards()
+        self.assertEqual(a_runner.shards_by_db["db"], {"root.A", "root.B"})
+        self.assertEqual(
+            a_runner._known_shards["db"],
+            {"root", "root.A", "root.B", "root.C", "root.D"},
+        )
+        where, args = db.select_jobs.call_args.args
+        self.assertTrue(where.startswith("(channel = ANY(%s)"))
+        self.assertEqual(args[0], ["root.A", "A", "root.B", "B"])
+        self.assertIn(("db", ("root.A", "root.B")), a_runner._loaders)
+        # root.C is acquired again soon
+        self.assertLess(
+            a_runner._next_rebalance,
+            time.monotonic() + runner.SHARD_REBALANCE_INTERVAL,
+        )
+
+        db.conn.notifies = [
+            mock.Mock(payload=payload)
+            for payload in (
+                '["root.A.sub", "A1", 1, "2024-03-01T10:00:00", 10, null, "pending"]',
+                '["root.D", "D1", 2, "2024-03-01T10:00:00", 10, null, "pending"]',
+                '["root.E", "E1", 3, "2024-03-01T10:00:00", 10, null, "pending"]',
+            )
+        ]
+        a_runner.process_notifications()
+        self.assertEqual(list(a_runner.channel_manager._jobs_by_uuid), ["A1"])
+        # a new top-level channel is distributed on the next iteration
+        self.assertEqual(a_runner._next_rebalance, 0)
+
+        # a third runner has started, the previous owner released root.C
+        db.get_runners.return_value = (3, 1)
+        db.acquire_shard.side_effect = None
+        db.acquire_shard.return_value = True
+        a_runner.rebalance_shards()
+        self.assertEqual(
+            sorted(call.args[0] for call in db.release_shard.call_args_list),
+            ["root.A", "root.B"],
+        )
+        self.assertEqual(a_runner.shards_by_db["db"], {"root.C"})
+        self.assertFalse(a_runner.channel_manager._jobs_by_uuid)
+        self.assertEqual(list(a_runner._loaders), [("db", ("root.C",))])
+
+    def test_executor(self):
+        a_runner = runner.QueueJobRunner(executor="process", process_workers=2)
+        self.assertIsInstance(a_runner.dispatcher, executor.ProcessPoolDispatcher)
+        self.assertEqual(a_runner.dispatcher.workers, 2)
+        a_runner = runner.QueueJobRunner()
+        self.assertIsInstance(a_runner.dispatcher, dispatcher.AsyncHttpDispatcher)
+        with self.assertRaises(ValueError):
+            runner.QueueJobRunner(executor="thread")
+
+    def test_dead_job_requeuer(self):
+        db = mock.Mock()
+        db.requeue_dead_jobs.side_effect = [
+            (3, ["A1"]),
+            psycopg2.OperationalError("connection lost"),
+            (0, []),
+        ]
+        requeuer = runner.DeadJobRequeuer(["db"], interval=0.01, jitter=0)
+        with mock.patch.object(runner, "Database", return_value=db) as database:
+            requeuer.requeue_dead_jobs()
+            requeuer.requeue_dead_jobs()
+            requeuer.requeue_dead_jobs()
+        # a connection without the master lock, opened again after an error
+        database.assert_called_with("db", master=False)
+        self.assertEqual(database.call_count, 2)
+        self.assertEqual(requeuer.stats.runs, 2)
+        self.assertEqual(requeuer.stats.examined, 3)
+        self.assertEqual(requeuer.stats.requeued, 1)
+        with mock.patch.object(runner, "Database", return_value=db):
+            db.requeue_dead_jobs.side_effect = None
+            db.requeue_dead_jobs.return_value = (0, [])
+            requeuer.start()
+            time.sleep(0.1)
+            requeuer.stop()
+        # it runs in the background until it is stopped
+        self.assertGreater(requeuer.stats.runs, 3)
+        self.assertFalse(requeuer._dbs)
+
+
+class _RunJobHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.server.paths.append(self.path)
+        self.server.connections.add(self.client_address)
+        status = 500 if "fail" in self.path else 200
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+@tagged("-at_install", "post_install")
+class TestAsyncHttpDispatcher(BaseCase):
+    def setUp(self):
+        super().setUp()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _RunJobHandler)
+        self.server.paths = []
+        self.server.connections = set()
+        thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.dispatcher = dispatcher.AsyncHttpDispatcher(
+            host="127.0.0.1", port=self.server.server_address[1], concurrency=2
+        )
+        self.addCleanup(self.dispatcher.stop)
+
+    def _wait_dispatched(self, count):
+        deadline = time.monotonic() + 5
+        while self.dispatcher.stats.dispatched < count:
+            self.assertLess(time.monotonic(), deadline, "requests not dispatched")
+            time.sleep(0.01)
+
+    def test_dispatch_reuses_connections(self):
+        for i in range(20):
+            self.dispatcher.dispatch("db", f"uuid-{i}")
+        self._wait_dispatched(20)
+        self.assertEqual(
+            sorted(self.server.paths),
+            sorted(f"/queue_job/runjob?db=db&job_uuid=uuid-{i}" for i in range(20)),
+        )
+        # never more connections than the concurrency limit
+        self.assertLessEqual(len(self.server.connections), 2)
+        self.assertEqual(self.dispatcher.stats.errors, 0)
+
+    def test_dispatch_batch(self):
+        self.dispatcher.dispatch_batch("db", ["uuid-1", "uuid-2"])
+        self._wait_dispatched(1)
+        self.assertEqual(
+            self.server.paths, ["/queue_job/runjobs?db=db&job_uuids=uuid-1,uuid-2"]
+        )
+
+    def test_dispatch_http_error(self):
+        with self.assertLogs(dispatcher._logger, level="ERROR"):
+            self.dispatcher.dispatch("db", "fail")
+            self._wait_dispatched(1)
+        self.assertEqual(self.dispatcher.stats.errors, 1)
+
+
+def _fake_run_batch(controller, db_name, job_uuids):
+    success = True
+    for job_uuid in job_uuids:
+        if job_uuid == "fail":
+            success = False
+        if job_uuid == "die":
+            os._exit(1)
+        if job_uuid == "sleep":
+            time.sleep(10)
+    return success
+
+
+@tagged("-at_install", "post_install")
+class TestProcessPoolDispatcher(BaseCase):
+    def setUp(self):
+        super().setUp()
+        # the workers are forked with the patched functions
+        for name, value in (
+            ("_run_batch", _fake_run_batch),
+            ("_forget_inherited_connections", lambda: None),
+        ):
+            patcher = mock.patch.object(executor, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.dispatcher = executor.ProcessPoolDispatcher(workers=2, max_jobs=3)
+        self.addCleanup(self.dispatcher.stop)
+
+    def _wait_dispatched(self, count):
+        deadline = time.monotonic() + 10
+        while self.dispatcher.stats.dispatched < count:
+            self.assertLess(time.monotonic(), deadline, "jobs not run")
+            time.sleep(0.01)
+
+    def test_dispatch(self):
+        for i in range(10):
+            self.dispatcher.dispatch("db", f"uuid-{i}")
+        self._wait_dispatched(10)
+        self.assertEqual(self.dispatcher.stats.errors, 0)
+        # the workers are recycled after max_jobs jobs
+        self.assertEqual(len(self.dispatcher._workers), 2)
+        pids = {worker.pid for worker in self.dispatcher._workers.values()}
+        self.dispatcher.stop()
+        self.assertFalse(self.dispatcher._workers)
+        self.assertEqual(len(pids), 2)
+
+    def test_dispatch_failure(self):
+        self.dispatcher.dispatch("db", "fail")
+        self._wait_dispatched(1)
+        self.assertEqual(self.dispatcher.stats.errors, 1)
+
+    def test_dispatch_batch(self):
+        # the jobs after a failed job of the batch run
+        self.dispatcher.dispatch_batch("db", ["fail", "uuid-1"])
+        self._wait_dispatched(1)
+        self.assertEqual(self.dispatcher.stats.errors, 1)
+
+    def test_worker_died(self):
+        with self.assertLogs(executor._logger, level="ERROR"):
+            self.dispatcher.dispatch("db", "die")
+            deadline = time.monotonic() + 10
+            while not self.dispatcher.stats.errors:
+                self.assertLess(time.monotonic(), deadline, "worker not replaced")
+                time.sleep(0.01)
+        # the worker is replaced, the next jobs run
+        for i in range(4):
+            self.dispatcher.dispatch("db", f"uuid-{i}")
+        self._wait_dispatched(4)
+        self.assertEqual(len(self.dispatcher._workers), 2)
+
+    def test_limit_time_real(self):
+        with (
+            mock.patch.dict(executor.config.options, {"limit_time_real": 1}),
+            self.assertLogs(executor._logger, level="ERROR"),
+        ):
+            self.dispatcher.dispatch("db", "sleep")
+            deadline = time.monotonic() + 5
+            while not self.dispatcher.stats.errors:
+                self.assertLess(time.monotonic(), deadline, "worker not killed")
+                time.sleep(0.01)